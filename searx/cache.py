@@ -0,0 +1,212 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Caches with a time to live, see the ``cache`` section of settings.yml.
+
+Each cache stores bytes in a namespace of the configured backend:
+
+* ``memory``: in-process LRU cache, one per worker process.
+* ``shared``: the uWSGI cache of :py:mod:`searx.shared`, shared by the worker
+  processes (add ``purge_lru=1`` to the ``cache2`` line of uwsgi.ini).
+* ``redis``: a Redis compatible server, requires the ``redis`` python package.
+
+The python objects are stored with :py:func:`dumps`: the pickles are signed
+with ``server.secret_key``, so a value written in the backend by someone else
+is never unpickled.
+"""
+
+import hashlib
+import hmac
+import pickle
+import struct
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from time import time
+
+from searx import logger, settings
+
+
+logger = logger.getChild('cache')
+
+caches = {}
+
+
+class Cache(ABC):
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value of ``key``, None if the key is unknown or expired."""
+        value = self._get(self.namespace + ':' + key)
+        with self._counter_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl):
+        """Store ``value`` (bytes) for ``ttl`` seconds."""
+        self._set(self.namespace + ':' + key, value, ttl)
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {
+            'name': self.namespace,
+            'backend': self.backend,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    @abstractmethod
+    def _get(self, key):
+        pass
+
+    @abstractmethod
+    def _set(self, key, value, ttl):
+        pass
+
+
+class MemoryCache(Cache):
+
+    backend = 'memory'
+
+    def __init__(self, namespace, max_items):
+        super().__init__(namespace)
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expire_time, value = item
+            if expire_time < time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._items[key] = (time() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+class SharedCache(Cache):
+
+    backend = 'shared'
+
+    # the expiration time is stored before the value:
+    # the uWSGI cache is not guaranteed to remove the expired items on time.
+    _header = struct.Struct('!d')
+
+    def __init__(self, namespace, storage):
+        super().__init__(namespace)
+        self.storage = storage
+
+    def _get(self, key):
+        item = self.storage.get_bytes(key)
+        if item is None:
+            return None
+        expire_time, = self._header.unpack_from(item)
+        if expire_time < time():
+            return None
+        return item[self._header.size:]
+
+    def _set(self, key, value, ttl):
+        if not self.storage.set_bytes(key, self._header.pack(time() + ttl) + value, int(ttl) + 1):
+            # the value is larger than the blocksize of the uWSGI cache, or the cache is full
+            logger.debug('%s: the uWSGI cache has not stored %i bytes', self.namespace, len(value))
+
+
+class RedisCache(Cache):
+
+    backend = 'redis'
+
+    def __init__(self, namespace, client):
+        super().__init__(namespace)
+        self.client = client
+
+    def _get(self, key):
+        try:
+            return self.client.get(key)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('redis error, key=%s', key)
+            return None
+
+    def _set(self, key, value, ttl):
+        try:
+            self.client.set(key, value, ex=max(1, int(ttl)))
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('redis error, key=%s', key)
+
+
+def _sign(data):
+    return hmac.new(str(settings['server']['secret_key']).encode('utf-8'), data, hashlib.sha256).digest()
+
+
+def dumps(value):
+    """Return ``value`` pickled and signed, see :py:func:`loads`."""
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return _sign(data) + data
+
+
+def loads(signed_data):
+    """Return the value of bytes returned by :py:func:`dumps`.
+
+    Raise a ValueError if the signature does not match: the data is not unpickled.
+    """
+    signature_size = hashlib.sha256().digest_size
+    signature, data = signed_data[:signature_size], signed_data[signature_size:]
+    if not hmac.compare_digest(signature, _sign(data)):
+        raise ValueError('invalid signature')
+    return pickle.loads(data)
+
+
+def _new_cache(namespace, cache_settings):
+    backend = cache_settings.get('backend')
+    max_items = cache_settings.get('max_items', 1000)
+
+    if backend == 'shared':
+        from searx.shared import storage  # pylint: disable=import-outside-toplevel
+        from searx.shared.shared_simple import SimpleSharedDict  # pylint: disable=import-outside-toplevel
+        if isinstance(storage, SimpleSharedDict):
+            logger.warning('cache: the uWSGI cache is not available, use the memory backend')
+        else:
+            return SharedCache(namespace, storage)
+    elif backend == 'redis':
+        try:
+            import redis  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            logger.error('cache: the redis package is not installed, use the memory backend')
+        else:
+            client = redis.Redis.from_url(cache_settings.get('redis_url', 'redis://localhost:6379/0'))
+            return RedisCache(namespace, client)
+    elif backend != 'memory':
+        logger.error('cache: unknown backend "%s", use the memory backend', backend)
+
+    return MemoryCache(namespace, max_items)
+
+
+def get_cache(namespace):
+    """Return the cache of ``namespace``, None if the cache is disabled in the settings."""
+    cache = caches.get(namespace)
+    if cache is None:
+        cache_settings = settings.get('cache') or {}
+        if not cache_settings.get('backend'):
+            return None
+        cache = caches.setdefault(namespace, _new_cache(namespace, cache_settings))
+    return cache
+
+
+def get_stats():
+    return [caches[namespace].get_stats() for namespace in sorted(caches)]
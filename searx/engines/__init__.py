@@ -27,7 +27,8 @@ from searx import settings
 from searx import logger
 from searx.data import ENGINES_LANGUAGES
 from searx.exceptions import SearxEngineResponseException
-from searx.poolrequests import get, get_proxy_cycles
+from searx.metrology.aggregation import get_metrics
+from searx.poolrequests import get, get_proxy_cycles, get_network
 from searx.utils import load_module, match_language, get_engine_from_settings, gen_useragent
 
 
@@ -37,6 +38,9 @@ engine_dir = dirname(realpath(__file__))
 
 engines = {}
 
+# the suspension of the engines is updated by the threads of the engines
+stats_lock = threading.Lock()
+
 categories = {'general': []}
 
 babel_langs = [lang_parts[0] + '-' + lang_parts[-1] if len(lang_parts) > 1 else lang_parts[0]
@@ -56,6 +60,10 @@ engine_default_args = {'paging': False,
                        'time_range_support': False,
                        'engine_type': 'online',
                        'display_error_messages': True,
+                       'cache_ttl': 0,
+                       'hedge_percentile': 0,
+                       'hedge_budget': 5,
+                       'network': 'default',
                        'tokens': []}
 
 
@@ -94,10 +102,18 @@ def load_engine(engine_data):
         else:
             setattr(engine, param_name, param_value)
 
+    # default timeout of the network profile
+    network = get_network(getattr(engine, 'network', 'default'))
+    if network is not None and network.request_timeout and not hasattr(engine, 'timeout'):
+        engine.timeout = network.request_timeout
+
     for arg_name, arg_value in engine_default_args.items():
         if not hasattr(engine, arg_name):
             setattr(engine, arg_name, arg_value)
 
+    # connection pool of the engine, see load_engines
+    engine.pool_name = engine_name
+
     # checking required variables
     for engine_attr in dir(engine):
         if engine_attr.startswith('_'):
@@ -140,22 +156,6 @@ def load_engine(engine_data):
         setattr(engine, 'fetch_supported_languages',
                 lambda: engine._fetch_supported_languages(get(engine.supported_languages_url, headers=headers)))
 
-    engine.stats = {
-        'sent_search_count': 0,  # sent search
-        'search_count': 0,  # successful search
-        'result_count': 0,
-        'engine_time': 0,
-        'engine_time_count': 0,
-        'score_count': 0,
-        'errors': 0
-    }
-
-    engine_type = getattr(engine, 'engine_type', 'online')
-
-    if engine_type != 'offline':
-        engine.stats['page_load_time'] = 0
-        engine.stats['page_load_count'] = 0
-
     # tor related settings
     if settings['outgoing'].get('using_tor_proxy'):
         # use onion url if using tor.
@@ -188,7 +188,23 @@ def to_percentage(stats, maxvalue):
     return stats
 
 
-def get_engines_stats(preferences):
+def get_engines_stats(preferences, metrics=None):
+    """Averages of the engines in ``metrics``, by default the metrics of all the workers.
+
+    Counters, since the start of the worker processes:
+
+    * ``('engine', name, 'search', 'sent')``: searches sent to the engine,
+    * ``('engine', name, 'search', 'successful')``: searches which have returned results,
+    * ``('engine', name, 'search', 'error')``: searches which have failed,
+    * ``('engine', name, 'result')``: results returned by the engine,
+    * ``('engine', name, 'score')``: sum of the scores of the results.
+
+    Sliding histograms of the last 10 minutes, in seconds:
+
+    * ``('engine', name, 'time', 'total')``: duration of the successful searches,
+    * ``('engine', name, 'time', 'http')``: duration of their HTTP requests,
+    * ``('engine', name, 'time', 'parse')``: duration of the parsing of their responses.
+    """
     # TODO refactor
     pageloads = []
     engine_times = []
@@ -198,44 +214,42 @@ def get_engines_stats(preferences):
     scores_per_result = []
 
     max_pageload = max_engine_times = max_results = max_score = max_errors = max_score_per_result = 0  # noqa
+    if metrics is None:
+        metrics = get_metrics()
     for engine in engines.values():
         if not preferences.validate_token(engine):
             continue
 
-        if engine.stats['search_count'] == 0:
+        search_count = metrics.get_counter('engine', engine.name, 'search', 'successful')
+        if search_count == 0:
             continue
 
-        results_num = \
-            engine.stats['result_count'] / float(engine.stats['search_count'])
-
-        if engine.stats['engine_time_count'] != 0:
-            this_engine_time = engine.stats['engine_time'] / float(engine.stats['engine_time_count'])  # noqa
-        else:
-            this_engine_time = 0
+        results_num = metrics.get_counter('engine', engine.name, 'result') / float(search_count)
+        this_engine_time = metrics.get_histogram('engine', engine.name, 'time', 'total').average
 
         if results_num:
-            score = engine.stats['score_count'] / float(engine.stats['search_count'])  # noqa
+            score = metrics.get_counter('engine', engine.name, 'score') / float(search_count)
             score_per_result = score / results_num
         else:
             score = score_per_result = 0.0
 
         if engine.engine_type != 'offline':
-            load_times = 0
-            if engine.stats['page_load_count'] != 0:
-                load_times = engine.stats['page_load_time'] / float(engine.stats['page_load_count'])  # noqa
+            load_times = metrics.get_histogram('engine', engine.name, 'time', 'http').average
             max_pageload = max(load_times, max_pageload)
             pageloads.append({'avg': load_times, 'name': engine.name})
 
+        error_count = metrics.get_counter('engine', engine.name, 'search', 'error')
+
         max_engine_times = max(this_engine_time, max_engine_times)
         max_results = max(results_num, max_results)
         max_score = max(score, max_score)
         max_score_per_result = max(score_per_result, max_score_per_result)
-        max_errors = max(max_errors, engine.stats['errors'])
+        max_errors = max(max_errors, error_count)
 
         engine_times.append({'avg': this_engine_time, 'name': engine.name})
         results.append({'avg': results_num, 'name': engine.name})
         scores.append({'avg': score, 'name': engine.name})
-        errors.append({'avg': engine.stats['errors'], 'name': engine.name})
+        errors.append({'avg': error_count, 'name': engine.name})
         scores_per_result.append({
             'avg': score_per_result,
             'name': engine.name
@@ -276,6 +290,26 @@ def get_engines_stats(preferences):
     ]
 
 
+def get_engines_time_stats(preferences, metrics=None):
+    """Percentiles of the durations of the engines during the last 10 minutes, see :py:func:`get_engines_stats`."""
+    if metrics is None:
+        metrics = get_metrics()
+    time_stats = []
+    for engine_name in sorted(engines):
+        if not preferences.validate_token(engines[engine_name]):
+            continue
+        total = metrics.get_histogram('engine', engine_name, 'time', 'total')
+        if not total.count:
+            continue
+        engine_stats = {'name': engine_name, 'count': total.count}
+        for name, histogram in (('total', total),
+                                ('http', metrics.get_histogram('engine', engine_name, 'time', 'http')),
+                                ('parse', metrics.get_histogram('engine', engine_name, 'time', 'parse'))):
+            engine_stats[name] = [histogram.percentile(percentage) for percentage in (50, 90, 99)]
+        time_stats.append(engine_stats)
+    return time_stats
+
+
 def load_engines(engine_list):
     global engines, engine_shortcuts  # pylint: disable=global-variable-not-assigned
     engines.clear()
@@ -284,6 +318,18 @@ def load_engines(engine_list):
         engine = load_engine(engine_data)
         if engine is not None:
             engines[engine.name] = engine
+
+    # the network of an engine is a profile of outgoing.networks,
+    # or the name of another engine to share its network and its connections
+    for engine in engines.values():
+        if get_network(engine.network) is not None:
+            continue
+        if engine.network not in engines:
+            logger.error('Engine "{}": unknown network "{}", see outgoing.networks'
+                         .format(engine.name, engine.network))
+            sys.exit(1)
+        engine.pool_name = engine.network
+        engine.network = engines[engine.pool_name].network
     return engines
 
 
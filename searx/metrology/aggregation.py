@@ -0,0 +1,181 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Metrics of all the worker processes.
+
+Under uWSGI each worker process records the values in its own counters,
+histograms and errors: there is no inter process communication on the path of
+the searches.  Every ``PUBLISH_INTERVAL`` seconds, each worker publishes a copy
+of its metrics in :py:data:`searx.shared.storage` (the uWSGI cache) if they have
+changed.
+:py:func:`get_metrics` adds the last copies of the other workers to the metrics
+of the current worker, so ``/stats`` shows the same values whatever the worker
+serving the request.
+
+The state of each worker (caches, worker pool, networks and suspension of the
+engines, see :py:func:`get_worker_state`) is published the same way: these
+values are not added, :py:attr:`Metrics.worker_states` keeps them by worker.
+
+The copies are pickles signed with ``server.secret_key`` (see
+:py:func:`searx.cache.dumps`): a copy without a valid signature is ignored.  A
+copy takes up to about 64 KB, so the ``cache2`` line of uwsgi.ini needs
+``bitmap=1`` to store it in several blocks.
+
+Without uWSGI there is only one worker and nothing is published.
+"""
+
+import zlib
+
+from searx import logger
+from searx.cache import dumps, loads
+from searx.shared import storage, get_worker_id, get_worker_ids
+# searx.shared.schedule calls the function in only one of the uWSGI workers
+from searx.shared.shared_simple import schedule as schedule_in_worker
+from searx.metrology.counter import counters
+from searx.metrology.error_recorder import errors_per_engines
+from searx.metrology.histogram import Histogram, SlidingHistogram, histograms
+
+
+logger = logger.getChild('metrology')
+
+PUBLISH_INTERVAL = 5
+_published_version = None
+
+
+class Metrics:
+    """Sum of the counters, histograms and errors of several workers."""
+
+    __slots__ = 'counters', 'histograms', 'errors', 'worker_states'
+
+    def __init__(self):
+        # key --> int
+        self.counters = {}
+        # key --> Histogram or SlidingHistogram
+        self.histograms = {}
+        # engine name --> {ErrorContext: int}
+        self.errors = {}
+        # worker id --> value of get_worker_state
+        self.worker_states = {}
+
+    def add(self, worker_counters, worker_histograms, worker_errors, worker_state):
+        """Add the metrics of a worker, the arguments are organized like the attributes."""
+        self.worker_states[worker_state['worker']] = worker_state
+        for key, value in worker_counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, histogram in worker_histograms.items():
+            if key in self.histograms:
+                self.histograms[key].add(histogram)
+            else:
+                self.histograms[key] = histogram.copy()
+        for engine_name, error_contexts in worker_errors.items():
+            engine_errors = self.errors.setdefault(engine_name, {})
+            for error_context, count in error_contexts.items():
+                engine_errors[error_context] = engine_errors.get(error_context, 0) + count
+
+    def get_counter(self, *key):
+        return self.counters.get(key, 0)
+
+    def get_histogram(self, *key):
+        """Return the :py:class:`Histogram` of ``key``, the snapshot of the sliding histograms."""
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            return Histogram()
+        if isinstance(histogram, SlidingHistogram):
+            return histogram.snapshot()
+        return histogram
+
+
+def get_worker_state():
+    """Return the values of the current worker which can't be added to the values of the other workers."""
+    # imported here: these modules record their metrics with searx.metrology
+    # pylint: disable=import-outside-toplevel
+    from searx.cache import get_stats as cache_get_stats
+    from searx.engines import engines
+    from searx.poolrequests import get_stats as network_get_stats
+    from searx.search.workerpool import get_stats as workerpool_get_stats
+    from searx.utils import get_parse_url_stats
+    return {
+        'worker': get_worker_id(),
+        'caches': cache_get_stats() + [get_parse_url_stats()],
+        'workerpool': workerpool_get_stats(),
+        'networks': network_get_stats(),
+        # engine name --> (suspend_end_time, continuous_errors)
+        'engines': {engine_name: (engine.suspend_end_time, engine.continuous_errors)
+                    for engine_name, engine in list(engines.items())},
+    }
+
+
+def _get_local_metrics():
+    # list(): the other threads may add a key meanwhile
+    local_counters = {key: counter.value for key, counter in list(counters.items())}
+    local_errors = {engine_name: dict(list(error_contexts.items()))
+                    for engine_name, error_contexts in list(errors_per_engines.items())}
+    return local_counters, dict(list(histograms.items())), local_errors, get_worker_state()
+
+
+def dump():
+    """Return the metrics of the current worker as bytes, see :py:func:`load`."""
+    local_counters, local_histograms, local_errors, worker_state = _get_local_metrics()
+    data = (
+        local_counters,
+        [(key, isinstance(histogram, SlidingHistogram), histogram.dump())
+         for key, histogram in local_histograms.items()],
+        local_errors,
+        worker_state,
+    )
+    return zlib.compress(dumps(data), 1)
+
+
+def load(data):
+    """Return the ``(counters, histograms, errors, state)`` of bytes returned by :py:func:`dump`.
+
+    Raise a ValueError if the signature does not match.
+    """
+    worker_counters, worker_histograms, worker_errors, worker_state = loads(zlib.decompress(data))
+    worker_histograms = {key: (SlidingHistogram if sliding else Histogram).load(histogram)
+                         for key, sliding, histogram in worker_histograms}
+    return worker_counters, worker_histograms, worker_errors, worker_state
+
+
+def _get_storage_key(worker_id):
+    return 'metrology_' + str(worker_id)
+
+
+def publish():
+    """Publish the metrics of the current worker, unless the counters have not changed since the last call."""
+    global _published_version  # pylint: disable=global-statement
+    # each search increments at least one counter
+    version = sum(counter.value for counter in list(counters.values()))
+    if version == _published_version:
+        return
+    try:
+        data = dump()
+        if not storage.set_bytes(_get_storage_key(get_worker_id()), data):
+            # without bitmap=1, the uWSGI cache can't store an item larger than blocksize
+            logger.warning('the uWSGI cache has not stored the metrics (%i bytes), see bitmap=1 in uwsgi.ini',
+                           len(data))
+            return
+        _published_version = version
+    except Exception:  # pylint: disable=broad-except
+        logger.exception('can\'t publish the metrics')
+
+
+def get_metrics():
+    """Return the :py:class:`Metrics` of all the workers."""
+    metrics = Metrics()
+    metrics.add(*_get_local_metrics())
+    worker_id = get_worker_id()
+    for other_worker_id in get_worker_ids():
+        if other_worker_id == worker_id:
+            continue
+        data = storage.get_bytes(_get_storage_key(other_worker_id))
+        if data is not None:
+            try:
+                metrics.add(*load(data))
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('can\'t load the metrics of the worker %s', other_worker_id)
+    return metrics
+
+
+def initialize():
+    """Publish the metrics of the current worker periodically if there are several workers."""
+    if len(get_worker_ids()) > 1:
+        schedule_in_worker(PUBLISH_INTERVAL, publish)
@@ -0,0 +1,35 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Counters, one per worker process.
+
+Like the histograms of :py:mod:`searx.metrology.histogram`, the counters are
+identified by a tuple, for example ``('engine', 'google', 'search', 'sent')``
+for the number of searches sent to google.
+"""
+
+import threading
+
+
+class Counter:
+
+    __slots__ = '_lock', 'value'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def add(self, value=1):
+        with self._lock:
+            self.value += value
+
+
+counters = {}
+_lock = threading.Lock()
+
+
+def get_counter(*key):
+    """Return the counter of ``key``, create it if required."""
+    counter = counters.get(key)
+    if counter is None:
+        with _lock:
+            counter = counters.setdefault(key, Counter())
+    return counter
@@ -1,6 +1,8 @@
+import sys
 import typing
-import inspect
+import linecache
 import logging
+from functools import lru_cache
 from json import JSONDecodeError
 from urllib.parse import urlparse
 from requests.exceptions import RequestException
@@ -13,29 +15,46 @@ logging.basicConfig(level=logging.INFO)
 
 errors_per_engines = {}
 
+# the ErrorContext of each (filename, function, line_no, exception_classname, log_message, log_parameters)
+_error_contexts = {}
+
 
 class ErrorContext:
+    """Location and message of an error.
+
+    ``code`` is the source line of the error.  When it is None, the source line is
+    read from ``filename`` the first time it is required, for example by the
+    ``/stats/errors`` page.
+    """
 
-    __slots__ = 'filename', 'function', 'line_no', 'code', 'exception_classname', 'log_message', 'log_parameters'
+    __slots__ = 'filename', 'function', 'line_no', '_code', 'exception_classname', 'log_message', 'log_parameters'
 
     def __init__(self, filename, function, line_no, code, exception_classname, log_message, log_parameters):
         self.filename = filename
         self.function = function
         self.line_no = line_no
-        self.code = code
+        self._code = code
         self.exception_classname = exception_classname
         self.log_message = log_message
         self.log_parameters = log_parameters
 
+    @property
+    def code(self):
+        if self._code is None:
+            self._code = linecache.getline(self.filename, self.line_no).strip()
+        return self._code
+
+    # the code is not compared: it only depends on filename and line_no
+
     def __eq__(self, o) -> bool:
         if not isinstance(o, ErrorContext):
             return False
         return self.filename == o.filename and self.function == o.function and self.line_no == o.line_no\
-            and self.code == o.code and self.exception_classname == o.exception_classname\
+            and self.exception_classname == o.exception_classname\
             and self.log_message == o.log_message and self.log_parameters == o.log_parameters
 
     def __hash__(self):
-        return hash((self.filename, self.function, self.line_no, self.code, self.exception_classname, self.log_message,
+        return hash((self.filename, self.function, self.line_no, self.exception_classname, self.log_message,
                      self.log_parameters))
 
     def __repr__(self):
@@ -47,17 +66,28 @@ class ErrorContext:
 def add_error_context(engine_name: str, error_context: ErrorContext) -> None:
     errors_for_engine = errors_per_engines.setdefault(engine_name, {})
     errors_for_engine[error_context] = errors_for_engine.get(error_context, 0) + 1
-    logger.debug('%s: %s', engine_name, str(error_context))
+    logger.debug('%s: %s', engine_name, error_context)
+
+
+@lru_cache(maxsize=None)
+def _is_searx_file(filename):
+    split_filename = filename.split('/')
+    return '/'.join(split_filename[-3:-1]) == 'searx/engines'\
+        or '/'.join(split_filename[-4:-1]) == 'searx/search/processors'
 
 
-def get_trace(traces):
-    for trace in reversed(traces):
-        split_filename = trace.filename.split('/')
-        if '/'.join(split_filename[-3:-1]) == 'searx/engines':
-            return trace
-        if '/'.join(split_filename[-4:-1]) == 'searx/search/processors':
-            return trace
-    return traces[-1]
+def get_trace(frames):
+    """Return the ``(code, line_no)`` of the innermost engine or processor, of the innermost frame if there is none.
+
+    ``frames`` iterates over the ``(code, line_no)`` of the frames, from the innermost frame.
+    """
+    innermost_frame = None
+    for frame in frames:
+        if _is_searx_file(frame[0].co_filename):
+            return frame
+        if innermost_frame is None:
+            innermost_frame = frame
+    return innermost_frame
 
 
 def get_hostname(exc: RequestException) -> typing.Optional[None]:
@@ -114,31 +144,45 @@ def get_exception_classname(exc: Exception) -> str:
     return exc_module + '.' + exc_name
 
 
-def get_error_context(framerecords, exception_classname, log_message, log_parameters) -> ErrorContext:
-    searx_frame = get_trace(framerecords)
-    filename = searx_frame.filename
-    function = searx_frame.function
-    line_no = searx_frame.lineno
-    code = searx_frame.code_context[0].strip()
-    del framerecords
-    return ErrorContext(filename, function, line_no, code, exception_classname, log_message, log_parameters)
+def _iter_stack(frame):
+    while frame is not None:
+        yield frame.f_code, frame.f_lineno
+        frame = frame.f_back
+
+
+def _get_traceback_frames(traceback):
+    frames = []
+    while traceback is not None:
+        frames.append((traceback.tb_frame.f_code, traceback.tb_lineno))
+        traceback = traceback.tb_next
+    frames.reverse()
+    return frames
+
+
+def get_error_context(frames, exception_classname, log_message, log_parameters) -> ErrorContext:
+    """Return the interned :py:class:`ErrorContext`, see :py:func:`get_trace` for ``frames``."""
+    code, line_no = get_trace(frames)
+    key = (code.co_filename, code.co_name, line_no, exception_classname, log_message, log_parameters)
+    error_context = _error_contexts.get(key)
+    if error_context is None:
+        error_context = _error_contexts.setdefault(key, ErrorContext(code.co_filename, code.co_name, line_no, None,
+                                                                     exception_classname, log_message,
+                                                                     log_parameters))
+    return error_context
 
 
 def record_exception(engine_name: str, exc: Exception) -> None:
-    framerecords = inspect.trace()
-    try:
-        exception_classname = get_exception_classname(exc)
-        log_parameters = get_messages(exc, framerecords[-1][1])
-        error_context = get_error_context(framerecords, exception_classname, None, log_parameters)
-        add_error_context(engine_name, error_context)
-    finally:
-        del framerecords
+    frames = _get_traceback_frames(exc.__traceback__)
+    if not frames:
+        # the exception has not been raised
+        frames = list(_iter_stack(sys._getframe(1)))  # pylint: disable=protected-access
+    exception_classname = get_exception_classname(exc)
+    log_parameters = get_messages(exc, frames[0][0].co_filename)
+    error_context = get_error_context(frames, exception_classname, None, log_parameters)
+    add_error_context(engine_name, error_context)
 
 
 def record_error(engine_name: str, log_message: str, log_parameters: typing.Optional[typing.Tuple] = None) -> None:
-    framerecords = list(reversed(inspect.stack()[1:]))
-    try:
-        error_context = get_error_context(framerecords, None, log_message, log_parameters or ())
-        add_error_context(engine_name, error_context)
-    finally:
-        del framerecords
+    frames = _iter_stack(sys._getframe(1))  # pylint: disable=protected-access
+    error_context = get_error_context(frames, None, log_message, log_parameters or ())
+    add_error_context(engine_name, error_context)
@@ -0,0 +1,194 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Histograms of durations, one per worker process.
+
+The histograms are identified by a tuple, for example ``('engine', 'google',
+'http')`` for the duration of the HTTP requests sent to google.  A
+:py:class:`SlidingHistogram` only counts the values of the last minutes, see
+:py:func:`get_sliding_histogram`.
+"""
+
+import threading
+from time import time
+
+
+class Histogram:
+    """Count of values in buckets of the same width.
+
+    The values above ``width * size`` are counted in the last bucket.
+    """
+
+    __slots__ = '_lock', 'width', 'size', 'buckets', 'count', 'sum'
+
+    def __init__(self, width=0.05, size=200):
+        self._lock = threading.Lock()
+        self.width = width
+        self.size = size
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = min(int(value / self.width), self.size - 1)
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def reset(self):
+        with self._lock:
+            self.buckets = [0] * self.size
+            self.count = 0
+            self.sum = 0.0
+
+    def add(self, histogram):
+        """Add the values of ``histogram``, which has the same width and size."""
+        with self._lock:
+            self.buckets = [a + b for a, b in zip(self.buckets, histogram.buckets)]
+            self.count += histogram.count
+            self.sum += histogram.sum
+
+    def copy(self):
+        histogram = Histogram(self.width, self.size)
+        histogram.add(self)
+        return histogram
+
+    def dump(self):
+        """Return the histogram as a tuple of numbers, see :py:meth:`load`."""
+        return self.width, self.size, self.count, self.sum, self.buckets[:]
+
+    @staticmethod
+    def load(data):
+        width, size, count, total, buckets = data
+        histogram = Histogram(width, size)
+        histogram.count = count
+        histogram.sum = total
+        histogram.buckets = buckets
+        return histogram
+
+    @property
+    def average(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, percentage):
+        """Return the upper bound of the bucket of the ``percentage`` percentile, None if there is no value."""
+        if not self.count:
+            return None
+        target = self.count * percentage / 100.0
+        total = 0
+        for index, bucket in enumerate(self.buckets):
+            total += bucket
+            if total >= target and total > 0:
+                return (index + 1) * self.width
+        return self.size * self.width
+
+
+class SlidingHistogram:
+    """Histogram of the values observed during the last ``window`` seconds.
+
+    The values are counted in ``slot_count`` histograms of ``window /
+    slot_count`` seconds each, a slot is replaced by an empty histogram when it
+    is reused: the oldest values are forgotten by slices of ``window /
+    slot_count`` seconds.
+    :py:meth:`snapshot` returns the sum of the slots as a :py:class:`Histogram`.
+    """
+
+    __slots__ = '_lock', 'width', 'size', 'slot_duration', '_slots', '_slot_ids'
+
+    def __init__(self, width=0.05, size=200, window=600, slot_count=10):
+        self._lock = threading.Lock()
+        self.width = width
+        self.size = size
+        self.slot_duration = window / slot_count
+        # the histograms are created on the first value of their time slice
+        self._slots = [None] * slot_count
+        # number of the time slice counted by each slot
+        self._slot_ids = [None] * slot_count
+
+    def observe(self, value):
+        slot_id = int(time() / self.slot_duration)
+        index = slot_id % len(self._slots)
+        # under the lock: another thread may reuse the slot for a new time slice
+        with self._lock:
+            slot = self._slots[index]
+            if self._slot_ids[index] != slot_id:
+                slot = self._slots[index] = Histogram(self.width, self.size)
+                self._slot_ids[index] = slot_id
+            slot.observe(value)
+
+    def add(self, histogram):
+        """Add the values of ``histogram``, which has the same width, size and slots.
+
+        Only the most recent time slice is kept when the slots count different time slices.
+        """
+        with self._lock:
+            for index, (slot_id, slot) in enumerate(zip(histogram._slot_ids, histogram._slots)):
+                if slot_id is None:
+                    continue
+                if slot_id == self._slot_ids[index]:
+                    self._slots[index].add(slot)
+                elif self._slot_ids[index] is None or slot_id > self._slot_ids[index]:
+                    self._slots[index] = slot.copy()
+                    self._slot_ids[index] = slot_id
+
+    def copy(self):
+        histogram = SlidingHistogram(self.width, self.size, self.slot_duration * len(self._slots), len(self._slots))
+        histogram.add(self)
+        return histogram
+
+    def dump(self):
+        """Return the histogram as a tuple, see :py:meth:`load`."""
+        slots = [(slot_id, slot.dump()) if slot_id is not None else None
+                 for slot_id, slot in zip(self._slot_ids, self._slots)]
+        return self.width, self.size, self.slot_duration, slots
+
+    @staticmethod
+    def load(data):
+        width, size, slot_duration, slots = data
+        histogram = SlidingHistogram(width, size, slot_duration * len(slots), len(slots))
+        for index, slot in enumerate(slots):
+            if slot is not None:
+                histogram._slot_ids[index] = slot[0]
+                histogram._slots[index] = Histogram.load(slot[1])
+        return histogram
+
+    def snapshot(self):
+        """Return a :py:class:`Histogram` of the values observed during the window."""
+        histogram = Histogram(self.width, self.size)
+        first_slot_id = int(time() / self.slot_duration) - len(self._slots) + 1
+        for slot_id, slot in zip(self._slot_ids, self._slots):
+            if slot_id is not None and slot_id >= first_slot_id:
+                histogram.add(slot)
+        return histogram
+
+    @property
+    def count(self):
+        return self.snapshot().count
+
+    @property
+    def average(self):
+        return self.snapshot().average
+
+    def percentile(self, percentage):
+        return self.snapshot().percentile(percentage)
+
+
+histograms = {}
+_lock = threading.Lock()
+
+
+def get_histogram(*key, width=0.05):
+    """Return the histogram of ``key``, create it with buckets of ``width`` seconds if required."""
+    histogram = histograms.get(key)
+    if histogram is None:
+        with _lock:
+            histogram = histograms.setdefault(key, Histogram(width))
+    return histogram
+
+
+def get_sliding_histogram(*key, width=0.05):
+    """Return the :py:class:`SlidingHistogram` of ``key``, create it with buckets of ``width`` seconds if required."""
+    histogram = histograms.get(key)
+    if histogram is None:
+        with _lock:
+            histogram = histograms.setdefault(key, SlidingHistogram(width))
+    return histogram
@@ -0,0 +1,198 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Metrics in the Prometheus text format, see the ``/metrics`` endpoint.
+
+The metrics are the values of all the worker processes (see
+:py:mod:`searx.metrology.aggregation`), whatever the worker serving the
+request: the counters are the sums of the counters of the workers, the gauges
+of the state of a worker (suspension of the engines, worker pool, networks)
+have a ``worker`` label.
+
+The values are read without taking the locks used on the path of the searches.
+"""
+
+from time import time
+
+from searx.engines import engines
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# upper bounds of the buckets of the HTTP durations, in seconds.  They must be
+# below the last bucket of the histograms (10 seconds), which counts the
+# longer durations too.
+HTTP_DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(**labels):
+    return '{' + ','.join('{0}="{1}"'.format(name, _escape(value)) for name, value in labels.items()) + '}'
+
+
+class _Writer:
+
+    __slots__ = 'lines',
+
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, metric_type, help_text, samples):
+        """Add a metric, ``samples`` is a list of ``(suffix, labels, value)``."""
+        self.lines.append('# HELP {0} {1}'.format(name, help_text))
+        self.lines.append('# TYPE {0} {1}'.format(name, metric_type))
+        for suffix, labels, value in samples:
+            self.lines.append('{0}{1}{2} {3}'.format(name, suffix, labels, repr(float(value))))
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def _histogram_samples(histogram, labels):
+    samples = []
+    total = 0
+    index = 0
+    for upper_bound in HTTP_DURATION_BUCKETS:
+        last_index = round(upper_bound / histogram.width)
+        total += sum(histogram.buckets[index:last_index])
+        index = last_index
+        samples.append(('_bucket', _labels(le=upper_bound, **labels), total))
+    samples.append(('_bucket', _labels(le='+Inf', **labels), histogram.count))
+    samples.append(('_sum', _labels(**labels), histogram.sum))
+    samples.append(('_count', _labels(**labels), histogram.count))
+    return samples
+
+
+def _add_engine_metrics(writer, metrics):
+    engine_names = sorted(engines)
+    searches = []
+    results = []
+    errors = []
+    http_durations = []
+    durations = []
+    suspended = []
+    continuous_errors = []
+    now = time()
+    worker_ids = sorted(metrics.worker_states)
+    for engine_name in engine_names:
+        engine_labels = _labels(engine=engine_name)
+        for status in ('sent', 'successful', 'error'):
+            searches.append(('', _labels(engine=engine_name, status=status),
+                             metrics.get_counter('engine', engine_name, 'search', status)))
+        results.append(('', engine_labels, metrics.get_counter('engine', engine_name, 'result')))
+
+        exception_counts = {}
+        for error_context, count in metrics.errors.get(engine_name, {}).items():
+            exception_classname = error_context.exception_classname or 'unknown'
+            exception_counts[exception_classname] = exception_counts.get(exception_classname, 0) + count
+        for exception_classname in sorted(exception_counts):
+            errors.append(('', _labels(engine=engine_name, exception=exception_classname),
+                           exception_counts[exception_classname]))
+
+        http_histogram = metrics.get_histogram('engine', engine_name, 'http')
+        if http_histogram.count:
+            http_durations.extend(_histogram_samples(http_histogram, {'engine': engine_name}))
+
+        for phase in ('total', 'http', 'parse'):
+            histogram = metrics.get_histogram('engine', engine_name, 'time', phase)
+            if histogram.count:
+                for quantile in (50, 90, 99):
+                    durations.append(('', _labels(engine=engine_name, phase=phase, quantile=quantile / 100),
+                                      histogram.percentile(quantile)))
+
+        # each worker suspends the engines on its own errors
+        for worker_id in worker_ids:
+            engine_state = metrics.worker_states[worker_id]['engines'].get(engine_name)
+            if engine_state is None:
+                continue
+            suspend_end_time, engine_continuous_errors = engine_state
+            worker_labels = _labels(engine=engine_name, worker=worker_id)
+            suspended.append(('', worker_labels, suspend_end_time if suspend_end_time > now else 0))
+            continuous_errors.append(('', worker_labels, engine_continuous_errors))
+
+    writer.metric('searx_engine_searches_total', 'counter',
+                  'Searches sent to the engine, by status: sent, successful or error.', searches)
+    writer.metric('searx_engine_results_total', 'counter', 'Results returned by the engine.', results)
+    writer.metric('searx_engine_errors_total', 'counter', 'Errors of the engine, by exception.', errors)
+    writer.metric('searx_engine_http_request_duration_seconds', 'histogram',
+                  'Duration of the HTTP requests sent to the engine.', http_durations)
+    writer.metric('searx_engine_time_seconds', 'gauge',
+                  'Percentiles of the durations of the searches of the last 10 minutes, '
+                  'by phase: total, http or parse.', durations)
+    writer.metric('searx_engine_suspended_until_seconds', 'gauge',
+                  'End of the suspension of the engine as a UNIX timestamp, 0 if the engine is not suspended.',
+                  suspended)
+    writer.metric('searx_engine_continuous_errors', 'gauge',
+                  'Consecutive searches of the engine which have failed.', continuous_errors)
+
+
+def _add_pipeline_metrics(writer, metrics):
+    ranking = []
+    plugins = []
+    for key, histogram in sorted(metrics.histograms.items(), key=lambda item: item[0]):
+        if key[0] == 'ranking':
+            labels = _labels(stage=key[1])
+            samples = ranking
+        elif key[0] == 'plugin':
+            labels = _labels(plugin=key[1], hook=key[2])
+            samples = plugins
+        else:
+            continue
+        samples.append(('_sum', labels, histogram.sum))
+        samples.append(('_count', labels, histogram.count))
+    writer.metric('searx_ranking_stage_duration_seconds', 'summary', 'Duration of the ranking stages.', ranking)
+    writer.metric('searx_plugin_hook_duration_seconds', 'summary', 'Duration of the plugin hooks.', plugins)
+
+
+def _sum_by(items, labels, key):
+    """Sum ``item[key]`` by the value of the ``labels`` of the items, return a list of samples."""
+    sums = {}
+    for item in items:
+        label_values = tuple(item[label] for label in labels)
+        sums[label_values] = sums.get(label_values, 0) + item[key]
+    return [('', _labels(**dict(zip(labels, label_values))), value) for label_values, value in sorted(sums.items())]
+
+
+def _add_worker_metrics(writer, metrics):
+    worker_states = [metrics.worker_states[worker_id] for worker_id in sorted(metrics.worker_states)]
+
+    caches = [dict(cache_stats, cache=cache_stats['name'])
+              for worker_state in worker_states for cache_stats in worker_state['caches']]
+    writer.metric('searx_cache_hits_total', 'counter', 'Hits of the cache.',
+                  _sum_by(caches, ('cache', 'backend'), 'hits'))
+    writer.metric('searx_cache_misses_total', 'counter', 'Misses of the cache.',
+                  _sum_by(caches, ('cache', 'backend'), 'misses'))
+
+    workerpools = [dict(worker_state['workerpool'], worker=worker_state['worker'])
+                   for worker_state in worker_states if worker_state['workerpool'] is not None]
+    if workerpools:
+        for metric_name, key, help_text in (
+                ('searx_workerpool_active_threads', 'active_count', 'Threads sending a request.'),
+                ('searx_workerpool_max_threads', 'max_workers', 'Maximum number of threads.'),
+                ('searx_workerpool_queue_depth', 'queue_depth', 'Requests waiting for a thread.'),
+                ('searx_workerpool_max_queue_depth', 'max_queue', 'Maximum number of requests waiting for a thread.')):
+            writer.metric(metric_name, 'gauge', help_text, _sum_by(workerpools, ('worker',), key))
+        for metric_name, key, help_text in (
+                ('searx_workerpool_rejected_total', 'rejected_count', 'Requests rejected because the queue was full.'),
+                ('searx_workerpool_expired_total', 'expired_count',
+                 'Requests dropped because their query had timed out.')):
+            writer.metric(metric_name, 'counter', help_text, [('', '', sum(pool[key] for pool in workerpools))])
+
+    networks = [dict(network_stats, network=network_stats['name'], worker=worker_state['worker'])
+                for worker_state in worker_states for network_stats in worker_state['networks']]
+    writer.metric('searx_network_requests_total', 'counter', 'HTTP requests sent through the network.',
+                  _sum_by(networks, ('network',), 'request_count'))
+    writer.metric('searx_network_active_requests', 'gauge', 'HTTP requests in progress.',
+                  _sum_by(networks, ('network', 'worker'), 'active_count'))
+    writer.metric('searx_network_pool_maxsize', 'gauge', 'Maximum number of connections to a host.',
+                  _sum_by(networks, ('network', 'worker'), 'pool_maxsize'))
+
+
+def get_text(metrics):
+    """Return the :py:class:`searx.metrology.aggregation.Metrics` and the state of the worker as text."""
+    writer = _Writer()
+    _add_engine_metrics(writer, metrics)
+    _add_pipeline_metrics(writer, metrics)
+    _add_worker_metrics(writer, metrics)
+    return writer.text()
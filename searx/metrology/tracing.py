@@ -0,0 +1,189 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Tracing of the requests (``tracing``).
+
+A traced request records a tree of spans: the parsing of the preferences and of
+the query, each engine (request build, HTTP request, parsing of the response,
+merge of the results), the plugin hooks, the ranking and the rendering of the
+template.  Each span records its wall time and the CPU time of its thread.
+
+The traces are appended to ``tracing.file`` in the OTLP JSON format, one
+``ExportTraceServiceRequest`` per line: the format read by the ``otlpjsonfile``
+receiver of the OpenTelemetry collector.  ``tracing.sample_rate`` is the
+fraction of the requests which are traced (default ``1.0``).
+
+The current span is stored in a :py:class:`contextvars.ContextVar`: a thread
+which starts a span on behalf of a request must run in a copy of the context of
+the request, see :py:func:`contextvars.copy_context`.  When the request is not
+traced, :py:func:`span` only reads the context variable.
+"""
+
+import json
+import random
+import sys
+import threading
+from contextvars import ContextVar
+from time import time_ns, thread_time_ns
+
+from searx import logger, settings
+
+
+logger = logger.getChild('tracing')
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+_current_span = ContextVar('searx_current_span', default=None)
+
+
+class Trace:
+    """Spans of a request."""
+
+    __slots__ = 'trace_id', 'spans'
+
+    def __init__(self):
+        self.trace_id = '{0:032x}'.format(random.getrandbits(128))
+        # the spans are appended by the threads of the engines
+        self.spans = []
+
+
+class Span:
+
+    __slots__ = ('trace', 'span_id', 'parent_span_id', 'name', 'kind', 'attributes', 'start_time', 'end_time',
+                 'cpu_time', '_start_cpu_time', '_token')
+
+    def __init__(self, trace, parent_span_id, name, kind, attributes):
+        self.trace = trace
+        self.span_id = '{0:016x}'.format(random.getrandbits(64))
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start_time = None
+        self.end_time = None
+        self.cpu_time = None
+        self._start_cpu_time = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def start(self):
+        """Start the span and make it the current span."""
+        self._token = _current_span.set(self)
+        self.start_time = time_ns()
+        self._start_cpu_time = thread_time_ns()
+        return self
+
+    def end(self):
+        self.cpu_time = thread_time_ns() - self._start_cpu_time
+        self.end_time = time_ns()
+        _current_span.reset(self._token)
+        self.trace.spans.append(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.attributes['exception.type'] = exc_type.__name__
+        self.end()
+
+
+class _NoSpan:
+    """Span of the requests which are not traced."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_no_span = _NoSpan()
+
+
+def span(name, **attributes):
+    """Return a child of the current span, to use as a context manager.
+
+    Nothing is recorded if the request is not traced.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _no_span
+    return Span(parent.trace, parent.span_id, name, SPAN_KIND_INTERNAL, attributes)
+
+
+def start_trace(name, **attributes):
+    """Start the trace of a request and return its root span, None if the request is not sampled."""
+    if trace_file is None or random.random() >= sample_rate:
+        return None
+    return Span(Trace(), None, name, SPAN_KIND_SERVER, attributes).start()
+
+
+def end_trace(root_span):
+    """End ``root_span`` and export its trace."""
+    root_span.end()
+    line = json.dumps(to_otlp(root_span.trace), separators=(',', ':')) + '\n'
+    try:
+        with _file_lock, open(trace_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+    except OSError as e:
+        logger.error('can\'t write the trace: %s', e)
+
+
+def _to_otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        # int64 are strings in the OTLP JSON format
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _to_otlp_span(trace, trace_span):
+    attributes = dict(trace_span.attributes)
+    attributes['thread.cpu_time_ns'] = trace_span.cpu_time
+    otlp_span = {
+        'traceId': trace.trace_id,
+        'spanId': trace_span.span_id,
+        'name': trace_span.name,
+        'kind': trace_span.kind,
+        'startTimeUnixNano': str(trace_span.start_time),
+        'endTimeUnixNano': str(trace_span.end_time),
+        'attributes': [{'key': key, 'value': _to_otlp_value(value)} for key, value in attributes.items()],
+    }
+    if trace_span.parent_span_id is not None:
+        otlp_span['parentSpanId'] = trace_span.parent_span_id
+    return otlp_span
+
+
+def to_otlp(trace):
+    """Return the ended spans of ``trace`` as an OTLP ``ExportTraceServiceRequest``."""
+    return {
+        'resourceSpans': [{
+            'resource': {
+                'attributes': [{'key': 'service.name', 'value': {'stringValue': 'searx'}}],
+            },
+            'scopeSpans': [{
+                'scope': {'name': 'searx'},
+                # the spans which end after the root span are not exported
+                'spans': [_to_otlp_span(trace, trace_span) for trace_span in list(trace.spans)],
+            }],
+        }],
+    }
+
+
+_file_lock = threading.Lock()
+tracing_settings = settings.get('tracing') or {}
+trace_file = tracing_settings.get('file')
+sample_rate = tracing_settings.get('sample_rate', 1.0)
+if not isinstance(sample_rate, (int, float)) or not 0 <= sample_rate <= 1:
+    logger.critical('tracing.sample_rate: %r is not a number between 0 and 1', sample_rate)
+    sys.exit(1)
@@ -20,8 +20,12 @@ from importlib import import_module
 from os import listdir, makedirs, remove, stat, utime
 from os.path import abspath, basename, dirname, exists, join
 from shutil import copyfile
+from timeit import default_timer
 
 from searx import logger, settings, static_path
+from searx.metrology import tracing
+from searx.metrology.aggregation import get_metrics
+from searx.metrology.histogram import get_histogram
 
 
 logger = logger.getChild('plugins')
@@ -45,6 +49,9 @@ required_attrs = (('name', str),
 optional_attrs = (('js_dependencies', tuple),
                   ('css_dependencies', tuple))
 
+# the hooks take a few milliseconds: buckets of 0.5 ms, up to 100 ms
+HOOK_HISTOGRAM_WIDTH = 0.0005
+
 
 class Plugin():
     default_on = False
@@ -52,10 +59,47 @@ class Plugin():
     description = 'Default plugin description'
 
 
+class PluginChain():
+    """Ordered plugins enabled for a request, with the functions of their hooks.
+
+    The functions of a hook are looked up once per chain: the requests with the
+    same enabled plugins share the same chain, see :py:meth:`PluginStore.get_chain`.
+    """
+
+    def __init__(self, plugins):
+        self.plugins = tuple(plugins)
+        self._hooks = {}
+        # (plugin, on_results or None, on_result or None, histogram)
+        self.result_hooks = tuple(
+            (plugin, getattr(plugin, 'on_results', None), getattr(plugin, 'on_result', None),
+             get_histogram('plugin', plugin.id, 'on_results' if hasattr(plugin, 'on_results') else 'on_result',
+                           width=HOOK_HISTOGRAM_WIDTH))
+            for plugin in self.plugins
+            if hasattr(plugin, 'on_results') or hasattr(plugin, 'on_result'))
+
+    def __iter__(self):
+        return iter(self.plugins)
+
+    def __len__(self):
+        return len(self.plugins)
+
+    def get_hooks(self, plugin_type):
+        """Return the (plugin, function, histogram) of the plugins implementing ``plugin_type``."""
+        hooks = self._hooks.get(plugin_type)
+        if hooks is None:
+            hooks = self._hooks[plugin_type] = tuple(
+                (plugin, getattr(plugin, plugin_type),
+                 get_histogram('plugin', plugin.id, plugin_type, width=HOOK_HISTOGRAM_WIDTH))
+                for plugin in self.plugins if hasattr(plugin, plugin_type))
+        return hooks
+
+
 class PluginStore():
 
     def __init__(self):
         self.plugins = []
+        # PluginChain by frozenset of plugin ids
+        self._chains = {}
 
     def __iter__(self):
         for plugin in self.plugins:
@@ -74,17 +118,69 @@ class PluginStore():
                     setattr(plugin, plugin_attr, plugin_attr_type())
             plugin.id = plugin.name.replace(' ', '_')
             self.plugins.append(plugin)
+        self._chains.clear()
+
+    def get_chain(self, plugin_ids):
+        """Return the :py:class:`PluginChain` of the plugins whose id is in the frozenset ``plugin_ids``."""
+        chain = self._chains.get(plugin_ids)
+        if chain is None:
+            chain = self._chains.setdefault(plugin_ids,
+                                            PluginChain(plugin for plugin in self.plugins if plugin.id in plugin_ids))
+        return chain
+
+    def get_user_chain(self, enabled_plugins, disabled_plugins):
+        """Return the chain of the plugins enabled by default or by the user, and not disabled by the user."""
+        return self.get_chain(frozenset(plugin.id for plugin in self.plugins
+                                        if (plugin.default_on and plugin.id not in disabled_plugins)
+                                        or plugin.id in enabled_plugins))
 
     def call(self, ordered_plugin_list, plugin_type, request, *args, **kwargs):
+        if not isinstance(ordered_plugin_list, PluginChain):
+            ordered_plugin_list = PluginChain(ordered_plugin_list)
         ret = True
-        for plugin in ordered_plugin_list:
-            if hasattr(plugin, plugin_type):
-                ret = getattr(plugin, plugin_type)(request, *args, **kwargs)
-                if not ret:
-                    break
+        for plugin, function, histogram in ordered_plugin_list.get_hooks(plugin_type):
+            start_time = default_timer()
+            with tracing.span('plugin', plugin=plugin.id, hook=plugin_type):
+                ret = function(request, *args, **kwargs)
+            histogram.observe(default_timer() - start_time)
+            if not ret:
+                break
 
         return ret
 
+    def call_on_results(self, ordered_plugin_list, request, search, results, states):
+        """Call the ``on_results`` hook of the plugins, or ``on_result`` for each result.
+
+        A result is passed to the next plugins only if it is returned by
+        ``on_results`` (or ``on_result`` returns True).  ``states`` stores the
+        value returned by the ``prepare`` hook of each plugin, called once per
+        search before the first call of ``on_results``.
+        """
+        if not isinstance(ordered_plugin_list, PluginChain):
+            ordered_plugin_list = PluginChain(ordered_plugin_list)
+        for plugin, on_results, on_result, histogram in ordered_plugin_list.result_hooks:
+            if not results:
+                break
+            start_time = default_timer()
+            with tracing.span('plugin', plugin=plugin.id, hook='on_results'):
+                if on_results is not None:
+                    if plugin.id not in states:
+                        states[plugin.id] = plugin.prepare(request, search) if hasattr(plugin, 'prepare') else None
+                    results = on_results(request, search, results, states[plugin.id])
+                else:
+                    results = [result for result in results if on_result(request, search, result)]
+            histogram.observe(default_timer() - start_time)
+
+    def get_stats(self, metrics=None):
+        """Number of calls and average duration of the plugin hooks, by default in the metrics of all the workers."""
+        if metrics is None:
+            metrics = get_metrics()
+        stats = []
+        for key, histogram in sorted(metrics.histograms.items(), key=lambda item: item[0]):
+            if key[0] == 'plugin' and histogram.count:
+                stats.append({'name': key[1], 'hook': key[2], 'count': histogram.count, 'average': histogram.average})
+        return stats
+
 
 def load_external_plugins(plugin_names):
     plugins = []
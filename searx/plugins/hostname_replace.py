@@ -26,3 +26,11 @@ def on_result(request, search, result):
             result['url'] = urlunparse(result[parsed])
 
     return True
+
+
+def on_results(request, search, results, state):
+    if not replacements:
+        return results
+    for result in results:
+        on_result(request, search, result)
+    return results
@@ -16,13 +16,13 @@ along with searx. If not, see < http://www.gnu.org/licenses/ >.
 '''
 
 import re
-from urllib.parse import urlparse
 from lxml import etree
 from os import listdir, environ
 from os.path import isfile, isdir, join
 from searx.plugins import logger
 from flask_babel import gettext
 from searx import searx_dir
+from searx.utils import parse_url
 
 
 name = "HTTPS rewrite"
@@ -43,11 +43,56 @@ logger = logger.getChild("https_rewrite")
 # HTTPS rewrite rules
 https_rules = []
 
+# index of the target hosts: trie of the labels of the hosts, from the right
+# (com -> example -> www).  The label '*' matches one or more labels, the key
+# None contains the rulesets of a host: (index in https_rules, pattern).  The
+# labels with a partial wildcard (www*) are indexed as '*': the pattern of the
+# host checks them, it is None for the other hosts.
+https_hosts = {}
+
+
+class Ruleset():
+    """Rules of a ruleset file.
+
+    The regular expressions are compiled the first time a result matches a
+    target of the ruleset: most of the rulesets are never used by a worker.
+    """
+
+    __slots__ = 'hosts', 'rule_sources', 'exclusion_sources', '_rules', '_exclusions'
+
+    def __init__(self, hosts, rule_sources, exclusion_sources):
+        self.hosts = hosts
+        self.rule_sources = rule_sources
+        self.exclusion_sources = exclusion_sources
+        self._rules = None
+        self._exclusions = None
+
+    @property
+    def rules(self):
+        if self._rules is None:
+            rules = []
+            for rule_from, rule_to in self.rule_sources:
+                try:
+                    rules.append((re.compile(rule_from, re.I | re.U), rule_to))
+                except re.error:
+                    logger.debug('invalid rule: %s', rule_from)
+            self._rules = rules
+        return self._rules
+
+    @property
+    def exclusions(self):
+        if self._exclusions is None:
+            try:
+                self._exclusions = [re.compile(pattern) for pattern in self.exclusion_sources]
+            except re.error:
+                logger.debug('invalid exclusion: %s', self.exclusion_sources)
+                # the empty pattern matches all the URLs: the ruleset is never applied
+                self._exclusions = [re.compile('')]
+        return self._exclusions
+
 
 # load single ruleset from a xml file
 def load_single_https_ruleset(rules_path):
-    ruleset = ()
-
     # init parser
     parser = etree.XMLParser()
 
@@ -56,7 +101,7 @@ def load_single_https_ruleset(rules_path):
         tree = etree.parse(rules_path, parser)
     except:
         # TODO, error message
-        return ()
+        return None
 
     # get root node
     root = tree.getroot()
@@ -64,15 +109,15 @@ def load_single_https_ruleset(rules_path):
     # check if root is a node with the name ruleset
     # TODO improve parsing
     if root.tag != 'ruleset':
-        return ()
+        return None
 
     # check if rule is deactivated by default
     if root.attrib.get('default_off'):
-        return ()
+        return None
 
     # check if rule does only work for specific platforms
     if root.attrib.get('platform'):
-        return ()
+        return None
 
     hosts = []
     rules = []
@@ -86,12 +131,8 @@ def load_single_https_ruleset(rules_path):
             if not ruleset.attrib.get('host'):
                 continue
 
-            # convert host-rule to valid regex
-            host = ruleset.attrib.get('host')\
-                .replace('.', r'\.').replace('*', '.*')
-
             # append to host list
-            hosts.append(host)
+            hosts.append(ruleset.attrib['host'].lower())
 
         # this child define a rule
         elif ruleset.tag == 'rule':
@@ -109,16 +150,8 @@ def load_single_https_ruleset(rules_path):
             if rule_to.endswith('\\'):
                 rule_to = rule_to[:-1] + '$'
 
-            # TODO, not working yet because of the hack above,
-            # currently doing that in webapp.py
-            # rule_from_rgx = re.compile(rule_from, re.I)
-
             # append rule
-            try:
-                rules.append((re.compile(rule_from, re.I | re.U), rule_to))
-            except:
-                # TODO log regex error
-                continue
+            rules.append((rule_from, rule_to))
 
         # this child define an exclusion
         elif ruleset.tag == 'exclusion':
@@ -126,20 +159,56 @@ def load_single_https_ruleset(rules_path):
             if not ruleset.attrib.get('pattern'):
                 continue
 
-            exclusion_rgx = re.compile(ruleset.attrib.get('pattern'))
-
             # append exclusion
-            exclusions.append(exclusion_rgx)
-
-    # convert list of possible hosts to a simple regex
-    # TODO compress regex to improve performance
-    try:
-        target_hosts = re.compile('^(' + '|'.join(hosts) + ')', re.I | re.U)
-    except:
-        return ()
+            exclusions.append(ruleset.attrib['pattern'])
 
     # return ruleset
-    return (target_hosts, rules, exclusions)
+    return Ruleset(hosts, rules, exclusions)
+
+
+def _get_host_pattern(host):
+    # same as the trie: '*' matches one or more labels, in a label it matches any characters but a dot
+    labels = ['.+' if label == '*' else '[^.]*'.join(re.escape(part) for part in label.split('*'))
+              for label in host.split('.')]
+    return re.compile(r'\.'.join(labels) + '$')
+
+
+def add_https_host(host, ruleset_index):
+    node = https_hosts
+    pattern = None
+    for label in reversed(host.split('.')):
+        if '*' in label:
+            if label != '*':
+                pattern = _get_host_pattern(host)
+            label = '*'
+        node = node.setdefault(label, {})
+    node.setdefault(None, []).append((ruleset_index, pattern))
+
+
+def _get_ruleset_indexes(node, labels, ruleset_indexes):
+    if not labels:
+        ruleset_indexes.extend(node.get(None, ()))
+        return
+    child = node.get(labels[0])
+    if child is not None:
+        _get_ruleset_indexes(child, labels[1:], ruleset_indexes)
+    child = node.get('*')
+    if child is not None:
+        # '*' matches one or more labels
+        for i in range(1, len(labels) + 1):
+            _get_ruleset_indexes(child, labels[i:], ruleset_indexes)
+
+
+def get_https_ruleset(hostname):
+    """Return the first ruleset with a target matching ``hostname``, None if there is none."""
+    hostname = hostname.lower()
+    ruleset_indexes = []
+    _get_ruleset_indexes(https_hosts, list(reversed(hostname.split('.'))), ruleset_indexes)
+    ruleset_indexes = [ruleset_index for ruleset_index, pattern in ruleset_indexes
+                       if pattern is None or pattern.match(hostname)]
+    if not ruleset_indexes:
+        return None
+    return https_rules[min(ruleset_indexes)]
 
 
 # load all https rewrite rules
@@ -163,61 +232,59 @@ def load_https_rules(rules_path):
         if not ruleset:
             continue
 
-        # append ruleset
+        # append ruleset and index its hosts
+        for host in ruleset.hosts:
+            add_https_host(host, len(https_rules))
         https_rules.append(ruleset)
 
     logger.info('{n} rules loaded'.format(n=len(https_rules)))
 
 
 def https_url_rewrite(result):
-    skip_https_rewrite = False
-    # check if HTTPS rewrite is possible
-    for target, rules, exclusions in https_rules:
-
-        # check if target regex match with url
-        if target.match(result['parsed_url'].netloc):
-            # process exclusions
-            for exclusion in exclusions:
-                # check if exclusion match with url
-                if exclusion.match(result['url']):
-                    skip_https_rewrite = True
-                    break
-
-            # skip https rewrite if required
-            if skip_https_rewrite:
-                break
-
-            # process rules
-            for rule in rules:
-                try:
-                    new_result_url = rule[0].sub(rule[1], result['url'])
-                except:
-                    break
-
-                # parse new url
-                new_parsed_url = urlparse(new_result_url)
-
-                # continiue if nothing was rewritten
-                if result['url'] == new_result_url:
-                    continue
-
-                # get domainname from result
-                # TODO, does only work correct with TLD's like
-                #  asdf.com, not for asdf.com.de
-                # TODO, using publicsuffix instead of this rewrite rule
-                old_result_domainname = '.'.join(
-                    result['parsed_url'].hostname.split('.')[-2:])
-                new_result_domainname = '.'.join(
-                    new_parsed_url.hostname.split('.')[-2:])
-
-                # check if rewritten hostname is the same,
-                # to protect against wrong or malicious rewrite rules
-                if old_result_domainname == new_result_domainname:
-                    # set new url
-                    result['url'] = new_result_url
-
-            # target has matched, do not search over the other rules
+    hostname = result['parsed_url'].hostname
+    if not hostname:
+        return result
+
+    # get the ruleset of the host
+    ruleset = get_https_ruleset(hostname)
+    if ruleset is None:
+        return result
+
+    # process exclusions
+    for exclusion in ruleset.exclusions:
+        # check if exclusion match with url
+        if exclusion.match(result['url']):
+            return result
+
+    # process rules
+    for rule in ruleset.rules:
+        try:
+            new_result_url = rule[0].sub(rule[1], result['url'])
+        except:
             break
+
+        # parse new url
+        new_parsed_url = parse_url(new_result_url)
+
+        # continiue if nothing was rewritten
+        if result['url'] == new_result_url:
+            continue
+
+        # get domainname from result
+        # TODO, does only work correct with TLD's like
+        #  asdf.com, not for asdf.com.de
+        # TODO, using publicsuffix instead of this rewrite rule
+        old_result_domainname = '.'.join(
+            result['parsed_url'].hostname.split('.')[-2:])
+        new_result_domainname = '.'.join(
+            new_parsed_url.hostname.split('.')[-2:])
+
+        # check if rewritten hostname is the same,
+        # to protect against wrong or malicious rewrite rules
+        if old_result_domainname == new_result_domainname:
+            # set new url
+            result['url'] = new_result_url
+
     return result
 
 
@@ -230,4 +297,10 @@ def on_result(request, search, result):
     return True
 
 
+def on_results(request, search, results, state):
+    for result in results:
+        on_result(request, search, result)
+    return results
+
+
 load_https_rules(rules_path)
@@ -1,7 +1,8 @@
-from urllib.parse import urlparse, parse_qsl
+from urllib.parse import parse_qsl
 from flask_babel import gettext
 import re
 from searx import settings
+from searx.utils import parse_url
 
 
 regex = re.compile(r'10\.\d{4,9}/[^\s]+')
@@ -34,15 +35,28 @@ def get_doi_resolver(args, preference_doi_resolver):
     return doi_resolver_url
 
 
-def on_result(request, search, result):
-    if 'parsed_url' not in result:
-        return True
+def prepare(request, search):
+    return get_doi_resolver(request.args, request.preferences.get_value('doi_resolver'))
+
 
+def rewrite(result, doi_resolver_url):
+    if 'parsed_url' not in result:
+        return
     doi = extract_doi(result['parsed_url'])
     if doi and len(doi) < 50:
         for suffix in ('/', '.pdf', '.xml', '/full', '/meta', '/abstract'):
             if doi.endswith(suffix):
                 doi = doi[:-len(suffix)]
-        result['url'] = get_doi_resolver(request.args, request.preferences.get_value('doi_resolver')) + doi
-        result['parsed_url'] = urlparse(result['url'])
+        result['url'] = doi_resolver_url + doi
+        result['parsed_url'] = parse_url(result['url'])
+
+
+def on_result(request, search, result):
+    rewrite(result, prepare(request, search))
     return True
+
+
+def on_results(request, search, results, doi_resolver_url):
+    for result in results:
+        rewrite(result, doi_resolver_url)
+    return results
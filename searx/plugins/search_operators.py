@@ -9,7 +9,7 @@ Please note that you might get less results with the additional filtering.""")
 default_on = False
 
 
-def on_result(request, search, result):
+def prepare(request, search):
     q = search.search_query.query
     # WARN: shlex.quote is designed only for Unix shells and may be vulnerable
     # to command injection on non-POSIX compliant shells (Windows)
@@ -20,6 +20,11 @@ def on_result(request, search, result):
     mitems = [x.lower() for x in qs if x.startswith('-')]
     siteitems = [x.lower() for x in qs if x.startswith('site:')]
     msiteitems = [x.lower() for x in qs if x.startswith('-site:')]
+    return spitems, mitems, siteitems, msiteitems
+
+
+def match(result, operators):
+    spitems, mitems, siteitems, msiteitems = operators
     url, title, content = (
         result["url"].lower(),
         result["title"].lower(),
@@ -34,3 +39,11 @@ def on_result(request, search, result):
     if all(x in url for x in msiteitems):
         return False
     return True
+
+
+def on_result(request, search, result):
+    return match(result, prepare(request, search))
+
+
+def on_results(request, search, results, operators):
+    return [result for result in results if match(result, operators)]
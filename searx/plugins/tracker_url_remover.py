@@ -51,3 +51,9 @@ def on_result(request, search, result):
                 break
 
     return True
+
+
+def on_results(request, search, results, state):
+    for result in results:
+        on_result(request, search, result)
+    return results
@@ -1,9 +1,17 @@
+import os
 import sys
+from collections.abc import Mapping
+from http.cookiejar import CookieJar, DefaultCookiePolicy
 from time import time
 from itertools import cycle
-from threading import local
+from threading import local, Lock
+from urllib.parse import urlencode
 
 import requests
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 from searx import settings
 from searx import logger
@@ -68,18 +76,176 @@ class HTTPAdapterWithConnParams(requests.adapters.HTTPAdapter):
 
 
 threadLocal = local()
-connect = settings['outgoing'].get('pool_connections', 100)  # Magic number kept from previous code
-maxsize = settings['outgoing'].get('pool_maxsize', requests.adapters.DEFAULT_POOLSIZE)  # Picked from constructor
-if settings['outgoing'].get('source_ips'):
-    http_adapters = cycle(HTTPAdapterWithConnParams(pool_connections=connect, pool_maxsize=maxsize,
-                                                    source_address=(source_ip, 0))
-                          for source_ip in settings['outgoing']['source_ips'])
-    https_adapters = cycle(HTTPAdapterWithConnParams(pool_connections=connect, pool_maxsize=maxsize,
-                                                     source_address=(source_ip, 0))
-                           for source_ip in settings['outgoing']['source_ips'])
-else:
-    http_adapters = cycle((HTTPAdapterWithConnParams(pool_connections=connect, pool_maxsize=maxsize), ))
-    https_adapters = cycle((HTTPAdapterWithConnParams(pool_connections=connect, pool_maxsize=maxsize), ))
+
+http_backend = settings['outgoing'].get('http_backend', 'requests')
+if http_backend == 'httpx' and httpx is None:
+    logger.error('outgoing.http_backend: the httpx package is not installed, use requests')
+    http_backend = 'requests'
+elif http_backend not in ('requests', 'httpx'):
+    logger.critical('outgoing.http_backend has to be "requests" or "httpx"')
+    sys.exit(1)
+try:
+    import h2  # pylint: disable=unused-import
+    http2_available = True
+except ImportError:
+    http2_available = False
+if http_backend == 'httpx' and settings['outgoing'].get('http2', True) and not http2_available:
+    logger.error('outgoing.http2: the h2 package is not installed, use HTTP/1.1')
+
+
+def get_proxy_cycles(proxy_settings):
+    if not proxy_settings:
+        return None
+    # Backwards compatibility for single proxy in settings.yml
+    for protocol, proxy in proxy_settings.items():
+        if isinstance(proxy, str):
+            proxy_settings[protocol] = [proxy]
+
+    for protocol in proxy_settings:
+        proxy_settings[protocol] = cycle(proxy_settings[protocol])
+    return proxy_settings
+
+
+GLOBAL_PROXY_CYCLES = get_proxy_cycles(settings['outgoing'].get('proxies'))
+
+
+def get_proxies(proxy_cycles):
+    if proxy_cycles:
+        return {protocol: next(proxy_cycle) for protocol, proxy_cycle in proxy_cycles.items()}
+    return None
+
+
+def get_global_proxies():
+    return get_proxies(GLOBAL_PROXY_CYCLES)
+
+
+class Network:
+    """Connection settings and pools of a network profile, see ``outgoing.networks``.
+
+    With the requests backend, the engines of a network share its adapters.
+    With the httpx backend, each engine has its own pool of at most
+    ``pool_maxsize`` connections, like the pool of a host with requests.
+    """
+
+    def __init__(self, name, pool_connections=100, pool_maxsize=requests.adapters.DEFAULT_POOLSIZE,
+                 keepalive_expiry=5.0, http2=True, source_ips=None, proxies=None, retries=0, request_timeout=None):
+        self.name = name
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and http2_available
+        self.retries = retries
+        self.request_timeout = request_timeout
+        self.proxy_cycles = get_proxy_cycles(proxies)
+        self.source_ips = cycle(source_ips) if source_ips else None
+        self.http_adapters = self._new_adapters(source_ips)
+        self.https_adapters = self._new_adapters(source_ips)
+        self.clients = {}
+        self.clients_pid = None
+        self.request_count = 0
+        self.active_count = 0
+        self.max_active_count = 0
+        self._lock = Lock()
+
+    def _new_adapters(self, source_ips):
+        conn_params = [{'source_address': (source_ip, 0)} for source_ip in source_ips] if source_ips else [{}]
+        return cycle([HTTPAdapterWithConnParams(pool_connections=self.pool_connections,
+                                                pool_maxsize=self.pool_maxsize,
+                                                max_retries=self.retries,
+                                                **params)
+                      for params in conn_params])
+
+    def get_proxies(self):
+        """Proxies of the next request, the global proxies if the network has none."""
+        if self.proxy_cycles:
+            return get_proxies(self.proxy_cycles)
+        return get_global_proxies()
+
+    def new_transport(self, verify, proxy_url=None):
+        # the idle connections are closed after keepalive_expiry seconds
+        limits = httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize,
+                              keepalive_expiry=self.keepalive_expiry)
+        return httpx.HTTPTransport(verify=verify, http2=self.http2, limits=limits, retries=self.retries,
+                                   proxy=httpx.Proxy(proxy_url) if proxy_url else None,
+                                   local_address=next(self.source_ips) if self.source_ips else None)
+
+    def get_client(self, pool_name, verify, proxies, max_redirects):
+        """Return the httpx client of ``pool_name``, create it if required."""
+        proxies = proxies or {}
+        key = (pool_name, verify, tuple(sorted(proxies.items())), max_redirects)
+        with self._lock:
+            if self.clients_pid != os.getpid():
+                # the connections opened by the parent process can't be shared
+                self.clients.clear()
+                self.clients_pid = os.getpid()
+            client = self.clients.get(key)
+            if client is None:
+                mounts = {
+                    (protocol if '://' in protocol else protocol + '://'): self.new_transport(verify, proxy_url)
+                    for protocol, proxy_url in proxies.items()
+                }
+                # the client is shared by the requests of all the users: never keep the cookies
+                client = httpx.Client(transport=self.new_transport(verify), mounts=mounts, max_redirects=max_redirects,
+                                      cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])))
+                self.clients[key] = client
+            return client
+
+    def request_started(self):
+        with self._lock:
+            self.request_count += 1
+            self.active_count += 1
+            self.max_active_count = max(self.max_active_count, self.active_count)
+
+    def request_done(self):
+        with self._lock:
+            self.active_count -= 1
+
+    def get_stats(self):
+        return {
+            'name': self.name,
+            # maximum number of connections to a host, not to the whole network
+            'pool_maxsize': self.pool_maxsize,
+            'request_count': self.request_count,
+            'active_count': self.active_count,
+            'max_active_count': self.max_active_count,
+        }
+
+
+def _new_networks(outgoing):
+    # the networks inherit the settings of outgoing
+    default_settings = {
+        'pool_connections': outgoing.get('pool_connections', 100),  # Magic number kept from previous code
+        'pool_maxsize': outgoing.get('pool_maxsize', requests.adapters.DEFAULT_POOLSIZE),  # Picked from constructor
+        'keepalive_expiry': outgoing.get('keepalive_expiry', 5.0),
+        'http2': outgoing.get('http2', True),
+        'source_ips': outgoing.get('source_ips'),
+        'retries': outgoing.get('retries', 0),
+    }
+    result = {'default': Network('default', **default_settings)}
+    for name, network_settings in (outgoing.get('networks') or {}).items():
+        try:
+            result[name] = Network(name, **dict(default_settings, **(network_settings or {})))
+        except TypeError as e:
+            logger.critical('outgoing.networks.{}: {}'.format(name, e))
+            sys.exit(1)
+    return result
+
+
+networks = _new_networks(settings['outgoing'])
+
+
+def get_network(name):
+    """Return the network ``name``, None if it is not defined in ``outgoing.networks``."""
+    return networks.get(name)
+
+
+def get_network_for_thread():
+    return getattr(threadLocal, 'network', None) or networks['default']
+
+
+def get_stats():
+    """Statistics of the networks which have sent at least one request."""
+    return [network.get_stats() for network in networks.values() if network.request_count]
 
 
 class SessionSinglePool(requests.Session):
@@ -90,10 +256,11 @@ class SessionSinglePool(requests.Session):
         # reuse the same adapters
         self.adapters.clear()
 
-        https_adapter = threadLocal.__dict__.setdefault('https_adapter', next(https_adapters))
+        network = get_network_for_thread()
+        https_adapter = threadLocal.__dict__.setdefault('https_adapter_' + network.name, next(network.https_adapters))
         self.mount('https://', https_adapter)
         if get_enable_http_protocol():
-            http_adapter = threadLocal.__dict__.setdefault('http_adapter', next(http_adapters))
+            http_adapter = threadLocal.__dict__.setdefault('http_adapter_' + network.name, next(network.http_adapters))
             self.mount('http://', http_adapter)
 
     def close(self):
@@ -102,6 +269,135 @@ class SessionSinglePool(requests.Session):
         super().close()
 
 
+def set_pool_for_thread(pool_name, network_name='default'):
+    """The requests of the current thread use the network ``network_name``.
+
+    With the httpx backend, they use the connections of ``pool_name`` in this network.
+    """
+    threadLocal.pool_name = pool_name
+    threadLocal.network = networks[network_name]
+
+
+def convert_httpx_exception(e):
+    """Return the requests exception equivalent to the httpx exception ``e``."""
+    message = str(e)
+    if isinstance(e, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(message)
+    if isinstance(e, httpx.ReadTimeout):
+        return requests.exceptions.ReadTimeout(message)
+    if isinstance(e, httpx.TimeoutException):
+        return requests.exceptions.Timeout(message)
+    if isinstance(e, httpx.ProxyError):
+        return requests.exceptions.ProxyError(message)
+    if isinstance(e, httpx.ConnectError):
+        cause = e.__context__
+        while cause is not None:
+            if ssl is not None and isinstance(cause, ssl.SSLError):
+                return requests.exceptions.SSLError(message)
+            cause = cause.__context__
+        return requests.exceptions.ConnectionError(message)
+    if isinstance(e, httpx.TooManyRedirects):
+        return requests.exceptions.TooManyRedirects(message)
+    if isinstance(e, httpx.UnsupportedProtocol):
+        return requests.exceptions.InvalidSchema(message)
+    if isinstance(e, httpx.DecodingError):
+        return requests.exceptions.ContentDecodingError(message)
+    if isinstance(e, httpx.NetworkError):
+        return requests.exceptions.ConnectionError(message)
+    return requests.exceptions.RequestException(message)
+
+
+def convert_httpx_response(httpx_response):
+    """Return a :py:class:`requests.Response` with the content of ``httpx_response``."""
+    response = requests.Response()
+    response.status_code = httpx_response.status_code
+    response.reason = httpx_response.reason_phrase
+    response.headers = requests.structures.CaseInsensitiveDict(httpx_response.headers.multi_items())
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.url = str(httpx_response.url)
+    response._content = httpx_response.content  # pylint: disable=protected-access
+    response.cookies = requests.cookies.cookiejar_from_dict(dict(httpx_response.cookies))
+    response.history = [convert_httpx_response(r) for r in httpx_response.history]
+
+    request = requests.PreparedRequest()
+    request.method = httpx_response.request.method
+    request.url = str(httpx_response.request.url)
+    request.headers = requests.structures.CaseInsensitiveDict(httpx_response.request.headers.multi_items())
+    response.request = request
+    return response
+
+
+# arguments of requests.request without an equivalent in httpx_request
+REQUESTS_ONLY_ARGUMENTS = ('stream', 'cert')
+
+
+def httpx_request(method, url, **kwargs):
+    """Send the request with httpx, accept the arguments of :py:func:`requests.request`.
+
+    The redirects are followed here: the cookies set by a redirect response are
+    sent to the next URL, like requests does.  The arguments of
+    ``REQUESTS_ONLY_ARGUMENTS`` are not supported, :py:func:`request` sends
+    these requests with requests.
+    """
+    if not get_enable_http_protocol() and url.lower().startswith('http://'):
+        # same as requests without a mounted adapter
+        raise requests.exceptions.InvalidSchema('No connection adapters were found for {!r}'.format(url))
+
+    client = get_network_for_thread().get_client(getattr(threadLocal, 'pool_name', None),
+                                                 kwargs.pop('verify', True), kwargs.pop('proxies', None),
+                                                 kwargs.pop('max_redirects', None)
+                                                 or requests.models.DEFAULT_REDIRECT_LIMIT)
+
+    request_args = {
+        'headers': {k: v for k, v in (kwargs.get('headers') or {}).items() if v is not None},
+        'params': kwargs.get('params'),
+        'json': kwargs.get('json'),
+        'files': kwargs.get('files'),
+    }
+    follow_redirects = kwargs.get('follow_redirects', kwargs.get('allow_redirects', True))
+
+    # the cookies of this request only: the client never keeps them
+    cookies = kwargs.get('cookies')
+    if isinstance(cookies, CookieJar):
+        cookies = requests.utils.dict_from_cookiejar(cookies)
+    cookies = httpx.Cookies(cookies)
+
+    data = kwargs.get('data')
+    if isinstance(data, (str, bytes)):
+        request_args['content'] = data
+    elif data and not isinstance(data, Mapping):
+        # list of tuples
+        request_args['content'] = urlencode(data)
+        request_args['headers'].setdefault('Content-Type', 'application/x-www-form-urlencoded')
+    elif data:
+        request_args['data'] = data
+
+    timeout = kwargs.get('timeout')
+    if isinstance(timeout, tuple):
+        connect_timeout, read_timeout = timeout
+        request_args['timeout'] = httpx.Timeout(read_timeout, connect=connect_timeout)
+    else:
+        request_args['timeout'] = httpx.Timeout(timeout)
+
+    try:
+        outgoing_request = client.build_request(method.upper(), url, cookies=cookies, **request_args)
+        history = []
+        while True:
+            httpx_response = client.send(outgoing_request, auth=kwargs.get('auth'), follow_redirects=False)
+            if not follow_redirects or httpx_response.next_request is None:
+                break
+            history.append(httpx_response)
+            if len(history) > client.max_redirects:
+                raise httpx.TooManyRedirects('Exceeded maximum allowed redirects.', request=outgoing_request)
+            cookies.extract_cookies(httpx_response)
+            outgoing_request = httpx_response.next_request
+            cookies.set_cookie_header(outgoing_request)
+        httpx_response.history = history
+    except httpx.HTTPError as e:
+        raise convert_httpx_exception(e) from e
+    return convert_httpx_response(httpx_response)
+
+
 def set_timeout_for_thread(timeout, start_time=None):
     threadLocal.timeout = timeout
     threadLocal.start_time = start_time
@@ -126,42 +422,35 @@ def get_time_for_thread():
     return threadLocal.total_time
 
 
-def get_proxy_cycles(proxy_settings):
-    if not proxy_settings:
-        return None
-    # Backwards compatibility for single proxy in settings.yml
-    for protocol, proxy in proxy_settings.items():
-        if isinstance(proxy, str):
-            proxy_settings[protocol] = [proxy]
+def add_time_for_thread(duration):
+    threadLocal.total_time += duration
 
-    for protocol in proxy_settings:
-        proxy_settings[protocol] = cycle(proxy_settings[protocol])
-    return proxy_settings
 
+# the adapters are not copied: another thread may use another source IP
+_CONTEXT_ATTRIBUTES = ('timeout', 'start_time', 'enable_http', 'pool_name', 'network')
 
-GLOBAL_PROXY_CYCLES = get_proxy_cycles(settings['outgoing'].get('proxies'))
 
+def get_context_for_thread():
+    """Return the settings of the requests of the current thread, see :py:func:`set_context_for_thread`."""
+    return {name: getattr(threadLocal, name) for name in _CONTEXT_ATTRIBUTES if hasattr(threadLocal, name)}
 
-def get_proxies(proxy_cycles):
-    if proxy_cycles:
-        return {protocol: next(proxy_cycle) for protocol, proxy_cycle in proxy_cycles.items()}
-    return None
 
-
-def get_global_proxies():
-    return get_proxies(GLOBAL_PROXY_CYCLES)
+def set_context_for_thread(context):
+    """Send the requests of the current thread with the settings of another thread."""
+    for name, value in context.items():
+        setattr(threadLocal, name, value)
+    threadLocal.total_time = 0
 
 
 def request(method, url, **kwargs):
     """same as requests/requests/api.py request(...)"""
     time_before_request = time()
 
-    # session start
-    session = SessionSinglePool()
+    network = get_network_for_thread()
 
     # proxies
     if not kwargs.get('proxies'):
-        kwargs['proxies'] = get_global_proxies()
+        kwargs['proxies'] = network.get_proxies()
 
     # timeout
     if 'timeout' in kwargs:
@@ -178,7 +467,16 @@ def request(method, url, **kwargs):
         del kwargs['raise_for_httperror']
 
     # do request
-    response = session.request(method=method, url=url, **kwargs)
+    network.request_started()
+    try:
+        if http_backend == 'httpx' and not any(kwargs.get(name) for name in REQUESTS_ONLY_ARGUMENTS):
+            response = httpx_request(method, url, **kwargs)
+        else:
+            session = SessionSinglePool()
+            response = session.request(method=method, url=url, **kwargs)
+            session.close()
+    finally:
+        network.request_done()
 
     time_after_request = time()
 
@@ -191,9 +489,6 @@ def request(method, url, **kwargs):
         if search_duration > timeout + timeout_overhead:
             raise requests.exceptions.Timeout(response=response)
 
-    # session end
-    session.close()
-
     if hasattr(threadLocal, 'total_time'):
         threadLocal.total_time += time_after_request - time_before_request
 
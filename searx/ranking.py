@@ -0,0 +1,134 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Ranking of the merged results (``search.ranking``).
+
+The score of the results is computed by a pipeline of stages.  Each stage is a
+function called once with all the results of a search::
+
+    def stage(results, weights, language):
+        ...
+
+``weights`` contains one float per result, 1.0 at the beginning: a stage
+multiplies the weights of the results it favours or penalises.  Once all the
+stages have run, the score of each result is computed from its positions in
+the answers of the engines::
+
+    score = sum(occurrences * weight / position for position in positions)
+
+``search.ranking`` is the list of the stages: the name of a built-in stage (see
+:py:data:`builtin_stages`) or the full name of a function, for example
+``mypackage.ranking.domain_reputation``.  The duration of each stage is
+reported on the ``/stats`` page.
+"""
+
+import sys
+from importlib import import_module
+from timeit import default_timer
+
+from searx import logger, settings
+from searx.engines import engines
+from searx.metrology.aggregation import get_metrics
+from searx.metrology.histogram import get_histogram
+
+
+logger = logger.getChild('ranking')
+
+# the stages take a few milliseconds: buckets of 0.5 ms, up to 100 ms
+STAGE_HISTOGRAM_WIDTH = 0.0005
+
+
+def engine_weight(results, weights, language):
+    """Multiply the weight of the results by the ``weight`` of their engines."""
+    engine_weights = {}
+    for i, result in enumerate(results):
+        weight = 1.0
+        for engine_name in result['engines']:
+            weight_of_engine = engine_weights.get(engine_name)
+            if weight_of_engine is None:
+                weight_of_engine = engine_weights[engine_name] = float(getattr(engines[engine_name], 'weight', 1.0))
+            weight *= weight_of_engine
+        weights[i] *= weight
+
+
+def configured_language(results, weights, language):
+    """Favour the results of a domain containing the language, for example ``fr.wikipedia.org``."""
+    for i, result in enumerate(results):
+        if 'parsed_url' in result and language in result['parsed_url'].netloc.split('.'):
+            weights[i] *= 1.1
+
+
+builtin_stages = {
+    'engine_weight': engine_weight,
+    'configured_language': configured_language,
+}
+
+
+class RankingPipeline:
+    """Stages computing the score of the results."""
+
+    def __init__(self, stages):
+        # list of (name, function)
+        self.stages = stages
+
+    def score(self, results, language):
+        """Set the ``score`` of the results."""
+        weights = [1.0] * len(results)
+        for name, stage in self.stages:
+            start_time = default_timer()
+            stage(results, weights, language)
+            get_histogram('ranking', name, width=STAGE_HISTOGRAM_WIDTH).observe(default_timer() - start_time)
+
+        start_time = default_timer()
+        for result, weight in zip(results, weights):
+            positions = result['positions']
+            occurrences = len(positions)
+            result['score'] = sum((occurrences * weight) / position for position in positions)
+        get_histogram('ranking', 'score', width=STAGE_HISTOGRAM_WIDTH).observe(default_timer() - start_time)
+
+    def get_stats(self, metrics=None):
+        """Number of calls and average duration of each stage, by default in the metrics of all the workers."""
+        if metrics is None:
+            metrics = get_metrics()
+        stats = []
+        for name in [name for name, _ in self.stages] + ['score']:
+            histogram = metrics.get_histogram('ranking', name)
+            if histogram.count:
+                stats.append({'name': name, 'count': histogram.count, 'average': histogram.average})
+        return stats
+
+
+def get_stage(name):
+    """Return the function of the stage ``name``.
+
+    :raise ValueError: the stage does not exist
+    """
+    if name in builtin_stages:
+        return builtin_stages[name]
+    if '.' not in name:
+        raise ValueError('unknown stage "{0}"'.format(name))
+    module_name, function_name = name.rsplit('.', 1)
+    try:
+        return getattr(import_module(module_name), function_name)
+    except (ImportError, AttributeError) as e:
+        raise ValueError('can\'t load stage "{0}": {1}'.format(name, e)) from e
+
+
+def get_pipeline(stage_names):
+    return RankingPipeline([(name, get_stage(name)) for name in stage_names])
+
+
+def get_default_stage_names():
+    stage_names = ['engine_weight']
+    if settings['search'].get('prefer_configured_language', False):
+        stage_names.append('configured_language')
+    return stage_names
+
+
+try:
+    pipeline = get_pipeline(settings['search'].get('ranking') or get_default_stage_names())
+except ValueError as e:
+    logger.critical('search.ranking: {0}'.format(e))
+    sys.exit(1)
+
+
+def get_stats(metrics=None):
+    return pipeline.get_stats(metrics)
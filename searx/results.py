@@ -1,13 +1,16 @@
 import re
-from collections import defaultdict
+from collections import defaultdict, deque
+from collections.abc import MutableMapping
 from operator import itemgetter
 from threading import RLock
-from urllib.parse import urlparse, unquote
+from urllib.parse import unquote
 from searx import logger
 from searx.engines import engines
+from searx.metrology import tracing
+from searx.metrology.counter import get_counter
 from searx.metrology.error_recorder import record_error
-from searx.utils import add_scheme_to_url
-from searx import settings
+from searx.utils import add_scheme_to_url, parse_url
+from searx import ranking
 
 
 CONTENT_LEN_IGNORED_CHARS_REGEX = re.compile(r'[,;:!?\./\\\\ ()-_]', re.M | re.U)
@@ -59,7 +62,46 @@ def compare_urls(url_a, url_b):
     return unquote(path_a) == unquote(path_b)
 
 
-def merge_two_infoboxes(infobox1, infobox2):
+def get_url_key(parsed_url):
+    """Key of an URL: two URLs have the same key if and only if :py:func:`compare_urls` returns True.
+
+    Args:
+        parsed_url (ParseResult): URL
+
+    Returns:
+        tuple: host without www., unquoted path without the trailing /, query and fragment
+    """
+    host = parsed_url.netloc
+    if host.startswith('www.'):
+        host = host[4:]
+    path = parsed_url.path
+    if path.endswith('/'):
+        path = path[:-1]
+    return host, unquote(path), parsed_url.query, parsed_url.fragment
+
+
+def get_infobox_url_index(urls):
+    """Index of the URLs of an infobox, see :py:func:`merge_two_infoboxes`.
+
+    Returns:
+        tuple: set of the keys of the URLs (see :py:func:`get_url_key`), set of their entities
+    """
+    url_keys = set()
+    entities = set()
+    for url in urls:
+        url_keys.add(get_url_key(parse_url(url.get('url', ''))))
+        if url.get('entity') is not None:
+            entities.add(url['entity'])
+    return url_keys, entities
+
+
+def merge_two_infoboxes(infobox1, infobox2, url_index=None):
+    """Merge infobox2 into infobox1.
+
+    ``url_index`` is the index of the URLs of infobox1 returned by
+    :py:func:`get_infobox_url_index`, it is updated with the URLs added to
+    infobox1.  If None, it is computed from infobox1.
+    """
     # get engines weights
     if hasattr(engines[infobox1['engine']], 'weight'):
         weight1 = engines[infobox1['engine']].weight
@@ -79,18 +121,19 @@ def merge_two_infoboxes(infobox1, infobox2):
         urls1 = infobox1.get('urls', None)
         if urls1 is None:
             urls1 = []
+        if url_index is None:
+            url_index = get_infobox_url_index(urls1)
+        url_keys, entities = url_index
 
         for url2 in infobox2.get('urls', []):
-            unique_url = True
-            parsed_url2 = urlparse(url2.get('url', ''))
+            url_key2 = get_url_key(parse_url(url2.get('url', '')))
             entity_url2 = url2.get('entity')
-            for url1 in urls1:
-                if (entity_url2 is not None and url1.get('entity') == entity_url2)\
-                   or compare_urls(urlparse(url1.get('url', '')), parsed_url2):
-                    unique_url = False
-                    break
-            if unique_url:
-                urls1.append(url2)
+            if url_key2 in url_keys or (entity_url2 is not None and entity_url2 in entities):
+                continue
+            urls1.append(url2)
+            url_keys.add(url_key2)
+            if entity_url2 is not None:
+                entities.add(entity_url2)
 
         infobox1['urls'] = urls1
 
@@ -131,34 +174,148 @@ def merge_two_infoboxes(infobox1, infobox2):
             infobox1['content'] = content2
 
 
-def result_score(result, language):
-    weight = 1.0
+class Result(MutableMapping):
+    """Standard result, with the interface of a dict.
+
+    The usual keys are stored in slots, the other ones in a dict created only
+    when required: a result takes less memory than a dict with the same keys.
+    """
+
+    __slots__ = 'url', 'parsed_url', 'title', 'content', 'engine', 'engines', 'positions', 'score', 'category',\
+                'template', 'img_src', 'thumbnail_src', 'thumbnail', 'publishedDate', 'pubdate', 'pretty_url',\
+                'is_onion', '_extra'
+
+    def __init__(self, result=None):
+        self._extra = None
+        if result is not None:
+            for key, value in result.items():
+                self[key] = value
+
+    def __getitem__(self, key):
+        if key in _RESULT_KEY_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _RESULT_KEY_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _RESULT_KEY_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key):
+        if key in _RESULT_KEY_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in _RESULT_KEYS:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return 'Result({!r})'.format(dict(self))
+
+    def copy(self):
+        return Result(self)
+
 
-    for result_engine in result['engines']:
-        if hasattr(engines[result_engine], 'weight'):
-            weight *= float(engines[result_engine].weight)
+_RESULT_KEYS = tuple(key for key in Result.__slots__ if key != '_extra')
+_RESULT_KEY_SET = frozenset(_RESULT_KEYS)
 
-    if settings['search'].get('prefer_configured_language', False):
-        domain_parts = result['parsed_url'].netloc.split('.')
-        if language in domain_parts:
-            weight *= 1.1
 
-    occurrences = len(result['positions'])
+def get_group_key(result):
+    return result['category']\
+        + ':' + result.get('template', '')\
+        + ':' + ('img_src' if 'img_src' in result or 'thumbnail' in result else '')
 
-    return sum((occurrences * weight) / position for position in result['positions'])
+
+def group_results(results):
+    """Group the results by category and template, keep the order otherwise.
+
+    A result is moved to the end of the previous group of the same category, if
+    the group has less than 9 results and is followed by less than 20 results.
+    Otherwise the result starts a new group.
+
+    The groups are kept in separate lists: a result is added without moving the
+    others, and counting the results after a group looks at 20 groups at most.
+    """
+    groups = []
+    # group key -> [group index, number of results the group can still accept]
+    open_groups = {}
+
+    for result in results:
+        group_key = get_group_key(result)
+        current = open_groups.get(group_key)
+        if current is not None and current[1] > 0:
+            group_index = current[0]
+            # number of results after the group
+            following_count = 0
+            i = len(groups) - 1
+            while i > group_index and following_count < 20:
+                following_count += len(groups[i])
+                i -= 1
+            if following_count < 20:
+                groups[group_index].append(result)
+                current[1] -= 1
+                continue
+
+        open_groups[group_key] = [len(groups), 8]
+        groups.append([result])
+
+    return [result for group in groups for result in group]
 
 
 class ResultContainer:
-    """docstring for ResultContainer"""
+    """Results of a search.
 
-    __slots__ = '_merged_results', 'infoboxes', 'suggestions', 'answers', 'corrections', '_number_of_results',\
+    The engine threads call :py:meth:`extend`: the results and infoboxes are
+    appended to the buffer of the engine, and merged later by the thread which
+    reads them, the engines in alphabetical order.  Once the search is done,
+    :py:meth:`close` merges the remaining results and the results added by the
+    engines answering afterwards are ignored.
+    """
+
+    __slots__ = '_merged_results', '_infoboxes', 'suggestions', 'answers', 'corrections', '_number_of_results',\
                 '_ordered', 'paging', 'unresponsive_engines', 'timings', 'redirect_url', 'engine_data',\
-                '_language'
+                '_language', '_lock', 'cut_off_engines', '_url_index', '_buffers', '_closed',\
+                '_infobox_index'
 
     def __init__(self, language):
         super().__init__()
+        # the engines add their results while the webapp may read them (format=sse)
+        self._lock = RLock()
+        # results and infoboxes not merged yet, by engine
+        self._buffers = {}
+        self._closed = False
         self._merged_results = []
-        self.infoboxes = []
+        # merged results with an URL by get_duplicate_key
+        self._url_index = {}
+        self._infoboxes = []
+        # infoboxes with an id by get_url_key of the id: (infobox, get_infobox_url_index of its URLs)
+        self._infobox_index = {}
         self.suggestions = set()
         self.answers = {}
         self.corrections = set()
@@ -167,27 +324,47 @@ class ResultContainer:
         self._ordered = False
         self.paging = False
         self.unresponsive_engines = set()
+        self.cut_off_engines = set()
         self.timings = []
         self.redirect_url = None
         self._language = language.lower().split('-')[0]
 
+    def __getstate__(self):
+        # the container is pickled by the result cache, the lock can't be
+        return {name: getattr(self, name) for name in self.__slots__ if name != '_lock'}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._lock = RLock()
+
     def extend(self, engine_name, results):
-        standard_result_count = 0
+        if self._closed:
+            logger.debug('result: %s has answered after the end of the search', engine_name)
+            return
+
+        standard_results = []
+        infoboxes = []
         error_msgs = set()
         for result in list(results):
             result['engine'] = engine_name
             if 'suggestion' in result:
-                self.suggestions.add(result['suggestion'])
+                with self._lock:
+                    self.suggestions.add(result['suggestion'])
             elif 'answer' in result:
-                self.answers[result['answer']] = result
+                with self._lock:
+                    self.answers[result['answer']] = result
             elif 'correction' in result:
-                self.corrections.add(result['correction'])
+                with self._lock:
+                    self.corrections.add(result['correction'])
             elif 'infobox' in result:
-                self._merge_infobox(result)
+                infoboxes.append(result)
             elif 'number_of_results' in result:
-                self._number_of_results.append(result['number_of_results'])
+                with self._lock:
+                    self._number_of_results.append(result['number_of_results'])
             elif 'engine_data' in result:
-                self.engine_data[engine_name][result['key']] = result['engine_data']
+                with self._lock:
+                    self.engine_data[engine_name][result['key']] = result['engine_data']
             else:
                 # standard result (url, title, content)
                 if 'url' in result and not isinstance(result['url'], str):
@@ -200,37 +377,66 @@ class ResultContainer:
                     logger.debug('result: invalid content: %s', str(result))
                     error_msgs.add('invalid content')
                 else:
-                    self._merge_result(result, standard_result_count + 1)
-                    standard_result_count += 1
+                    standard_results.append(result)
+
+        # deque.append is thread safe: the engines do not wait for each other
+        self._buffers.setdefault(engine_name, deque()).append((infoboxes, standard_results))
 
         if len(error_msgs) > 0:
             for msg in error_msgs:
                 record_error(engine_name, 'some results are invalids: ' + msg)
 
         if engine_name in engines:
-            with RLock():
-                engines[engine_name].stats['search_count'] += 1
-                engines[engine_name].stats['result_count'] += standard_result_count
+            get_counter('engine', engine_name, 'search', 'successful').add()
+            get_counter('engine', engine_name, 'result').add(len(standard_results))
 
-        if not self.paging and standard_result_count > 0 and engine_name in engines\
+        if not self.paging and standard_results and engine_name in engines\
            and engines[engine_name].paging:
             self.paging = True
 
+    def _merge_buffers(self):
+        # called with self._lock
+        merged = False
+        for engine_name in sorted(self._buffers):
+            buffer = self._buffers[engine_name]
+            while buffer:
+                infoboxes, standard_results = buffer.popleft()
+                for infobox in infoboxes:
+                    self._merge_infobox(infobox)
+                for position, result in enumerate(standard_results, 1):
+                    self._merge_result(result, position)
+                merged = True
+        if merged:
+            self._ordered = False
+
+    def close(self):
+        """Merge the results of the engines, the results added afterwards are ignored."""
+        with self._lock, tracing.span('merge_results'):
+            self._closed = True
+            self._merge_buffers()
+
+    @property
+    def infoboxes(self):
+        with self._lock:
+            self._merge_buffers()
+        return self._infoboxes
+
     def _merge_infobox(self, infobox):
-        add_infobox = True
         infobox_id = infobox.get('id', None)
         infobox['engines'] = set([infobox['engine']])
         if infobox_id is not None:
-            parsed_url_infobox_id = urlparse(infobox_id)
-            for existingIndex in self.infoboxes:
-                if compare_urls(urlparse(existingIndex.get('id', '')), parsed_url_infobox_id):
-                    merge_two_infoboxes(existingIndex, infobox)
-                    add_infobox = False
+            infobox_key = get_url_key(parse_url(infobox_id))
+            existing = self._infobox_index.get(infobox_key)
+            if existing is not None:
+                existing_infobox, url_index = existing
+                merge_two_infoboxes(existing_infobox, infobox, url_index)
+                return
+            self._infobox_index[infobox_key] = (infobox, get_infobox_url_index(infobox.get('urls') or []))
 
-        if add_infobox:
-            self.infoboxes.append(infobox)
+        self._infoboxes.append(infobox)
 
     def _merge_result(self, result, position):
+        result = Result(result)
         if 'url' in result:
             self.__merge_url_result(result, position)
             return
@@ -238,7 +444,7 @@ class ResultContainer:
         self.__merge_result_no_url(result, position)
 
     def __merge_url_result(self, result, position):
-        result['parsed_url'] = urlparse(result['url'])
+        result['parsed_url'] = parse_url(result['url'])
 
         # if the result has no scheme, use http as default
         if not result['parsed_url'].scheme or result['parsed_url'].scheme == '':
@@ -256,32 +462,28 @@ class ResultContainer:
         if result.get('content'):
             result['content'] = WHITESPACE_REGEX.sub(' ', result['content'])
 
-        duplicated = self.__find_duplicated_http_result(result)
+        duplicate_key = self.get_duplicate_key(result)
+        duplicated = self._url_index.get(duplicate_key)
         if duplicated:
             self.__merge_duplicated_http_result(duplicated, result, position)
             return
 
         # if there is no duplicate found, append result
         result['positions'] = [position]
-        with RLock():
-            self._merged_results.append(result)
+        self._merged_results.append(result)
+        self._url_index[duplicate_key] = result
 
-    def __find_duplicated_http_result(self, result):
+    @staticmethod
+    def get_duplicate_key(result):
+        """Two results with an URL are merged if they have the same key.
+
+        Same URL according to :py:func:`compare_urls`, same template, and for
+        the images, same ``img_src``.
+        """
         result_template = result.get('template')
-        for merged_result in self._merged_results:
-            if 'parsed_url' not in merged_result:
-                continue
-            if compare_urls(result['parsed_url'], merged_result['parsed_url'])\
-               and result_template == merged_result.get('template'):
-                if result_template != 'images.html':
-                    # not an image, same template, same url : it's a duplicate
-                    return merged_result
-                else:
-                    # it's an image
-                    # it's a duplicate if the parsed_url, template and img_src are different
-                    if result.get('img_src', '') == merged_result.get('img_src', ''):
-                        return merged_result
-        return None
+        if result_template == 'images.html':
+            return get_url_key(result['parsed_url']), result_template, result.get('img_src', '')
+        return get_url_key(result['parsed_url']), result_template
 
     def __merge_duplicated_http_result(self, duplicated, result, position):
         # using content with more text
@@ -308,74 +510,54 @@ class ResultContainer:
     def __merge_result_no_url(self, result, position):
         result['engines'] = set([result['engine']])
         result['positions'] = [position]
-        with RLock():
-            self._merged_results.append(result)
+        self._merged_results.append(result)
 
     def order_results(self):
-        for result in self._merged_results:
-            score = result_score(result, self._language)
-            result['score'] = score
-            with RLock():
+        with self._lock, tracing.span('order_results'):
+            self._merge_buffers()
+            gresults = self._sort_results()
+            for result in gresults:
                 for result_engine in result['engines']:
-                    engines[result_engine].stats['score_count'] += score
+                    get_counter('engine', result_engine, 'score').add(result['score'])
+
+            # update _merged_results
+            self._ordered = True
+            self._merged_results = gresults
+
+    def _sort_results(self):
+        ranking.pipeline.score(self._merged_results, self._language)
 
         results = sorted(self._merged_results, key=itemgetter('score'), reverse=True)
 
         # pass 2 : group results by category and template
-        gresults = []
-        categoryPositions = {}
-
         for res in results:
             # FIXME : handle more than one category per engine
             engine = engines[res['engine']]
             res['category'] = engine.categories[0] if len(engine.categories) > 0 else ''
 
-            # FIXME : handle more than one category per engine
-            category = res['category']\
-                + ':' + res.get('template', '')\
-                + ':' + ('img_src' if 'img_src' in res or 'thumbnail' in res else '')
-
-            current = None if category not in categoryPositions\
-                else categoryPositions[category]
-
-            # group with previous results using the same category
-            # if the group can accept more result and is not too far
-            # from the current position
-            if current is not None and (current['count'] > 0)\
-                    and (len(gresults) - current['index'] < 20):
-                # group with the previous results using
-                # the same category with this one
-                index = current['index']
-                gresults.insert(index, res)
-
-                # update every index after the current one
-                # (including the current one)
-                for k in categoryPositions:
-                    v = categoryPositions[k]['index']
-                    if v >= index:
-                        categoryPositions[k]['index'] = v + 1
-
-                # update this category
-                current['count'] -= 1
-
-            else:
-                # same category
-                gresults.append(res)
-
-                # update categoryIndex
-                categoryPositions[category] = {'index': len(gresults), 'count': 8}
-
-        # update _merged_results
-        self._ordered = True
-        self._merged_results = gresults
+        return group_results(results)
 
     def get_ordered_results(self):
-        if not self._ordered:
-            self.order_results()
-        return self._merged_results
+        with self._lock:
+            self._merge_buffers()
+            if not self._ordered:
+                self.order_results()
+            return self._merged_results
+
+    def get_current_results(self):
+        """Copy of the results merged so far, in the order of :py:meth:`get_ordered_results`.
+
+        Can be called while the engines are still adding results.
+        """
+        with self._lock:
+            self._merge_buffers()
+            return [dict(result, engines=set(result['engines']), positions=list(result['positions']))
+                    for result in self._sort_results()]
 
     def results_length(self):
-        return len(self._merged_results)
+        with self._lock:
+            self._merge_buffers()
+            return len(self._merged_results)
 
     def results_number(self):
         resultnum_sum = sum(self._number_of_results)
@@ -385,14 +567,27 @@ class ResultContainer:
 
     def add_unresponsive_engine(self, engine_name, error_type, error_message=None):
         if engines[engine_name].display_error_messages:
-            self.unresponsive_engines.add((engine_name, error_type, error_message))
+            with self._lock:
+                self.unresponsive_engines.add((engine_name, error_type, error_message))
 
     def add_timing(self, engine_name, engine_time, page_load_time):
-        self.timings.append({
-            'engine': engines[engine_name].shortcut,
-            'total': engine_time,
-            'load': page_load_time
-        })
+        with self._lock:
+            self.timings.append({
+                'engine': engines[engine_name].shortcut,
+                'total': engine_time,
+                'load': page_load_time
+            })
+
+    def add_cut_off_engine(self, engine_name, engine_time):
+        """The search has stopped waiting for this engine, see :py:mod:`searx.search.early_return`."""
+        with self._lock:
+            self.cut_off_engines.add(engine_name)
+            self.timings.append({
+                'engine': engines[engine_name].shortcut,
+                'total': engine_time,
+                'load': 0.0,
+                'cut_off': True
+            })
 
     def get_timings(self):
         return self.timings
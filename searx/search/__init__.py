@@ -17,13 +17,18 @@ along with searx. If not, see < http://www.gnu.org/licenses/ >.
 
 import typing
 import gc
+import queue
+import asyncio
 import threading
+import concurrent.futures
+import contextvars
 from time import time
 from uuid import uuid4
 from _thread import start_new_thread
 
 from searx import settings
 from searx.answerers import ask
+from searx.cache import get_cache, dumps, loads
 from searx.external_bang import get_bang_url
 from searx.results import ResultContainer
 from searx import logger
@@ -31,6 +36,14 @@ from searx.plugins import plugins
 from searx.search.models import EngineRef, SearchQuery
 from searx.search.processors import processors, initialize as initialize_processors
 from searx.search.checker import initialize as initialize_checker
+from searx.search.eventloop import run_coroutine
+from searx.search.workerpool import get_pool
+from searx.search.singleflight import queries as singleflight_queries
+from searx.search.early_return import EarlyReturn
+from searx.metrology.error_recorder import record_error
+from searx.metrology import tracing
+from searx.metrology.aggregation import initialize as initialize_metrology
+from searx.metrology.counter import get_counter
 
 
 logger = logger.getChild('search')
@@ -46,10 +59,33 @@ else:
         import sys
         sys.exit(1)
 
+executor = settings['outgoing'].get('executor', 'threads')
+if executor not in ('threads', 'pool', 'asyncio'):
+    logger.critical('outgoing.executor has to be "threads", "pool" or "asyncio"')
+    import sys
+    sys.exit(1)
+
+
+result_cache_ttl = (settings.get('cache') or {}).get('result_ttl', 0)
+
+singleflight_enabled = settings['outgoing'].get('singleflight', True)
+
+# seconds given to the event loop to cancel the engines after the timeout
+ASYNCIO_TIMEOUT_MARGIN = 0.5
+
+early_return_settings = settings['outgoing'].get('early_return') or {}
+try:
+    EarlyReturn(**early_return_settings)
+except TypeError as e:
+    logger.critical('outgoing.early_return: {0}'.format(e))
+    import sys
+    sys.exit(1)
+
 
 def initialize(settings_engines=None, enable_checker=False):
     settings_engines = settings_engines or settings['engines']
     initialize_processors(settings_engines)
+    initialize_metrology()
     if enable_checker:
         initialize_checker()
 
@@ -57,7 +93,7 @@ def initialize(settings_engines=None, enable_checker=False):
 class Search:
     """Search information container"""
 
-    __slots__ = "search_query", "result_container", "start_time", "actual_timeout"
+    __slots__ = "search_query", "result_container", "start_time", "actual_timeout", "on_engine_done"
 
     def __init__(self, search_query):
         # init vars
@@ -66,6 +102,8 @@ class Search:
         self.result_container = ResultContainer(search_query.lang)
         self.start_time = None
         self.actual_timeout = None
+        # called with the engine name once the engine has added its results, see search_iter
+        self.on_engine_done = None
 
     def search_external_bang(self):
         """
@@ -111,8 +149,7 @@ class Search:
             if request_params is None:
                 continue
 
-            with threading.RLock():
-                processor.engine.stats['sent_search_count'] += 1
+            get_counter('engine', engineref.name, 'search', 'sent').add()
 
             # append request to list
             requests.append((engineref.name, self.search_query.query, request_params))
@@ -143,37 +180,238 @@ class Search:
         return requests, actual_timeout
 
     def search_multiple_requests(self, requests):
+        if executor == 'asyncio':
+            self._search_multiple_requests_asyncio(requests)
+        elif executor == 'pool':
+            self._search_multiple_requests_pool(requests)
+        else:
+            self._search_multiple_requests_threads(requests)
+
+    def _search_engine(self, engine_name, query, request_params):
+        try:
+            with tracing.span('engine', engine=engine_name):
+                processors[engine_name].search(query, request_params, self.result_container,
+                                               self.start_time, self.actual_timeout)
+        finally:
+            if self.on_engine_done is not None:
+                self.on_engine_done(engine_name)
+
+    async def _search_engine_async(self, engine_name, query, request_params):
+        try:
+            with tracing.span('engine', engine=engine_name):
+                await processors[engine_name].search_async(query, request_params, self.result_container,
+                                                           self.start_time, self.actual_timeout)
+        finally:
+            if self.on_engine_done is not None:
+                self.on_engine_done(engine_name)
+
+    def _search_engine_thread(self, future, engine_name, query, request_params):
+        try:
+            self._search_engine(engine_name, query, request_params)
+        finally:
+            future.set_result(None)
+
+    def _new_early_return(self):
+        if early_return_settings:
+            return EarlyReturn(**early_return_settings)
+        return None
+
+    def _get_wait_time(self, early_return, done_count):
+        # the early return can only shorten the wait: actual_timeout includes timeout_limit
+        remaining_time = self.actual_timeout - (time() - self.start_time)
+        if early_return is None or remaining_time <= 0:
+            return remaining_time
+        wait_time = early_return.get_wait_time(self.result_container, done_count)
+        return remaining_time if wait_time is None else min(wait_time, remaining_time)
+
+    def _wait_futures(self, futures, early_return):
+        """Wait for the futures until the timeout or the early return, return the futures not done."""
+        not_done = set(futures)
+        wait_time = self._get_wait_time(early_return, 0)
+        while not_done and wait_time > 0:
+            _, not_done = concurrent.futures.wait(not_done, timeout=wait_time,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+            wait_time = self._get_wait_time(early_return, len(futures) - len(not_done))
+        return not_done
+
+    def _cut_off(self, engine_name):
+        self.result_container.add_cut_off_engine(engine_name, time() - self.start_time)
+        logger.debug('engine cut off: {0}'.format(engine_name))
+
+    def _search_multiple_requests_threads(self, requests):
         search_id = uuid4().__str__()
+        early_return = self._new_early_return()
+        futures = {}
 
         for engine_name, query, request_params in requests:
+            future = concurrent.futures.Future()
+            # the thread runs in a copy of the context: see searx.metrology.tracing
             th = threading.Thread(
-                target=processors[engine_name].search,
-                args=(query, request_params, self.result_container, self.start_time, self.actual_timeout),
+                target=contextvars.copy_context().run,
+                args=(self._search_engine_thread, future, engine_name, query, request_params),
                 name=search_id,
             )
             th._timeout = False
             th._engine_name = engine_name
             th.start()
+            futures[future] = th
+
+        for future in self._wait_futures(futures, early_return):
+            th = futures[future]
+            if early_return is not None and early_return.triggered:
+                # the thread can't be stopped, its results are ignored
+                self._cut_off(th._engine_name)
+            else:
+                th._timeout = True
+                self.result_container.add_unresponsive_engine(th._engine_name, 'timeout')
+                logger.warning('engine timeout: {0}'.format(th._engine_name))
+
+    def _search_multiple_requests_pool(self, requests):
+        pool = get_pool()
+        deadline = self.start_time + self.actual_timeout
+        early_return = self._new_early_return()
+        futures = {}
+        for engine_name, query, request_params in requests:
+            future = pool.submit(engine_name, deadline, contextvars.copy_context().run,
+                                 self._search_engine, engine_name, query, request_params)
+            if future is None:
+                self.result_container.add_unresponsive_engine(engine_name, 'overloaded')
+                logger.warning('engine request rejected, the worker pool is saturated: {0}'.format(engine_name))
+                continue
+            futures[future] = engine_name
+
+        for future in self._wait_futures(futures, early_return):
+            # a request still waiting for a thread won't be sent
+            future.cancel()
+            engine_name = futures[future]
+            if early_return is not None and early_return.triggered:
+                self._cut_off(engine_name)
+                continue
+            self.result_container.add_unresponsive_engine(engine_name, 'timeout')
+            record_error(engine_name, 'Timeout')
+            logger.warning('engine timeout: {0}'.format(engine_name))
+
+    def _search_multiple_requests_asyncio(self, requests):
+        # the coroutine enforces actual_timeout by itself, unless a blocking call holds the event loop
+        future = run_coroutine(self._search_requests_coroutine(requests))
+        remaining_time = self.actual_timeout - (time() - self.start_time)
+        try:
+            future.result(timeout=max(remaining_time, 0) + ASYNCIO_TIMEOUT_MARGIN)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            logger.error('the event loop has not stopped the engines at the timeout, is it blocked?')
+            answered = {timing['engine'] for timing in self.result_container.get_timings()}
+            for engine_name, _, _ in requests:
+                if processors[engine_name].engine.shortcut not in answered:
+                    self.result_container.add_unresponsive_engine(engine_name, 'timeout')
+                    record_error(engine_name, 'Timeout')
+
+    async def _search_requests_coroutine(self, requests):
+        early_return = self._new_early_return()
+        tasks = {}
+        for engine_name, query, request_params in requests:
+            coroutine = self._search_engine_async(engine_name, query, request_params)
+            tasks[asyncio.ensure_future(coroutine)] = engine_name
+
+        pending = set(tasks)
+        wait_time = self._get_wait_time(early_return, 0)
+        while pending and wait_time > 0:
+            _, pending = await asyncio.wait(pending, timeout=wait_time, return_when=asyncio.FIRST_COMPLETED)
+            wait_time = self._get_wait_time(early_return, len(tasks) - len(pending))
+
+        # contrary to the threads, the engines which have not answered in time are cancelled
+        for task in pending:
+            task.cancel()
+            engine_name = tasks[task]
+            if early_return is not None and early_return.triggered:
+                self._cut_off(engine_name)
+                continue
+            self.result_container.add_unresponsive_engine(engine_name, 'timeout')
+            record_error(engine_name, 'Timeout')
+            logger.warning('engine timeout: {0}'.format(engine_name))
+
+    def _load_cached_results(self, cache, cache_key):
+        serialized_results = cache.get(cache_key)
+        if serialized_results is None:
+            return False
+        try:
+            self.result_container = loads(serialized_results)
+        except Exception as e:
+            # stored by another version of searx, or with another secret_key
+            logger.debug('can\'t load the cached results: {0!r}'.format(e))
+            return False
+        # no engine has been requested
+        self.result_container.timings = []
+        return True
 
-        for th in threading.enumerate():
-            if th.name == search_id:
-                remaining_time = max(0.0, self.actual_timeout - (time() - self.start_time))
-                th.join(remaining_time)
-                if th.is_alive():
-                    th._timeout = True
-                    self.result_container.add_unresponsive_engine(th._engine_name, 'timeout')
-                    logger.warning('engine timeout: {0}'.format(th._engine_name))
-
-    def search_standard(self):
-        """
-        Update self.result_container, self.actual_timeout
-        """
+    def _serialize_results(self):
+        try:
+            return dumps(self.result_container)
+        except Exception as e:
+            # an engine returns an object which can't be serialized,
+            # or the results are modified by an engine which has timed out
+            logger.debug('can\'t serialize the results: {0!r}'.format(e))
+            return None
+
+    def _store_cached_results(self, cache, cache_key, serialized_results):
+        # do not cache incomplete results
+        if self.result_container.unresponsive_engines or self.result_container.cut_off_engines\
+           or serialized_results is None:
+            return
+        cache.set(cache_key, serialized_results, result_cache_ttl)
+
+    def _send_requests(self):
         requests, self.actual_timeout = self._get_requests()
 
         # send all search-request
         if requests:
             self.search_multiple_requests(requests)
             start_new_thread(gc.collect, tuple())
+        # the results of the engines answering from now on are ignored
+        self.result_container.close()
+        return bool(requests)
+
+    def _serialize_sent_results(self, sent):
+        if sent:
+            return self._serialize_results()
+        return None
+
+    def _send_requests_and_serialize(self):
+        return self._serialize_sent_results(self._send_requests())
+
+    def search_standard(self):
+        """
+        Update self.result_container, self.actual_timeout
+        """
+        cache = get_cache('results') if result_cache_ttl else None
+        if cache or singleflight_enabled:
+            cache_key = self.search_query.get_cache_key()
+        if cache and self._load_cached_results(cache, cache_key):
+            return True
+
+        if singleflight_enabled:
+            # the same query may be in progress in another thread.  Without cache,
+            # the results are serialized only if another thread is waiting for them.
+            if cache:
+                value, shared = singleflight_queries.do(cache_key, self._send_requests_and_serialize)
+            else:
+                value, shared = singleflight_queries.do(cache_key, self._send_requests,
+                                                        share=self._serialize_sent_results)
+            if shared:
+                if value is None:
+                    # no request or the results can't be copied
+                    self._send_requests()
+                else:
+                    self.result_container = loads(value)
+                return True
+            serialized_results = value if cache else None
+        elif self._send_requests() and cache:
+            serialized_results = self._serialize_results()
+        else:
+            serialized_results = None
+
+        if cache:
+            self._store_cached_results(cache, cache_key, serialized_results)
 
         # return results, suggestions, answers and infoboxes
         return True
@@ -186,18 +424,48 @@ class Search:
             if not self.search_answerers():
                 self.search_standard()
 
+        self.result_container.close()
         return self.result_container
 
+    def search_iter(self):
+        """Same as :py:meth:`search`, but yield the name of each engine once it has added its results.
+
+        The search runs in another thread: :py:meth:`get_current_results` returns the results
+        merged so far.  The engines answering after the timeout are not reported.
+        """
+        done = object()
+        events = queue.Queue()
+        future = concurrent.futures.Future()
+        self.on_engine_done = events.put
+
+        def run():
+            try:
+                future.set_result(Search.search(self))
+            except BaseException as e:  # pylint: disable=broad-except
+                future.set_exception(e)
+            events.put(done)
+
+        # the thread runs in a copy of the context: see searx.metrology.tracing
+        threading.Thread(target=contextvars.copy_context().run, args=(run,), name='search_iter').start()
+        for engine_name in iter(events.get, done):
+            yield engine_name
+        return future.result()
+
+    def get_current_results(self):
+        return self.result_container.get_current_results()
+
 
 class SearchWithPlugins(Search):
     """Similar to the Search class but call the plugins."""
 
-    __slots__ = 'ordered_plugin_list', 'request'
+    __slots__ = 'ordered_plugin_list', 'request', 'plugin_states'
 
     def __init__(self, search_query, ordered_plugin_list, request):
         super().__init__(search_query)
         self.ordered_plugin_list = ordered_plugin_list
         self.request = request
+        # values returned by the prepare hook of the plugins, by plugin id
+        self.plugin_states = {}
 
     def search(self):
         if plugins.call(self.ordered_plugin_list, 'pre_search', self.request, self):
@@ -206,8 +474,23 @@ class SearchWithPlugins(Search):
         plugins.call(self.ordered_plugin_list, 'post_search', self.request, self)
 
         results = self.result_container.get_ordered_results()
+        plugins.call_on_results(self.ordered_plugin_list, self.request, self, results, self.plugin_states)
+
+        return self.result_container
+
+    def search_iter(self):
+        # the plugins are called from the thread of the request
+        if plugins.call(self.ordered_plugin_list, 'pre_search', self.request, self):
+            yield from super().search_iter()
 
-        for result in results:
-            plugins.call(self.ordered_plugin_list, 'on_result', self.request, self, result)
+        plugins.call(self.ordered_plugin_list, 'post_search', self.request, self)
+
+        results = self.result_container.get_ordered_results()
+        plugins.call_on_results(self.ordered_plugin_list, self.request, self, results, self.plugin_states)
 
         return self.result_container
+
+    def get_current_results(self):
+        results = super().get_current_results()
+        plugins.call_on_results(self.ordered_plugin_list, self.request, self, results, self.plugin_states)
+        return results
@@ -4,7 +4,6 @@ import typing
 import types
 import functools
 import itertools
-import threading
 from time import time
 from urllib.parse import urlparse
 
@@ -14,6 +13,7 @@ from langdetect.lang_detect_exception import LangDetectException
 import requests.exceptions
 
 from searx import poolrequests, logger
+from searx.metrology.counter import get_counter
 from searx.results import ResultContainer
 from searx.search.models import SearchQuery, EngineRef
 from searx.search.processors import EngineProcessor
@@ -385,8 +385,7 @@ class Checker:
         engineref_category = search_query.engineref_list[0].category
         params = self.processor.get_params(search_query, engineref_category)
         if params is not None:
-            with threading.RLock():
-                self.processor.engine.stats['sent_search_count'] += 1
+            get_counter('engine', self.processor.engine_name, 'search', 'sent').add()
             self.processor.search(search_query.query, params, result_container, time(), 5)
         return result_container
 
@@ -0,0 +1,59 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Early return of the search (``outgoing.early_return``).
+
+By default a search waits for all the engines until the timeout.  With an
+early return policy, the search stops waiting as soon as one of the configured
+conditions is met:
+
+* ``min_engines``: this number of engines have answered,
+* ``min_results``: this number of results have been merged,
+* ``stable_top`` and ``stable_time``: the ``stable_top`` first results have not
+  changed for ``stable_time`` seconds.
+
+The engines which have not answered yet are cut off: they are not reported as
+unresponsive, but their results are missing, see
+:py:meth:`searx.results.ResultContainer.add_cut_off_engine`.
+"""
+
+from time import time
+
+
+class EarlyReturn:
+    """Early return policy of one search."""
+
+    def __init__(self, min_engines=0, min_results=0, stable_top=0, stable_time=0.0):
+        self.min_engines = min_engines
+        self.min_results = min_results
+        self.stable_top = stable_top
+        self.stable_time = stable_time
+        # True once the search has stopped waiting because of this policy
+        self.triggered = False
+        self._top = None
+        self._top_time = None
+
+    def get_wait_time(self, result_container, done_count):
+        """Return the maximum number of seconds to wait for the next engine.
+
+        0 if the search has to stop waiting, None to wait until the next engine answers.
+        """
+        if not done_count:
+            return None
+        if (self.min_engines and done_count >= self.min_engines)\
+           or (self.min_results and result_container.results_length() >= self.min_results):
+            self.triggered = True
+            return 0
+
+        if self.stable_top:
+            now = time()
+            top = tuple(result.get('url') for result in result_container.get_current_results()[:self.stable_top])
+            if len(top) < self.stable_top:
+                return None
+            if top != self._top:
+                self._top, self._top_time = top, now
+            wait_time = self._top_time + self.stable_time - now
+            if wait_time <= 0:
+                self.triggered = True
+                return 0
+            return wait_time
+
+        return None
@@ -0,0 +1,48 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Event loop of the ``asyncio`` executor.
+
+Each worker process owns one event loop running forever in a daemon thread.
+The loop is created on first use, so it is never shared between the processes
+forked by uWSGI.  Blocking calls (HTTP requests sent with ``requests``, offline
+engines) run in the default executor of the loop: a bounded pool of long-lived
+threads.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from searx import logger, settings
+
+
+logger = logger.getChild('search.eventloop')
+
+max_workers = settings['outgoing'].get('executor_max_workers', 100)
+
+_lock = threading.Lock()
+_loop = None
+_loop_pid = None
+
+
+def get_loop():
+    """Return the event loop of the current process, start it if required."""
+    global _loop, _loop_pid  # pylint: disable=global-statement
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=max_workers))
+            thread = threading.Thread(target=loop.run_forever, name='searx-eventloop')
+            thread.daemon = True
+            thread.start()
+            _loop, _loop_pid = loop, os.getpid()
+            logger.debug('event loop started (max_workers=%i)', max_workers)
+        return _loop
+
+
+def run_coroutine(coroutine):
+    """Schedule ``coroutine`` on the event loop from any other thread.
+
+    Returns a :py:class:`concurrent.futures.Future`.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop())
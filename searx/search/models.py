@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 import typing
+from hashlib import sha256
 
 
 class EngineRef:
@@ -69,3 +70,10 @@ class SearchQuery:
     def __hash__(self):
         return hash((self.query, tuple(self.engineref_list), self.lang, self.safesearch, self.pageno, self.time_range,
                      self.timeout_limit, self.external_bang))
+
+    def get_cache_key(self):
+        """Key of the query, stable across processes: same fields as ``__eq__`` plus ``engine_data``."""
+        engine_data = sorted((engine_name, sorted(data.items())) for engine_name, data in self.engine_data.items())
+        key = repr((self.query, [(e.name, e.category) for e in self.engineref_list], self.lang, self.safesearch,
+                    self.pageno, self.time_range, self.timeout_limit, self.external_bang, engine_data))
+        return sha256(key.encode()).hexdigest()
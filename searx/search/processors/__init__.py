@@ -39,3 +39,9 @@ def initialize(engine_list):
             logger.error('Error get processor for engine %s', engine_name)
         else:
             processors[engine_name] = processor
+
+
+def get_hedge_stats():
+    """Statistics of the engines with hedged requests, see the hedge_percentile option of the engines."""
+    return [processors[engine_name].get_hedge_stats() for engine_name in sorted(processors)
+            if getattr(processors[engine_name], 'request_count', 0)]
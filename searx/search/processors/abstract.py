@@ -1,7 +1,10 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+import asyncio
 from abc import abstractmethod, ABC
 from searx import logger
+from searx.metrology.counter import get_counter
+from searx.metrology.histogram import get_sliding_histogram
 
 
 logger = logger.getChild('searx.search.processor')
@@ -12,6 +15,9 @@ class EngineProcessor(ABC):
     def __init__(self, engine, engine_name):
         self.engine = engine
         self.engine_name = engine_name
+        # metrics of the engine, see searx.engines.get_engines_stats
+        self.time_histogram = get_sliding_histogram('engine', engine_name, 'time', 'total')
+        self.error_counter = get_counter('engine', engine_name, 'search', 'error')
 
     def get_params(self, search_query, engine_category):
         # if paging is not supported, skip
@@ -39,6 +45,14 @@ class EngineProcessor(ABC):
     def search(self, query, params, result_container, start_time, timeout_limit):
         pass
 
+    async def search_async(self, query, params, result_container, start_time, timeout_limit):
+        """Coroutine version of :py:meth:`search` used by the ``asyncio`` executor.
+
+        By default the blocking :py:meth:`search` runs in a worker thread of the event loop.
+        """
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.search, query, params, result_container, start_time, timeout_limit)
+
     def get_tests(self):
         tests = getattr(self.engine, 'tests', None)
         if tests is None:
@@ -18,8 +18,7 @@ class OfflineProcessor(EngineProcessor):
         engine_time = time() - start_time
         result_container.add_timing(self.engine_name, engine_time, engine_time)
 
-        with threading.RLock():
-            self.engine.stats['errors'] += 1
+        self.error_counter.add()
 
     def _search_basic(self, query, params):
         return self.engine.search(query, params)
@@ -33,9 +32,7 @@ class OfflineProcessor(EngineProcessor):
 
                 engine_time = time() - start_time
                 result_container.add_timing(self.engine_name, engine_time, engine_time)
-                with threading.RLock():
-                    self.engine.stats['engine_time'] += engine_time
-                    self.engine.stats['engine_time_count'] += 1
+                self.time_histogram.observe(engine_time)
 
         except ValueError as e:
             record_exception(self.engine_name, e)
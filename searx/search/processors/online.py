@@ -2,23 +2,43 @@
 
 from urllib.parse import urlparse
 from time import time
+import asyncio
+import concurrent.futures
+import contextvars
+import copy
+import os
 import threading
 
 import requests.exceptions
 
 import searx.poolrequests as poolrequests
-from searx.engines import settings
+from searx.cache import get_cache, dumps, loads
+from searx.engines import settings, stats_lock
 from searx import logger
 from searx.utils import gen_useragent
 from searx.exceptions import (SearxEngineAccessDeniedException, SearxEngineCaptchaException,
                               SearxEngineTooManyRequestsException,)
+from searx.metrology import tracing
 from searx.metrology.error_recorder import record_exception, record_error
+from searx.metrology.histogram import get_histogram, get_sliding_histogram
+from searx.search.singleflight import http_requests
 
 from searx.search.processors.abstract import EngineProcessor
 
 
 logger = logger.getChild('search.processor.online')
 
+singleflight_enabled = settings['outgoing'].get('singleflight', True)
+
+# minimum number of responses of an engine before its requests are hedged
+HEDGE_MIN_COUNT = 20
+
+# only the idempotent requests are sent twice
+HEDGE_METHODS = ('GET', 'HEAD')
+
+# maximum number of hedged requests in progress, see _HedgePool
+hedge_max_workers = settings['outgoing'].get('executor_max_workers', 100)
+
 
 def default_request_params():
     return {
@@ -32,10 +52,51 @@ def default_request_params():
     }
 
 
+class _HedgePool:
+    """Long-lived threads sending the hedged requests, created on first use in each worker process."""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_pid = None
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        """Call ``fn(*args)`` from a thread of the pool, return None if all the threads are busy."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                                       thread_name_prefix='hedge')
+                self._executor_pid = os.getpid()
+            executor = self._executor
+        future = executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+hedge_pool = _HedgePool(hedge_max_workers)
+
+
 class OnlineProcessor(EngineProcessor):
 
     engine_type = 'online'
 
+    def __init__(self, engine, engine_name):
+        super().__init__(engine, engine_name)
+        # response times of the engine
+        self.histogram = get_histogram('engine', engine_name, 'http')
+        # response time of each HTTP request, http_time_histogram sums the requests of a search
+        self.request_time_histogram = get_sliding_histogram('engine', engine_name, 'time', 'request')
+        self.http_time_histogram = get_sliding_histogram('engine', engine_name, 'time', 'http')
+        self.parse_time_histogram = get_sliding_histogram('engine', engine_name, 'time', 'parse', width=0.005)
+        self.request_count = 0
+        self.hedge_count = 0
+        self.hedge_win_count = 0
+        self._hedge_lock = threading.Lock()
+
     def get_params(self, search_query, engine_category):
         params = super().get_params(search_query, engine_category)
         if params is None:
@@ -93,7 +154,11 @@ class OnlineProcessor(EngineProcessor):
         request_args['data'] = params['data']
 
         # send the request
+        request_time = time()
         response = req(params['url'], **request_args)
+        request_duration = time() - request_time
+        self.histogram.observe(request_duration)
+        self.request_time_histogram.observe(request_duration)
 
         # check soft limit of the redirect count
         if len(response.history) > soft_max_redirects:
@@ -108,105 +173,251 @@ class OnlineProcessor(EngineProcessor):
 
         return response
 
-    def _search_basic(self, query, params):
-        # update request parameters dependent on
-        # search-engine (contained in engines folder)
-        self.engine.request(query, params)
+    def _get_response_cache_key(self, params):
+        data = params['data']
+        if isinstance(data, dict):
+            data = sorted(data.items())
+        return '{}:{}:{}:{!r}'.format(self.engine_name, params['method'], params['url'], data)
 
-        # ignoring empty urls
-        if params['url'] is None:
+    def _get_cached_response(self, params):
+        """Return the cached response of the request defined by ``params``, None if there is none."""
+        if not self.engine.cache_ttl:
             return None
-
-        if not params['url']:
+        cache = get_cache('responses')
+        if cache is None:
+            return None
+        serialized_response = cache.get(self._get_response_cache_key(params))
+        if serialized_response is None:
+            return None
+        try:
+            return loads(serialized_response)
+        except Exception as e:  # pylint: disable=broad-except
+            # stored by another version of searx, or with another secret_key
+            logger.debug('can\'t load the cached response: {0!r}'.format(e))
             return None
 
-        # send request
+    def _cache_response(self, params, response):
+        if not self.engine.cache_ttl or response.status_code != 200:
+            return
+        cache = get_cache('responses')
+        if cache is None:
+            return
+        cache.set(self._get_response_cache_key(params), dumps(response), self.engine.cache_ttl)
+
+    def _get_inflight_key(self, params):
+        # the User-Agent is chosen randomly for each request
+        headers = sorted((k, v) for k, v in params['headers'].items() if k.lower() != 'user-agent')
+        return self._get_response_cache_key(params) + repr((headers, sorted(params['cookies'].items())))
+
+    def _send_http_request_with_context(self, context, params):
+        poolrequests.set_context_for_thread(context)
         response = self._send_http_request(params)
+        return response, poolrequests.get_time_for_thread()
+
+    def _submit_http_request(self, context, params):
+        # the thread runs in a copy of the context: see searx.metrology.tracing
+        return hedge_pool.submit(contextvars.copy_context().run, self._send_http_request_with_context, context, params)
+
+    def _acquire_hedge(self):
+        # hedge_budget: maximum percentage of the requests sent twice
+        with self._hedge_lock:
+            if self.hedge_count + 1 > self.request_count * self.engine.hedge_budget / 100.0:
+                return False
+            self.hedge_count += 1
+            return True
+
+    def _send_hedged_http_request(self, params):
+        """Send the HTTP request, and send it again if there is no response after the
+        ``hedge_percentile`` of the response times of the engine.  The first response wins.
+        """
+        if not self.engine.hedge_percentile or params['method'] not in HEDGE_METHODS:
+            return self._send_http_request(params)
+        # the response times of the last minutes
+        request_times = self.request_time_histogram.snapshot()
+        if request_times.count < HEDGE_MIN_COUNT:
+            return self._send_http_request(params)
+
+        # the calling thread waits for the first response: both requests are sent from the threads of
+        # hedge_pool, so the second request may use another proxy or source IP
+        context = poolrequests.get_context_for_thread()
+        future = self._submit_http_request(context, params)
+        if future is None:
+            return self._send_http_request(params)
+        with self._hedge_lock:
+            self.request_count += 1
+        futures = [future]
+        done, _ = concurrent.futures.wait(futures, timeout=request_times.percentile(self.engine.hedge_percentile))
+        if not done and self._acquire_hedge():
+            hedge_future = self._submit_http_request(context, params)
+            if hedge_future is not None:
+                logger.debug('%s: hedged request', self.engine_name)
+                futures.append(hedge_future)
+
+        first_exception = None
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                response, page_load_time = future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                first_exception = first_exception or e
+                continue
+            if future is not futures[0]:
+                with self._hedge_lock:
+                    self.hedge_win_count += 1
+            poolrequests.add_time_for_thread(page_load_time)
+            return response
+        raise first_exception
+
+    def get_hedge_stats(self):
+        return {
+            'name': self.engine_name,
+            'request_count': self.request_count,
+            'hedge_count': self.hedge_count,
+            'hedge_win_count': self.hedge_win_count,
+            'hedge_delay': self.request_time_histogram.percentile(self.engine.hedge_percentile),
+        }
 
-        # parse the response
-        response.search_params = params
-        return self.engine.response(response)
+    def _send_and_cache_http_request(self, params):
+        response = self._send_hedged_http_request(params)
+        self._cache_response(params, response)
+        return response
 
-    def search(self, query, params, result_container, start_time, timeout_limit):
+    def _fetch_response(self, params):
+        """Send the HTTP request, or wait for the response of the same request sent by another thread."""
+        with tracing.span('engine.http') as http_span:
+            if not singleflight_enabled:
+                return self._send_and_cache_http_request(params)
+            response, shared = http_requests.do(self._get_inflight_key(params), self._send_and_cache_http_request,
+                                                params)
+            http_span.set_attribute('shared', shared)
+        if shared:
+            # _parse_response sets the search_params attribute
+            response = copy.copy(response)
+        return response
+
+    def _call_with_http_context(self, start_time, timeout_limit, func, *args):
+        # run from a worker thread of the event loop: the poolrequests context is thread local
+        self._set_http_context(start_time, timeout_limit)
+        return func(*args), poolrequests.get_time_for_thread()
+
+    def _set_http_context(self, start_time, timeout_limit):
         # set timeout for all HTTP requests
         poolrequests.set_timeout_for_thread(timeout_limit, start_time=start_time)
         # reset the HTTP total time
         poolrequests.reset_time_for_thread()
         # enable HTTP only if explicitly enabled
         poolrequests.set_enable_http_protocol(self.engine.enable_http)
+        # use the network of the engine, and with httpx its connection pool
+        poolrequests.set_pool_for_thread(self.engine.pool_name, self.engine.network)
 
-        # suppose everything will be alright
-        requests_exception = False
-        suspended_time = None
+    def _build_request(self, query, params):
+        # update request parameters dependent on
+        # search-engine (contained in engines folder)
+        with tracing.span('engine.request'):
+            self.engine.request(query, params)
 
-        try:
-            # send requests and parse the results
-            search_results = self._search_basic(query, params)
+        # ignoring empty urls
+        if params['url'] is None:
+            return False
 
-            # check if the engine accepted the request
-            if search_results is not None:
-                # yes, so add results
-                result_container.extend(self.engine_name, search_results)
-
-                # update engine time when there is no exception
-                engine_time = time() - start_time
-                page_load_time = poolrequests.get_time_for_thread()
-                result_container.add_timing(self.engine_name, engine_time, page_load_time)
-                with threading.RLock():
-                    self.engine.stats['engine_time'] += engine_time
-                    self.engine.stats['engine_time_count'] += 1
-                    # update stats with the total HTTP time
-                    self.engine.stats['page_load_time'] += page_load_time
-                    self.engine.stats['page_load_count'] += 1
-        except Exception as e:
-            record_exception(self.engine_name, e)
+        if not params['url']:
+            return False
 
-            # Timing
-            engine_time = time() - start_time
-            page_load_time = poolrequests.get_time_for_thread()
-            result_container.add_timing(self.engine_name, engine_time, page_load_time)
+        return True
 
-            # Record the errors
-            with threading.RLock():
-                self.engine.stats['errors'] += 1
+    def _parse_response(self, response, params):
+        response.search_params = params
+        parse_start_time = time()
+        with tracing.span('engine.response'):
+            search_results = self.engine.response(response)
+        self.parse_time_histogram.observe(time() - parse_start_time)
+        return search_results
+
+    def _get_response(self, params):
+        response = self._get_cached_response(params)
+        if response is None:
+            response = self._fetch_response(params)
+        return response
+
+    def _search_basic(self, query, params):
+        if not self._build_request(query, params):
+            return None
+
+        # send request
+        response = self._get_response(params)
+
+        # parse the response
+        return self._parse_response(response, params)
+
+    def _add_results(self, result_container, search_results, start_time, page_load_time):
+        # check if the engine accepted the request
+        if search_results is None:
+            return
+
+        # yes, so add results
+        with tracing.span('engine.add_results'):
+            result_container.extend(self.engine_name, search_results)
 
-            if (issubclass(e.__class__, requests.exceptions.Timeout)):
-                result_container.add_unresponsive_engine(self.engine_name, 'HTTP timeout')
-                # requests timeout (connect or read)
-                logger.error("engine {0} : HTTP requests timeout"
+        # update engine time when there is no exception
+        engine_time = time() - start_time
+        result_container.add_timing(self.engine_name, engine_time, page_load_time)
+        self.time_histogram.observe(engine_time)
+        # the total HTTP time
+        self.http_time_histogram.observe(page_load_time)
+
+    def _handle_exception(self, e, result_container, start_time, timeout_limit, page_load_time):
+        """Record an engine error.
+
+        Returns the tuple ``(requests_exception, suspended_time)`` used to update the suspension of the engine.
+        """
+        requests_exception = False
+        suspended_time = None
+
+        record_exception(self.engine_name, e)
+
+        # Timing
+        engine_time = time() - start_time
+        result_container.add_timing(self.engine_name, engine_time, page_load_time)
+
+        # Record the errors
+        self.error_counter.add()
+
+        if (issubclass(e.__class__, requests.exceptions.Timeout)):
+            result_container.add_unresponsive_engine(self.engine_name, 'HTTP timeout')
+            # requests timeout (connect or read)
+            logger.error("engine {0} : HTTP requests timeout"
+                         "(search duration : {1} s, timeout: {2} s) : {3}"
+                         .format(self.engine_name, engine_time, timeout_limit, e.__class__.__name__))
+            requests_exception = True
+        elif (issubclass(e.__class__, requests.exceptions.RequestException)):
+            result_container.add_unresponsive_engine(self.engine_name, 'HTTP error')
+            # other requests exception
+            logger.exception("engine {0} : requests exception"
                              "(search duration : {1} s, timeout: {2} s) : {3}"
-                             .format(self.engine_name, engine_time, timeout_limit, e.__class__.__name__))
-                requests_exception = True
-            elif (issubclass(e.__class__, requests.exceptions.RequestException)):
-                result_container.add_unresponsive_engine(self.engine_name, 'HTTP error')
-                # other requests exception
-                logger.exception("engine {0} : requests exception"
-                                 "(search duration : {1} s, timeout: {2} s) : {3}"
-                                 .format(self.engine_name, engine_time, timeout_limit, e))
-                requests_exception = True
-            elif (issubclass(e.__class__, SearxEngineCaptchaException)):
-                result_container.add_unresponsive_engine(self.engine_name, 'CAPTCHA required')
-                logger.exception('engine {0} : CAPTCHA'.format(self.engine_name))
-                suspended_time = e.suspended_time  # pylint: disable=no-member
-            elif (issubclass(e.__class__, SearxEngineTooManyRequestsException)):
-                result_container.add_unresponsive_engine(self.engine_name, 'too many requests')
-                logger.exception('engine {0} : Too many requests'.format(self.engine_name))
-                suspended_time = e.suspended_time  # pylint: disable=no-member
-            elif (issubclass(e.__class__, SearxEngineAccessDeniedException)):
-                result_container.add_unresponsive_engine(self.engine_name, 'blocked')
-                logger.exception('engine {0} : Searx is blocked'.format(self.engine_name))
-                suspended_time = e.suspended_time  # pylint: disable=no-member
-            else:
-                result_container.add_unresponsive_engine(self.engine_name, 'unexpected crash')
-                # others errors
-                logger.exception('engine {0} : exception : {1}'.format(self.engine_name, e))
+                             .format(self.engine_name, engine_time, timeout_limit, e))
+            requests_exception = True
+        elif (issubclass(e.__class__, SearxEngineCaptchaException)):
+            result_container.add_unresponsive_engine(self.engine_name, 'CAPTCHA required')
+            logger.exception('engine {0} : CAPTCHA'.format(self.engine_name))
+            suspended_time = e.suspended_time  # pylint: disable=no-member
+        elif (issubclass(e.__class__, SearxEngineTooManyRequestsException)):
+            result_container.add_unresponsive_engine(self.engine_name, 'too many requests')
+            logger.exception('engine {0} : Too many requests'.format(self.engine_name))
+            suspended_time = e.suspended_time  # pylint: disable=no-member
+        elif (issubclass(e.__class__, SearxEngineAccessDeniedException)):
+            result_container.add_unresponsive_engine(self.engine_name, 'blocked')
+            logger.exception('engine {0} : Searx is blocked'.format(self.engine_name))
+            suspended_time = e.suspended_time  # pylint: disable=no-member
         else:
-            if getattr(threading.current_thread(), '_timeout', False):
-                record_error(self.engine_name, 'Timeout')
+            result_container.add_unresponsive_engine(self.engine_name, 'unexpected crash')
+            # others errors
+            logger.exception('engine {0} : exception : {1}'.format(self.engine_name, e))
 
+        return requests_exception, suspended_time
+
+    def _update_suspension(self, requests_exception, suspended_time):
         # suspend the engine if there is an HTTP error
         # or suspended_time is defined
-        with threading.RLock():
+        with stats_lock:
             if requests_exception or suspended_time:
                 # update continuous_errors / suspend_end_time
                 self.engine.continuous_errors += 1
@@ -219,6 +430,61 @@ class OnlineProcessor(EngineProcessor):
                 self.engine.continuous_errors = 0
                 self.engine.suspend_end_time = 0
 
+    def search(self, query, params, result_container, start_time, timeout_limit):
+        self._set_http_context(start_time, timeout_limit)
+
+        # suppose everything will be alright
+        requests_exception = False
+        suspended_time = None
+
+        try:
+            # send requests and parse the results
+            search_results = self._search_basic(query, params)
+            self._add_results(result_container, search_results, start_time, poolrequests.get_time_for_thread())
+        except Exception as e:
+            requests_exception, suspended_time = self._handle_exception(e, result_container, start_time,
+                                                                        timeout_limit,
+                                                                        poolrequests.get_time_for_thread())
+        else:
+            if getattr(threading.current_thread(), '_timeout', False):
+                record_error(self.engine_name, 'Timeout')
+
+        self._update_suspension(requests_exception, suspended_time)
+
+    async def search_async(self, query, params, result_container, start_time, timeout_limit):
+        # the engines may send HTTP requests from their request and response functions:
+        # each step runs in a worker thread of the event loop, with the HTTP timeout of the engine.
+        # poolrequests is blocking: a thread is held for the whole HTTP request, as with the pool executor.
+        loop = asyncio.get_event_loop()
+        requests_exception = False
+        suspended_time = None
+        page_load_time = 0
+
+        async def call(func, *args):
+            nonlocal page_load_time
+            # the thread runs in a copy of the context: see searx.metrology.tracing
+            result, http_time = await loop.run_in_executor(
+                None, contextvars.copy_context().run,
+                self._call_with_http_context, start_time, timeout_limit, func, *args
+            )
+            page_load_time += http_time
+            return result
+
+        try:
+            search_results = None
+            if await call(self._build_request, query, params):
+                response = await call(self._get_response, params)
+                search_results = await call(self._parse_response, response, params)
+            self._add_results(result_container, search_results, start_time, page_load_time)
+        except asyncio.CancelledError:
+            # engine timeout: see Search.search_multiple_requests
+            raise
+        except Exception as e:
+            requests_exception, suspended_time = self._handle_exception(e, result_container, start_time,
+                                                                        timeout_limit, page_load_time)
+
+        self._update_suspension(requests_exception, suspended_time)
+
     def get_default_tests(self):
         tests = {}
 
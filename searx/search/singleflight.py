@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Coalescing of the concurrent identical calls (``outgoing.singleflight``).
+
+When the same work is requested by several threads of a worker process at the
+same time, only the first caller does the work: the other callers wait for its
+result and get the same value, or the same exception.  Nothing is kept once the
+work is done, see :py:mod:`searx.cache` to reuse the results afterwards.
+
+searx coalesces:
+
+* the identical queries (:py:data:`queries`),
+* the identical HTTP requests sent to an engine (:py:data:`http_requests`).
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.shared_calls = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, share=None):
+        """Return the value of ``fn(*args)``, and True if it has been computed by another caller.
+
+        If a call with the same ``key`` is in progress in another thread, wait
+        for its value instead of calling ``fn``.  With ``share``, the waiting
+        callers get ``share(value)``: it is called only if there is one.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared_calls += 1
+                call[1] += 1
+                leader = False
+            else:
+                # future, number of callers waiting for the value
+                call = self._calls[key] = [Future(), 0]
+                leader = True
+
+        future = call[0]
+        if not leader:
+            return future.result(), True
+
+        try:
+            value = fn(*args)
+        except BaseException as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        # no caller can join anymore
+        self._forget(key)
+        if share is None or call[1] == 0:
+            future.set_result(value)
+        else:
+            try:
+                future.set_result(share(value))
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+        return value, False
+
+    def _forget(self, key):
+        # the callers arriving from now on start a new call
+        with self._lock:
+            del self._calls[key]
+
+    def get_stats(self):
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'shared_calls': self.shared_calls,
+        }
+
+
+queries = SingleFlight('queries')
+http_requests = SingleFlight('http_requests')
+
+
+def get_stats():
+    """Statistics of the coalesced calls, empty if there is none."""
+    return [singleflight.get_stats() for singleflight in (queries, http_requests) if singleflight.calls]
@@ -0,0 +1,108 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Worker pool of the ``pool`` executor.
+
+The engine requests of all the queries are sent from a bounded pool of
+long-lived threads instead of one new thread per engine and per query.  When
+the pool is saturated (too many requests waiting for a thread, or too many
+requests in progress for one engine), new engine requests are rejected instead
+of queued, and a queued request is dropped if its query has already timed out
+when a thread becomes available.
+"""
+
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import time
+
+from searx import logger, settings
+
+
+logger = logger.getChild('search.workerpool')
+
+
+class EngineWorkerPool:
+
+    def __init__(self, max_workers, max_queue, max_engine_concurrency):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_engine_concurrency = max_engine_concurrency
+        self.queue_depth = 0
+        self.active_count = 0
+        self.rejected_count = 0
+        self.expired_count = 0
+        self._engine_counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, engine_name, deadline, fn, *args):
+        """Call ``fn(*args)`` from a thread of the pool.
+
+        Returns a :py:class:`concurrent.futures.Future`, or None if the request is rejected.
+        ``fn`` is not called if a thread becomes available after ``deadline``.
+        """
+        with self._lock:
+            if self.queue_depth >= self.max_queue\
+               or self._engine_counts[engine_name] >= self.max_engine_concurrency:
+                self.rejected_count += 1
+                return None
+            self.queue_depth += 1
+            self._engine_counts[engine_name] += 1
+        future = self._executor.submit(self._run, deadline, fn, args)
+        future.add_done_callback(partial(self._done, engine_name))
+        return future
+
+    def _run(self, deadline, fn, args):
+        with self._lock:
+            self.queue_depth -= 1
+            if time() > deadline:
+                self.expired_count += 1
+                return None
+            self.active_count += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.active_count -= 1
+
+    def _done(self, engine_name, future):
+        with self._lock:
+            self._engine_counts[engine_name] -= 1
+            if future.cancelled():
+                self.queue_depth -= 1
+
+    def get_stats(self):
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'queue_depth': self.queue_depth,
+            'active_count': self.active_count,
+            'rejected_count': self.rejected_count,
+            'expired_count': self.expired_count,
+        }
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def get_pool():
+    """Return the worker pool of the current process, create it if required."""
+    global _pool, _pool_pid  # pylint: disable=global-statement
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            outgoing = settings['outgoing']
+            _pool = EngineWorkerPool(outgoing.get('executor_max_workers', 100),
+                                     outgoing.get('executor_max_queue', 200),
+                                     outgoing.get('executor_max_engine_concurrency', 20))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def get_stats():
+    """Statistics of the worker pool of the current process, None if the pool is not used."""
+    if _pool is None or _pool_pid != os.getpid():
+        return None
+    return _pool.get_stats()
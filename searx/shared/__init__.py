@@ -8,7 +8,7 @@ try:
     import uwsgi
 except:
     # no uwsgi
-    from .shared_simple import SimpleSharedDict as SharedDict, schedule
+    from .shared_simple import SimpleSharedDict as SharedDict, schedule, get_worker_id, get_worker_ids
     logger.info('Use shared_simple implementation')
 else:
     try:
@@ -19,13 +19,13 @@ else:
         # uwsgi.ini configuration problem: disable all scheduling
         logger.error('uwsgi.ini configuration error, add this line to your uwsgi.ini\n'
                      'cache2 = name=searxcache,items=2000,blocks=2000,blocksize=4096,bitmap=1')
-        from .shared_simple import SimpleSharedDict as SharedDict
+        from .shared_simple import SimpleSharedDict as SharedDict, get_worker_id, get_worker_ids
 
         def schedule(delay, func, *args):
             return False
     else:
         # uwsgi
-        from .shared_uwsgi import UwsgiCacheSharedDict as SharedDict, schedule
+        from .shared_uwsgi import UwsgiCacheSharedDict as SharedDict, schedule, get_worker_id, get_worker_ids
         logger.info('Use shared_uwsgi implementation')
 
 storage = SharedDict()
@@ -19,3 +19,14 @@ class SharedDict(ABC):
     @abstractmethod
     def set_str(self, key, value):
         pass
+
+    @abstractmethod
+    def get_bytes(self, key):
+        pass
+
+    @abstractmethod
+    def set_bytes(self, key, value, expires=0):
+        """Store ``value``, the implementation may drop it after ``expires`` seconds (0: never).
+
+        Return False if the value has not been stored.
+        """
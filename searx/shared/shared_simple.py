@@ -24,6 +24,21 @@ class SimpleSharedDict(shared_abstract.SharedDict):
     def set_str(self, key, value):
         self.d[key] = value
 
+    def get_bytes(self, key):
+        return self.d.get(key, None)
+
+    def set_bytes(self, key, value, expires=0):
+        self.d[key] = value
+        return True
+
+
+def get_worker_id():
+    return 0
+
+
+def get_worker_ids():
+    return [0]
+
 
 def schedule(delay, func, *args):
     def call_later():
@@ -32,6 +32,22 @@ class UwsgiCacheSharedDict(shared_abstract.SharedDict):
         b = value.encode('utf-8')
         uwsgi.cache_update(key, b)
 
+    def get_bytes(self, key):
+        return uwsgi.cache_get(key)
+
+    def set_bytes(self, key, value, expires=0):
+        # None if the value is larger than the cache allows
+        return bool(uwsgi.cache_update(key, value, expires))
+
+
+def get_worker_id():
+    return uwsgi.worker_id()
+
+
+def get_worker_ids():
+    """Return the ids of all the workers, the id of a worker does not change when it is restarted."""
+    return list(range(1, uwsgi.numproc + 1))
+
 
 def schedule(delay, func, *args):
     """
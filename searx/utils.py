@@ -3,6 +3,7 @@ import sys
 import re
 import importlib
 
+from functools import lru_cache
 from numbers import Number
 from os.path import splitext, join
 from random import choice
@@ -214,10 +215,33 @@ def normalize_url(url, base_url):
     return url
 
 
+@lru_cache(maxsize=4096)
+def parse_url(url):
+    """Return ``urlparse(url)``, cached: the same URL is parsed once per worker process.
+
+    The result is a named tuple shared by all the callers, use ``_replace`` to
+    get a modified copy.  See :py:func:`get_parse_url_stats`.
+    """
+    return urlparse(url)
+
+
+def get_parse_url_stats():
+    """Hits and misses of the cache of :py:func:`parse_url`, same keys as :py:func:`searx.cache.get_stats`."""
+    cache_info = parse_url.cache_info()
+    total = cache_info.hits + cache_info.misses
+    return {
+        'name': 'parse_url',
+        'backend': 'memory',
+        'hits': cache_info.hits,
+        'misses': cache_info.misses,
+        'hit_rate': cache_info.hits / total if total else 0.0,
+    }
+
+
 def add_scheme_to_url(url, scheme="https"):
     """Add schema to URL: if scheme is missing from the URL, then add it."""
 
-    parsed = urlparse(url)
+    parsed = parse_url(url)
     if parsed.scheme == '':
         parsed_with_scheme = parsed._replace(scheme=scheme)
         return urlunparse(parsed_with_scheme)
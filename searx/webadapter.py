@@ -4,6 +4,7 @@ from searx.exceptions import SearxParameterException
 from searx.webutils import VALID_LANGUAGE_CODE
 from searx.query import RawTextQuery
 from searx.engines import categories, engines
+from searx.metrology import tracing
 from searx.search import SearchQuery, EngineRef
 from searx.preferences import Preferences, is_locked
 
@@ -217,7 +218,8 @@ def get_search_query_from_webapp(preferences: Preferences, form: Dict[str, str])
 
     # parse query, if tags are set, which change
     # the search engine or search-language
-    raw_text_query = RawTextQuery(form['q'], disabled_engines)
+    with tracing.span('raw_text_query'):
+        raw_text_query = RawTextQuery(form['q'], disabled_engines)
 
     # set query
     query = raw_text_query.getQuery()
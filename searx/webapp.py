@@ -50,7 +50,7 @@ from pygments.formatters import HtmlFormatter  # pylint: disable=no-name-in-modu
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask import (
     Flask, request, render_template, url_for, Response, make_response,
-    redirect, send_from_directory
+    redirect, send_from_directory, stream_with_context
 )
 from babel.support import Translations
 import flask_babel
@@ -60,8 +60,9 @@ from flask.json import jsonify
 from searx import brand, static_path
 from searx import settings, searx_dir, searx_debug
 from searx.exceptions import SearxParameterException
+from searx.results import Result
 from searx.engines import (
-    categories, engines, engine_shortcuts, get_engines_stats
+    categories, engines, engine_shortcuts, get_engines_stats, get_engines_time_stats
 )
 from searx.webutils import (
     UnicodeWriter, highlight_content, get_resources_directory,
@@ -69,11 +70,17 @@ from searx.webutils import (
     prettify_url, new_hmac, is_flask_run_cmdline
 )
 from searx.webadapter import get_search_query_from_webapp, get_selected_categories
-from searx.utils import html_to_text, gen_useragent, dict_subset, match_language
+from searx.utils import html_to_text, gen_useragent, dict_subset, match_language, parse_url, get_parse_url_stats
 from searx.version import VERSION_STRING
 from searx.languages import language_codes as languages
 from searx.search import SearchWithPlugins, initialize as search_initialize
 from searx.search.checker import get_result as checker_get_result
+from searx.search.workerpool import get_stats as workerpool_get_stats
+from searx.search.singleflight import get_stats as singleflight_get_stats
+from searx.poolrequests import get_stats as network_get_stats
+from searx.search.processors import get_hedge_stats
+from searx.ranking import get_stats as ranking_get_stats
+from searx.cache import get_stats as cache_get_stats
 from searx.query import RawTextQuery
 from searx.autocomplete import search_autocomplete, backends as autocomplete_backends
 from searx.plugins import plugins
@@ -82,7 +89,8 @@ from searx.preferences import Preferences, ValidationException, LANGUAGE_CODES
 from searx.answerers import answerers
 from searx.poolrequests import get_global_proxies
 from searx.answerers import ask
-from searx.metrology.error_recorder import errors_per_engines
+from searx.metrology.aggregation import get_metrics
+from searx.metrology import prometheus, tracing
 from searx.settings_loader import get_default_settings_path
 
 # serve pages with HTTP/1.1
@@ -271,7 +279,7 @@ def code_highlighter(codelines, language=None):
 # Extract domain from url
 @app.template_filter('extract_domain')
 def extract_domain(url):
-    return urlparse(url)[1]
+    return parse_url(url)[1]
 
 
 def get_base_url():
@@ -439,8 +447,9 @@ def render(template_name, override_theme=None, **kwargs):
         for css in plugin.css_dependencies:
             kwargs['styles'].add(css)
 
-    return render_template(
-        '{}/{}'.format(kwargs['theme'], template_name), **kwargs)
+    with tracing.span('render', template=template_name):
+        return render_template(
+            '{}/{}'.format(kwargs['theme'], template_name), **kwargs)
 
 
 def _get_ordered_categories():
@@ -459,7 +468,15 @@ def pre_request():
     request.start_time = time()
     request.timings = []
     request.errors = []
+    request.trace_span = None
+    if request.endpoint != 'static':
+        request.trace_span = tracing.start_trace(request.method + ' ' + request.path,
+                                                 **{'http.method': request.method})
+    with tracing.span('pre_request'):
+        _parse_preferences()
 
+
+def _parse_preferences():
     preferences = Preferences(themes, list(categories.keys()), engines, plugins)
     user_agent = request.headers.get('User-Agent', '').lower()
     if 'webkit' in user_agent and 'android' in user_agent:
@@ -493,13 +510,8 @@ def pre_request():
         preferences.parse_dict({"locale": get_locale()})
 
     # request.user_plugins
-    request.user_plugins = []
-    allowed_plugins = preferences.plugins.get_enabled()
-    disabled_plugins = preferences.plugins.get_disabled()
-    for plugin in plugins:
-        if ((plugin.default_on and plugin.id not in disabled_plugins)
-                or plugin.id in allowed_plugins):
-            request.user_plugins.append(plugin)
+    request.user_plugins = plugins.get_user_chain(preferences.plugins.get_enabled(),
+                                                  preferences.plugins.get_disabled())
 
 
 @app.after_request
@@ -518,17 +530,30 @@ def post_request(response):
     timings_all = ['total;dur=' + str(round(total_time * 1000, 3))]
     if len(request.timings) > 0:
         timings = sorted(request.timings, key=lambda v: v['total'])
-        timings_total = ['total_' + str(i) + '_' + v['engine'] +
+        # the engines cut off by the early return have no load time
+        timings_total = [('cutoff_' if v.get('cut_off') else 'total_') + str(i) + '_' + v['engine'] +
                          ';dur=' + str(round(v['total'] * 1000, 3)) for i, v in enumerate(timings)]
         timings_load = ['load_' + str(i) + '_' + v['engine'] +
-                        ';dur=' + str(round(v['load'] * 1000, 3)) for i, v in enumerate(timings)]
+                        ';dur=' + str(round(v['load'] * 1000, 3)) for i, v in enumerate(timings)
+                        if not v.get('cut_off')]
         timings_all = timings_all + timings_total + timings_load
     response.headers.add('Server-Timing', ', '.join(timings_all))
+    if request.trace_span is not None:
+        request.trace_span.set_attribute('http.status_code', response.status_code)
     return response
 
 
+@app.teardown_request
+def end_trace(_exception):
+    trace_span = getattr(request, 'trace_span', None)
+    if trace_span is not None:
+        tracing.end_trace(trace_span)
+
+
 def index_error(output_format, error_message):
-    if output_format == 'json':
+    if output_format == 'sse':
+        return Response(__sse_event('error', {'error': error_message}), mimetype='text/event-stream')
+    elif output_format == 'json':
         return Response(json.dumps({'error': error_message}),
                         mimetype='application/json')
     elif output_format == 'csv':
@@ -584,12 +609,12 @@ def health():
 def search():
     """Search query in q and return results.
 
-    Supported outputs: html, json, csv, rss.
+    Supported outputs: html, json, csv, rss, sse.
     """
 
     # output_format
     output_format = request.form.get('format', 'html')
-    if output_format not in ['html', 'csv', 'json', 'rss']:
+    if output_format not in ['html', 'csv', 'json', 'rss', 'sse']:
         output_format = 'html'
 
     # check if there is query (not None and not an empty string)
@@ -608,11 +633,16 @@ def search():
     raw_text_query = None
     result_container = None
     try:
-        search_query, raw_text_query, _, _ = get_search_query_from_webapp(request.preferences, request.form)
+        with tracing.span('get_search_query_from_webapp'):
+            search_query, raw_text_query, _, _ = get_search_query_from_webapp(request.preferences, request.form)
         # search = Search(search_query) #  without plugins
         search = SearchWithPlugins(search_query, request.user_plugins, request)
 
-        result_container = search.search()
+        if output_format == 'sse':
+            return __search_sse(search)
+
+        with tracing.span('search'):
+            result_container = search.search()
 
     except SearxParameterException as e:
         logger.exception('search error: SearxParameterException')
@@ -636,48 +666,10 @@ def search():
 
     # output
     for result in results:
-        if output_format == 'html':
-            if 'content' in result and result['content']:
-                result['content'] = highlight_content(escape(result['content'][:1024]), search_query.query)
-            if 'title' in result and result['title']:
-                result['title'] = highlight_content(escape(result['title'] or ''), search_query.query)
-        else:
-            if result.get('content'):
-                result['content'] = html_to_text(result['content']).strip()
-            # removing html content and whitespace duplications
-            result['title'] = ' '.join(html_to_text(result['title']).strip().split())
-
-        if 'url' in result and 'pretty_url' not in result:
-            result['pretty_url'] = prettify_url(result['url'])
-
-        # TODO, check if timezone is calculated right
-        if result.get('publishedDate'):  # do not try to get a date from an empty string or a None type
-            try:  # test if publishedDate >= 1900 (datetime module bug)
-                result['pubdate'] = result['publishedDate'].strftime('%Y-%m-%d %H:%M:%S%z')
-            except ValueError:
-                result['publishedDate'] = None
-            else:
-                if result['publishedDate'].replace(tzinfo=None) >= datetime.now() - timedelta(days=1):
-                    timedifference = datetime.now() - result['publishedDate'].replace(tzinfo=None)
-                    minutes = int((timedifference.seconds / 60) % 60)
-                    hours = int(timedifference.seconds / 60 / 60)
-                    if hours == 0:
-                        result['publishedDate'] = gettext('{minutes} minute(s) ago').format(minutes=minutes)
-                    else:
-                        result['publishedDate'] = gettext('{hours} hour(s), {minutes} minute(s) ago').format(hours=hours, minutes=minutes)  # noqa
-                else:
-                    result['publishedDate'] = format_date(result['publishedDate'])
+        __format_result(result, output_format, search_query.query)
 
     if output_format == 'json':
-        return Response(json.dumps({'query': search_query.query,
-                                    'number_of_results': number_of_results,
-                                    'results': results,
-                                    'answers': list(result_container.answers),
-                                    'corrections': list(result_container.corrections),
-                                    'infoboxes': result_container.infoboxes,
-                                    'suggestions': list(result_container.suggestions),
-                                    'unresponsive_engines': __get_translated_errors(result_container.unresponsive_engines)},  # noqa
-                                   default=lambda item: list(item) if isinstance(item, set) else item),
+        return Response(__json_dumps(__get_json_results(search_query, result_container, results, number_of_results)),
                         mimetype='application/json')
     elif output_format == 'csv':
         csv = UnicodeWriter(StringIO())
@@ -756,6 +748,113 @@ def search():
     )
 
 
+def __format_result(result, output_format, query):
+    if output_format == 'html':
+        if 'content' in result and result['content']:
+            result['content'] = highlight_content(escape(result['content'][:1024]), query)
+        if 'title' in result and result['title']:
+            result['title'] = highlight_content(escape(result['title'] or ''), query)
+    else:
+        if result.get('content'):
+            result['content'] = html_to_text(result['content']).strip()
+        # removing html content and whitespace duplications
+        result['title'] = ' '.join(html_to_text(result['title']).strip().split())
+
+    if 'url' in result and 'pretty_url' not in result:
+        result['pretty_url'] = prettify_url(result['url'])
+
+    # TODO, check if timezone is calculated right
+    if result.get('publishedDate'):  # do not try to get a date from an empty string or a None type
+        try:  # test if publishedDate >= 1900 (datetime module bug)
+            result['pubdate'] = result['publishedDate'].strftime('%Y-%m-%d %H:%M:%S%z')
+        except ValueError:
+            result['publishedDate'] = None
+        else:
+            if result['publishedDate'].replace(tzinfo=None) >= datetime.now() - timedelta(days=1):
+                timedifference = datetime.now() - result['publishedDate'].replace(tzinfo=None)
+                minutes = int((timedifference.seconds / 60) % 60)
+                hours = int(timedifference.seconds / 60 / 60)
+                if hours == 0:
+                    result['publishedDate'] = gettext('{minutes} minute(s) ago').format(minutes=minutes)
+                else:
+                    result['publishedDate'] = gettext('{hours} hour(s), {minutes} minute(s) ago').format(hours=hours, minutes=minutes)  # noqa
+            else:
+                result['publishedDate'] = format_date(result['publishedDate'])
+
+
+def __get_json_results(search_query, result_container, results, number_of_results):
+    return {'query': search_query.query,
+            'number_of_results': number_of_results,
+            'results': results,
+            'answers': list(result_container.answers),
+            'corrections': list(result_container.corrections),
+            'infoboxes': result_container.infoboxes,
+            'suggestions': list(result_container.suggestions),
+            'unresponsive_engines': __get_translated_errors(result_container.unresponsive_engines)}
+
+
+def __json_default(item):
+    if isinstance(item, set):
+        return list(item)
+    if isinstance(item, Result):
+        return dict(item)
+    return item
+
+
+def __json_dumps(data):
+    return json.dumps(data, default=__json_default)
+
+
+def __sse_event(event, data):
+    return 'event: {0}\ndata: {1}\n\n'.format(event, __json_dumps(data))
+
+
+def __search_sse(search):
+    """Stream the results with Server-Sent Events.
+
+    A ``results`` event is sent each time an engine has answered, with all the
+    results merged so far.  The last event, ``done``, has the content of the json
+    output (and ``redirect_url`` for an external bang).
+    """
+    query = search.search_query.query
+
+    def get_number_of_results(result_container, results):
+        number_of_results = result_container.results_number()
+        return 0 if number_of_results < len(results) else number_of_results
+
+    def generate():
+        try:
+            for engine_name in search.search_iter():
+                results = search.get_current_results()
+                for result in results:
+                    __format_result(result, 'sse', query)
+                yield __sse_event('results', {
+                    'engine': engine_name,
+                    'results': results,
+                    'number_of_results': get_number_of_results(search.result_container, results),
+                })
+        except Exception:
+            logger.exception('search error')
+            yield __sse_event('error', {'error': gettext('search error')})
+            return
+
+        result_container = search.result_container
+        results = result_container.get_ordered_results()
+        for result in results:
+            __format_result(result, 'sse', query)
+        json_results = __get_json_results(search.search_query, result_container, results,
+                                          get_number_of_results(result_container, results))
+        if result_container.redirect_url:
+            json_results['redirect_url'] = result_container.redirect_url
+        yield __sse_event('done', json_results)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx: do not buffer the response
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 def __get_translated_errors(unresponsive_engines):
     translated_errors = set()
     for unresponsive_engine in unresponsive_engines:
@@ -968,21 +1067,39 @@ def stats():
     """Render engine statistics page."""
     if not settings['general'].get('enable_stats'):
         return page_not_found(None)
-    stats = get_engines_stats(request.preferences)
+    metrics = get_metrics()
+    stats = get_engines_stats(request.preferences, metrics)
     return render(
         'stats.html',
         stats=stats,
+        engine_time_stats=get_engines_time_stats(request.preferences, metrics),
+        workerpool_stats=workerpool_get_stats(),
+        cache_stats=cache_get_stats() + [get_parse_url_stats()],
+        singleflight_stats=singleflight_get_stats(),
+        network_stats=network_get_stats(),
+        hedge_stats=get_hedge_stats(),
+        ranking_stats=ranking_get_stats(metrics),
+        plugin_stats=plugins.get_stats(metrics),
     )
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrics in the Prometheus text format."""
+    if not settings['general'].get('enable_stats'):
+        return page_not_found(None)
+    return Response(prometheus.get_text(get_metrics()), content_type=prometheus.CONTENT_TYPE)
+
+
 @app.route('/stats/errors', methods=['GET'])
 def stats_errors():
     result = {}
-    engine_names = list(errors_per_engines.keys())
+    metrics = get_metrics()
+    engine_names = list(metrics.errors.keys())
     engine_names.sort()
     for engine_name in engine_names:
-        error_stats = errors_per_engines[engine_name]
-        sent_search_count = max(engines[engine_name].stats['sent_search_count'], 1)
+        error_stats = metrics.errors[engine_name]
+        sent_search_count = max(metrics.get_counter('engine', engine_name, 'search', 'sent'), 1)
         sorted_context_count_list = sorted(error_stats.items(), key=lambda context_count: context_count[1])
         r = []
         percentage_sum = 0
@@ -1015,6 +1132,7 @@ def robots():
 Allow: /
 Allow: /about
 Disallow: /stats
+Disallow: /metrics
 Disallow: /preferences
 Disallow: /*?*q=*
 """, mimetype='text/plain')
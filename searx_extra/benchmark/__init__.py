@@ -0,0 +1,97 @@
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Shared code of the benchmark scripts.
+
+The benchmarks never contact the real engines: :py:func:`start_stub_server`
+starts a local HTTP server in another process (its CPU time is not counted)
+which answers like a JSON API after a random delay, and
+:py:func:`get_engine_settings` returns ``json_engine`` settings pointing to it.
+"""
+
+import json
+import math
+import random
+import time
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def _serve(port, delay, result_count, ready):
+
+    class StubHandler(BaseHTTPRequestHandler):
+
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            query = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+            # log-normal latency: most answers are fast, a few are slow
+            time.sleep(random.lognormvariate(math.log(delay), 0.5) if delay else 0)
+            body = json.dumps({
+                'results': [
+                    {
+                        'url': 'https://example{}.com/{}/{}'.format(i % 7, query, i),
+                        'title': '{} {}'.format(query, i),
+                        'content': 'content of the result {} for {}'.format(i, query),
+                    }
+                    for i in range(result_count)
+                ]
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            pass
+
+    server = _ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    ready.set()
+    server.serve_forever()
+
+
+def start_stub_server(port=18888, delay=0.05, result_count=10):
+    """Start the stub JSON API on ``127.0.0.1:port``, return the process."""
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=_serve, args=(port, delay, result_count, ready))
+    process.daemon = True
+    process.start()
+    ready.wait()
+    return process
+
+
+def get_engine_settings(count, port=18888, timeout=3.0, **kwargs):
+    """Return the settings of ``count`` engines using the stub server."""
+    engines = []
+    for i in range(count):
+        engine = {
+            'name': 'bench{}'.format(i),
+            'engine': 'json_engine',
+            'shortcut': 'bench{}'.format(i),
+            'categories': 'general',
+            'search_url': 'http://127.0.0.1:{}/?q={{query}}&engine={}'.format(port, i),
+            'results_query': 'results',
+            'url_query': 'url',
+            'title_query': 'title',
+            'content_query': 'content',
+            'enable_http': True,
+            'timeout': timeout,
+        }
+        engine.update(kwargs)
+        engines.append(engine)
+    return engines
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of ``values``, ``p`` between 0 and 100."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(0, int(math.ceil(p / 100.0 * len(values))) - 1)
+    return values[rank]
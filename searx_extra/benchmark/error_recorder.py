@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Measure the cost of :py:func:`searx.metrology.error_recorder.record_error`
+and :py:func:`searx.metrology.error_recorder.record_exception`.
+
+The errors are recorded from a stack of ``--depth`` frames, like the engine
+errors recorded by the threads of the searches.
+
+.. code:: bash
+
+    $ python -m searx_extra.benchmark.error_recorder --count 10000 --depth 30
+"""
+
+import argparse
+import time
+
+from searx.metrology.error_recorder import record_error, record_exception
+
+
+def call_with_depth(depth, func):
+    if depth <= 1:
+        return func()
+    return call_with_depth(depth - 1, func)
+
+
+def record_timeout():
+    record_error('benchmark', 'Timeout')
+
+
+def raise_and_record():
+    try:
+        raise ValueError('invalid value')
+    except ValueError as e:
+        record_exception('benchmark', e)
+
+
+def measure(func, count, depth):
+    """Return the duration of one call in microseconds."""
+    start_time = time.perf_counter()
+    for _ in range(count):
+        call_with_depth(depth, func)
+    return (time.perf_counter() - start_time) / count * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--depth', type=int, default=30)
+    args = parser.parse_args(argv)
+
+    print('record_error: {:.1f} µs'.format(measure(record_timeout, args.count, args.depth)))
+    print('record_exception: {:.1f} µs'.format(measure(raise_and_record, args.count, args.depth)))
+
+
+if __name__ == '__main__':
+    main()
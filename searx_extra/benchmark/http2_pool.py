@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Compare the HTTP backends of :py:mod:`searx.poolrequests` (``outgoing.http_backend``).
+
+Many threads send requests to the same engine, a local HTTPS stub server
+speaking HTTP/1.1 and HTTP/2 (ALPN).  Like a remote engine, the stub server
+delays the first response of each connection (``--handshake-delay``) to
+account for the TCP and TLS round trips.  The script reports the p50 / p99
+latency per request, the throughput and the number of connections opened by
+each backend.
+
+Requires the ``openssl`` command to create a self-signed certificate.
+
+.. code:: bash
+
+    $ python -m searx_extra.benchmark.http2_pool --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import ssl
+import subprocess
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import h2.config
+import h2.connection
+import h2.events
+
+import searx.poolrequests as poolrequests
+from searx_extra.benchmark import percentile
+
+
+BACKENDS = ('requests', 'httpx-http1', 'httpx-http2')
+
+BODY = json.dumps({'results': [{'url': 'https://example.com/{}'.format(i)} for i in range(10)]}).encode()
+
+
+async def _handle_http1(reader, writer, delay):
+    while True:
+        request = await reader.readuntil(b'\r\n\r\n')
+        if not request:
+            break
+        await asyncio.sleep(delay)
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: ' + str(len(BODY)).encode() + b'\r\n\r\n' + BODY)
+        await writer.drain()
+
+
+async def _handle_h2(reader, writer, delay):
+    connection = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+    connection.initiate_connection()
+    writer.write(connection.data_to_send())
+
+    async def respond(stream_id):
+        await asyncio.sleep(delay)
+        connection.send_headers(stream_id, [(':status', '200'), ('content-type', 'application/json'),
+                                            ('content-length', str(len(BODY)))])
+        connection.send_data(stream_id, BODY, end_stream=True)
+        writer.write(connection.data_to_send())
+
+    while True:
+        data = await reader.read(65535)
+        if not data:
+            break
+        for event in connection.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                asyncio.ensure_future(respond(event.stream_id))
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                writer.close()
+                return
+        writer.write(connection.data_to_send())
+
+
+def _serve(port, certfile, keyfile, delay, handshake_delay, connection_count, ready):
+    ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ssl_context.load_cert_chain(certfile, keyfile)
+    ssl_context.set_alpn_protocols(['h2', 'http/1.1'])
+
+    async def handle(reader, writer):
+        with connection_count.get_lock():
+            connection_count.value += 1
+        # TCP and TLS round trips of a new connection
+        await asyncio.sleep(handshake_delay)
+        try:
+            if writer.get_extra_info('ssl_object').selected_alpn_protocol() == 'h2':
+                await _handle_h2(reader, writer, delay)
+            else:
+                await _handle_http1(reader, writer, delay)
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            pass
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, '127.0.0.1', port, ssl=ssl_context, backlog=1024)
+        ready.set()
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def start_server(port, delay, handshake_delay):
+    """Start the HTTPS stub server, return the shared counter of the opened connections."""
+    directory = tempfile.mkdtemp()
+    certfile, keyfile = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=localhost', '-keyout', keyfile, '-out', certfile],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    connection_count = multiprocessing.Value('i', 0)
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=_serve, args=(port, certfile, keyfile, delay, handshake_delay,
+                                                           connection_count, ready))
+    process.daemon = True
+    process.start()
+    ready.wait()
+    return connection_count
+
+
+def set_backend(backend):
+    poolrequests.http_backend = 'requests' if backend == 'requests' else 'httpx'
+    network = poolrequests.get_network('default')
+    network.http2 = backend == 'httpx-http2'
+    network.clients.clear()
+
+
+def run_requests(url, count, concurrency):
+
+    def send_request(_):
+        poolrequests.set_pool_for_thread('bench')
+        start_time = time.time()
+        poolrequests.get(url, verify=False, timeout=10.0)
+        return time.time() - start_time
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(send_request, range(count)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.02, help='response time of the stub server (seconds)')
+    parser.add_argument('--handshake-delay', type=float, default=0.05,
+                        help='additional delay of the first response of a connection (seconds)')
+    parser.add_argument('--port', type=int, default=18889)
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    args = parser.parse_args(argv)
+
+    # self-signed certificate
+    warnings.filterwarnings('ignore', message='Unverified HTTPS request')
+
+    connection_count = start_server(args.port, args.delay, args.handshake_delay)
+    url = 'https://127.0.0.1:{}/search?q=test'.format(args.port)
+
+    print('{:<12} {:>10} {:>10} {:>12} {:>12}'.format('backend', 'p50 (ms)', 'p99 (ms)', 'requests/s', 'connections'))
+    for backend in args.backends:
+        set_backend(backend)
+        connections_before = connection_count.value
+        start_time = time.time()
+        latencies = run_requests(url, args.requests, args.concurrency)
+        duration = time.time() - start_time
+        print('{:<12} {:>10.1f} {:>10.1f} {:>12.0f} {:>12}'.format(
+            backend, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000,
+            args.requests / duration, connection_count.value - connections_before))
+
+
+if __name__ == '__main__':
+    main()
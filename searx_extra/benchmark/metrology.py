@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Measure the cost of recording a value in the metrology of searx.
+
+Compare the histograms and the counters of :py:mod:`searx.metrology` with the
+sums of the ``stats`` dict which the engines used to have.  The script reports
+the time of one record, in nanoseconds, with one thread and with several
+threads recording at the same time.
+
+.. code:: bash
+
+    $ python -m searx_extra.benchmark.metrology --count 1000000 --threads 1 8
+"""
+
+import argparse
+import threading
+import time
+
+from searx.metrology.counter import Counter
+from searx.metrology.histogram import Histogram, SlidingHistogram
+
+
+def get_recorders():
+    stats_lock = threading.Lock()
+    stats = {'engine_time': 0, 'engine_time_count': 0}
+
+    def record_stats(value):
+        with stats_lock:
+            stats['engine_time'] += value
+            stats['engine_time_count'] += 1
+
+    return [
+        ('stats dict', record_stats),
+        ('Counter', Counter().add),
+        ('Histogram', Histogram().observe),
+        ('SlidingHistogram', SlidingHistogram().observe),
+    ]
+
+
+def measure(record, count, thread_count):
+    """Return the duration of one record in nanoseconds."""
+    def run():
+        for i in range(count // thread_count):
+            record(i * 0.0001)
+
+    threads = [threading.Thread(target=run) for _ in range(thread_count)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (time.perf_counter() - start_time) / count * 1e9
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    args = parser.parse_args(argv)
+
+    print('{:>18} {:>8} {:>10}'.format('', 'threads', 'ns/record'))
+    for name, record in get_recorders():
+        for thread_count in args.threads:
+            print('{:>18} {:>8} {:>10.0f}'.format(name, thread_count, measure(record, args.count, thread_count)))
+
+
+if __name__ == '__main__':
+    main()
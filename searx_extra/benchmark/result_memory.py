@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Measure the memory used by the merged results, see :py:class:`searx.results.Result`.
+
+For each size, the script creates the results like
+:py:meth:`searx.results.ResultContainer.extend` does once they are merged (with
+``parsed_url``, ``engines``, ``positions``, ``score`` ...), stored in plain dicts
+and in :py:class:`searx.results.Result` objects.  It reports the memory
+allocated (measured with :py:mod:`tracemalloc`), the number of allocated blocks
+and the time to create them.
+
+.. code:: bash
+
+    $ python -m searx_extra.benchmark.result_memory --sizes 100 1000 10000
+"""
+
+import argparse
+import time
+import tracemalloc
+from urllib.parse import urlparse
+
+from searx.results import Result
+
+
+def get_results(size):
+    """Return ``size`` results as returned by an engine."""
+    return [{'url': 'https://example{}.com/page/{}'.format(i % 50, i),
+             'title': 'title {}'.format(i),
+             'content': 'content of the result {}'.format(i),
+             'engine': 'engine{}'.format(i % 20)}
+            for i in range(size)]
+
+
+def merge(results, result_class):
+    merged_results = []
+    for position, result in enumerate(results):
+        result = result_class(result)
+        result['parsed_url'] = urlparse(result['url'])
+        result['engines'] = set([result['engine']])
+        result['positions'] = [position]
+        result['score'] = 1.0
+        result['category'] = 'general'
+        merged_results.append(result)
+    return merged_results
+
+
+def measure(results, result_class):
+    """Return the allocated memory, the number of allocated blocks and the time."""
+    tracemalloc.start()
+    start_time = time.time()
+    merged_results = merge(results, result_class)
+    duration = time.time() - start_time
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    statistics = snapshot.statistics('filename')
+    del merged_results
+    return sum(stat.size for stat in statistics), sum(stat.count for stat in statistics), duration
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    args = parser.parse_args(argv)
+
+    print('{:>8} {:>8} {:>12} {:>10} {:>10}'.format('results', 'class', 'memory (kB)', 'blocks', 'time (ms)'))
+    for size in args.sizes:
+        results = get_results(size)
+        for result_class in (dict, Result):
+            memory, blocks, duration = measure(results, result_class)
+            print('{:>8} {:>8} {:>12.1f} {:>10} {:>10.1f}'.format(size, result_class.__name__, memory / 1024,
+                                                                  blocks, duration * 1000))
+
+
+if __name__ == '__main__':
+    main()
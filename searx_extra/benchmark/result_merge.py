@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Measure the merge of the results in :py:class:`searx.results.ResultContainer`.
+
+For each size, 20 engines return the results of one query; about one result
+out of three is a duplicate of a result of another engine (same URL, with or
+without ``www.``, trailing slash or ``https``).  The script reports the time
+to merge all the results with the URL index, and with a linear scan of the
+merged results like before the index.
+
+.. code:: bash
+
+    $ python -m searx_extra.benchmark.result_merge --sizes 100 1000 10000
+"""
+
+import argparse
+import random
+import time
+
+from searx.results import ResultContainer
+
+
+ENGINE_COUNT = 20
+
+
+class LinearScanIndex:
+    """Replace the URL index of a container: look for the duplicates result by result."""
+
+    def __init__(self, result_container):
+        self.result_container = result_container
+
+    def get(self, duplicate_key):
+        for merged_result in self.result_container._merged_results:  # pylint: disable=protected-access
+            if 'parsed_url' in merged_result\
+               and ResultContainer.get_duplicate_key(merged_result) == duplicate_key:
+                return merged_result
+        return None
+
+    def __setitem__(self, duplicate_key, result):
+        pass
+
+
+def get_engine_results(size, seed=0):
+    """Return the results of each engine, ``size`` results in total."""
+    rand = random.Random(seed)
+    urls = ['https://example{}.com/page/{}'.format(i % 50, i) for i in range(size * 2 // 3 + 1)]
+    engine_results = [[] for _ in range(ENGINE_COUNT)]
+    for i in range(size):
+        url = urls[i] if i < len(urls) else rand.choice(urls)
+        # the same URL written differently
+        variant = rand.randrange(4)
+        if variant == 1:
+            url = url.replace('https://', 'https://www.')
+        elif variant == 2:
+            url = url + '/'
+        elif variant == 3:
+            url = url.replace('https://', 'http://')
+        engine_results[i % ENGINE_COUNT].append({'url': url, 'title': 'title {}'.format(i),
+                                                 'content': 'content of the result {}'.format(i)})
+    return engine_results
+
+
+def merge(engine_results, linear_scan):
+    result_container = ResultContainer('en-US')
+    if linear_scan:
+        result_container._url_index = LinearScanIndex(result_container)  # pylint: disable=protected-access
+    start_time = time.time()
+    for i, results in enumerate(engine_results):
+        result_container.extend('engine{}'.format(i), [dict(result) for result in results])
+    result_container.close()
+    return time.time() - start_time, result_container.results_length()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    args = parser.parse_args(argv)
+
+    print('{:>8} {:>8} {:>12} {:>14}'.format('results', 'merged', 'index (ms)', 'linear (ms)'))
+    for size in args.sizes:
+        engine_results = get_engine_results(size)
+        index_time, merged_count = merge(engine_results, False)
+        linear_time, linear_merged_count = merge(engine_results, True)
+        assert merged_count == linear_merged_count
+        print('{:>8} {:>8} {:>12.1f} {:>14.1f}'.format(size, merged_count, index_time * 1000, linear_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
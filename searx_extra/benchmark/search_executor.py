@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# SPDX-License-Identifier: AGPL-3.0-or-later
+"""Compare the executors sending the engine requests (``outgoing.executor``).
+
+For each executor, the script sends the same number of queries to many
+``json_engine`` engines answering from a local stub server, and reports the
+p50 / p99 latency per query and the CPU time of the searx process per query.
+
+.. code:: bash
+
+    $ python -m searx_extra.benchmark.search_executor --engines 70 --queries 200 --concurrency 8
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import searx.search
+from searx.search.models import SearchQuery, EngineRef
+from searx_extra.benchmark import start_stub_server, get_engine_settings, percentile
+
+
+EXECUTORS = ('threads', 'pool', 'asyncio')
+
+
+def run_queries(engine_refs, queries, concurrency, prefix):
+
+    def run_query(i):
+        search_query = SearchQuery('{}{}'.format(prefix, i), engine_refs, 'en-US', 0, 1, None, None)
+        start_time = time.time()
+        searx.search.Search(search_query).search()
+        return time.time() - start_time
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(run_query, range(queries)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--engines', type=int, default=70)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=0.05, help='median latency of the stub server (seconds)')
+    parser.add_argument('--port', type=int, default=18888)
+    parser.add_argument('--executors', nargs='+', default=EXECUTORS, choices=EXECUTORS)
+    args = parser.parse_args(argv)
+
+    start_stub_server(args.port, args.delay)
+    engine_settings = get_engine_settings(args.engines, args.port)
+    searx.search.initialize(engine_settings)
+    searx.search.max_request_timeout = None
+    engine_refs = [EngineRef(engine['name'], 'general') for engine in engine_settings]
+
+    print('{:<10} {:>10} {:>10} {:>14}'.format('executor', 'p50 (ms)', 'p99 (ms)', 'CPU/query (ms)'))
+    for executor in args.executors:
+        searx.search.executor = executor
+        # warm up: connection pools, event loop, worker threads
+        run_queries(engine_refs, args.concurrency, args.concurrency, 'warmup-' + executor)
+
+        cpu_start = time.process_time()
+        latencies = run_queries(engine_refs, args.queries, args.concurrency, executor)
+        cpu_per_query = (time.process_time() - cpu_start) / args.queries
+
+        print('{:<10} {:>10.1f} {:>10.1f} {:>14.2f}'.format(executor,
+                                                            percentile(latencies, 50) * 1000,
+                                                            percentile(latencies, 99) * 1000,
+                                                            cpu_per_query * 1000))
+
+
+if __name__ == '__main__':
+    main()
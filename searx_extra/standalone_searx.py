@@ -84,6 +84,7 @@ from typing import Any, Dict, List, Optional
 import searx
 import searx.preferences
 import searx.query
+import searx.results
 import searx.search
 import searx.webadapter
 
@@ -135,6 +136,8 @@ def json_serial(obj: Any) -> Any:
         return obj.decode('utf8')
     if isinstance(obj, set):
         return list(obj)
+    if isinstance(obj, searx.results.Result):
+        return dict(obj)
     raise TypeError("Type ({}) not serializable".format(type(obj)))
 
 
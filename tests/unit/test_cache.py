@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+
+from mock import patch
+
+from searx.testing import SearxTestCase
+from searx.shared.shared_simple import SimpleSharedDict
+import searx.cache
+from searx.cache import MemoryCache, SharedCache
+
+
+class MemoryCacheTestCase(SearxTestCase):
+
+    def test_get_set(self):
+        cache = MemoryCache('test', 10)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', b'value', 60)
+        self.assertEqual(cache.get('a'), b'value')
+        self.assertEqual(cache.get_stats()['hits'], 1)
+        self.assertEqual(cache.get_stats()['misses'], 1)
+        self.assertEqual(cache.get_stats()['hit_rate'], 0.5)
+
+    def test_ttl(self):
+        cache = MemoryCache('test', 10)
+        with patch('searx.cache.time', return_value=1000):
+            cache.set('a', b'value', 60)
+        with patch('searx.cache.time', return_value=1059):
+            self.assertEqual(cache.get('a'), b'value')
+        with patch('searx.cache.time', return_value=1061):
+            self.assertIsNone(cache.get('a'))
+
+    def test_lru(self):
+        cache = MemoryCache('test', 2)
+        cache.set('a', b'a', 60)
+        cache.set('b', b'b', 60)
+        # "a" is now the most recently used item
+        cache.get('a')
+        cache.set('c', b'c', 60)
+        self.assertEqual(cache.get('a'), b'a')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), b'c')
+
+
+class SharedCacheTestCase(SearxTestCase):
+
+    def test_get_set(self):
+        storage = SimpleSharedDict()
+        cache = SharedCache('test', storage)
+        cache.set('a', b'value', 60)
+        self.assertIn('test:a', storage.d)
+        self.assertEqual(cache.get('a'), b'value')
+
+    def test_ttl(self):
+        cache = SharedCache('test', SimpleSharedDict())
+        with patch('searx.cache.time', return_value=1000):
+            cache.set('a', b'value', 60)
+        with patch('searx.cache.time', return_value=1061):
+            self.assertIsNone(cache.get('a'))
+
+
+class GetCacheTestCase(SearxTestCase):
+
+    def test_disabled(self):
+        self.setattr4test(searx.cache, 'caches', {})
+        self.setattr4test(searx.cache, 'settings', {'cache': {'backend': ''}})
+        self.assertIsNone(searx.cache.get_cache('results'))
+
+    def test_memory(self):
+        self.setattr4test(searx.cache, 'caches', {})
+        self.setattr4test(searx.cache, 'settings', {'cache': {'backend': 'memory', 'max_items': 5}})
+        cache = searx.cache.get_cache('results')
+        self.assertIsInstance(cache, MemoryCache)
+        self.assertEqual(cache.max_items, 5)
+        self.assertIs(searx.cache.get_cache('results'), cache)
+        self.assertEqual(searx.cache.get_stats()[0]['name'], 'results')
+
+
+class SerializationTestCase(SearxTestCase):
+
+    def test_dumps_loads(self):
+        self.assertEqual(searx.cache.loads(searx.cache.dumps({'a': [1, 2]})), {'a': [1, 2]})
+
+    def test_invalid_signature(self):
+        data = searx.cache.dumps({'a': [1, 2]})
+        self.setattr4test(searx.cache, 'settings', {'server': {'secret_key': 'another key'}})
+        with self.assertRaises(ValueError):
+            searx.cache.loads(data)
+        with self.assertRaises(ValueError):
+            searx.cache.loads(pickle.dumps({'a': [1, 2]}))
@@ -18,6 +18,20 @@ class TestEnginesInit(SearxTestCase):
         self.assertIn('engine1', engines.engines)
         self.assertIn('engine2', engines.engines)
 
+    def test_initialize_engines_network(self):
+        engine_list = [{'engine': 'dummy', 'name': 'engine1', 'shortcut': 'e1'},
+                       {'engine': 'dummy', 'name': 'engine2', 'shortcut': 'e2', 'network': 'engine1'}]
+
+        engines.load_engines(engine_list)
+        self.assertEqual(engines.engines['engine1'].network, 'default')
+        self.assertEqual(engines.engines['engine1'].pool_name, 'engine1')
+        # engine2 shares the connections of engine1
+        self.assertEqual(engines.engines['engine2'].network, 'default')
+        self.assertEqual(engines.engines['engine2'].pool_name, 'engine1')
+
+        with self.assertRaises(SystemExit):
+            engines.load_engines([{'engine': 'dummy', 'name': 'engine1', 'shortcut': 'e1', 'network': 'unknown'}])
+
     def test_initialize_engines_exclude_onions(self):
         settings['outgoing']['using_tor_proxy'] = False
         engine_list = [{'engine': 'dummy', 'name': 'engine1', 'shortcut': 'e1', 'categories': 'general'},
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+import zlib
+
+import searx.metrology.aggregation
+import searx.metrology.histogram
+from searx.metrology.aggregation import get_metrics, publish
+from searx.metrology.counter import Counter, get_counter
+from searx.metrology.error_recorder import (ErrorContext, add_error_context, errors_per_engines, record_error,
+                                            record_exception)
+from searx.metrology.histogram import Histogram, SlidingHistogram, get_histogram, get_sliding_histogram
+from searx.shared.shared_simple import SimpleSharedDict
+from searx.testing import SearxTestCase
+
+
+class HistogramTestCase(SearxTestCase):
+
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertEqual(histogram.count, 0)
+        self.assertEqual(histogram.average, 0.0)
+        self.assertIsNone(histogram.percentile(50))
+
+    def test_percentile(self):
+        histogram = Histogram(width=0.1, size=10)
+        for value in (0.05, 0.15, 0.15, 0.25, 5.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.average, 1.12)
+        self.assertAlmostEqual(histogram.percentile(20), 0.1)
+        self.assertAlmostEqual(histogram.percentile(50), 0.2)
+        self.assertAlmostEqual(histogram.percentile(80), 0.3)
+        # the values above width * size are counted in the last bucket
+        self.assertAlmostEqual(histogram.percentile(100), 1.0)
+
+    def test_get_histogram(self):
+        histogram = get_histogram('test', 'get_histogram')
+        self.assertIs(get_histogram('test', 'get_histogram'), histogram)
+        self.assertIsNot(get_histogram('test', 'other'), histogram)
+        self.assertEqual(histogram.width, 0.05)
+        self.assertEqual(get_histogram('test', 'get_histogram_width', width=0.001).width, 0.001)
+
+    def test_add_reset(self):
+        histogram1 = Histogram(width=0.1, size=10)
+        histogram2 = Histogram(width=0.1, size=10)
+        histogram1.observe(0.05)
+        histogram2.observe(0.25)
+        histogram1.add(histogram2)
+        self.assertEqual(histogram1.count, 2)
+        self.assertAlmostEqual(histogram1.percentile(100), 0.3)
+        histogram1.reset()
+        self.assertEqual(histogram1.count, 0)
+        self.assertEqual(histogram2.count, 1)
+
+
+class SlidingHistogramTestCase(SearxTestCase):
+
+    def set_time(self, now):
+        self.setattr4test(searx.metrology.histogram, 'time', lambda: now)
+
+    def test_window(self):
+        histogram = SlidingHistogram(width=0.1, size=10, window=60, slot_count=6)
+        self.set_time(1000.0)
+        histogram.observe(0.05)
+        self.set_time(1035.0)
+        histogram.observe(0.55)
+        self.assertEqual(histogram.count, 2)
+        self.assertAlmostEqual(histogram.average, 0.3)
+        self.assertAlmostEqual(histogram.percentile(50), 0.1)
+
+        # the first value is out of the window
+        self.set_time(1065.0)
+        self.assertEqual(histogram.count, 1)
+        self.assertAlmostEqual(histogram.percentile(50), 0.6)
+
+        # the slot of the first value is reused
+        histogram.observe(0.15)
+        self.assertEqual(histogram.count, 2)
+        self.set_time(1200.0)
+        self.assertEqual(histogram.count, 0)
+        self.assertIsNone(histogram.percentile(50))
+
+    def test_add_dump(self):
+        histogram1 = SlidingHistogram(width=0.1, size=10, window=60, slot_count=6)
+        histogram2 = SlidingHistogram(width=0.1, size=10, window=60, slot_count=6)
+        self.set_time(1000.0)
+        histogram1.observe(0.05)
+        histogram2.observe(0.15)
+        self.set_time(1065.0)
+        # same slot as the values above, but a more recent time slice
+        histogram2.observe(0.25)
+
+        histogram1.add(histogram2)
+        self.assertEqual(histogram1.count, 1)
+        self.assertAlmostEqual(histogram1.percentile(50), 0.3)
+        self.assertEqual(SlidingHistogram.load(histogram2.dump()).dump(), histogram2.dump())
+        self.assertEqual(SlidingHistogram.load(histogram2.dump()).count, 1)
+
+    def test_get_sliding_histogram(self):
+        histogram = get_sliding_histogram('test', 'get_sliding_histogram', width=0.01)
+        self.assertIs(get_sliding_histogram('test', 'get_sliding_histogram'), histogram)
+        self.assertEqual(histogram.width, 0.01)
+
+
+class CounterTestCase(SearxTestCase):
+
+    def test_counter(self):
+        counter = Counter()
+        counter.add()
+        counter.add(2.5)
+        self.assertEqual(counter.value, 3.5)
+        self.assertIs(get_counter('test', 'counter'), get_counter('test', 'counter'))
+        self.assertIsNot(get_counter('test', 'counter'), get_counter('test', 'other'))
+
+
+def raise_value_error():
+    raise ValueError('invalid value')
+
+
+class ErrorRecorderTestCase(SearxTestCase):
+
+    def test_record_error(self):
+        for _ in range(2):
+            record_error('test_record_error', 'Timeout', ('parameter', ))
+        error_contexts = errors_per_engines['test_record_error']
+        self.assertEqual(list(error_contexts.values()), [2])
+        error_context = list(error_contexts)[0]
+        self.assertTrue(error_context.filename.endswith('test_metrology.py'))
+        self.assertEqual(error_context.function, 'test_record_error')
+        self.assertEqual(error_context.code, "record_error('test_record_error', 'Timeout', ('parameter', ))")
+        self.assertEqual(error_context.log_parameters, ('parameter', ))
+        self.assertIsNone(error_context.exception_classname)
+
+    def test_record_exception(self):
+        try:
+            raise_value_error()
+        except ValueError as e:
+            record_exception('test_record_exception', e)
+        error_context = list(errors_per_engines['test_record_exception'])[0]
+        self.assertEqual(error_context.function, 'raise_value_error')
+        self.assertEqual(error_context.code, "raise ValueError('invalid value')")
+        self.assertEqual(error_context.exception_classname, 'ValueError')
+
+
+class AggregationTestCase(SearxTestCase):
+
+    def test_get_metrics(self):
+        self.setattr4test(searx.metrology.aggregation, 'storage', SimpleSharedDict())
+        self.setattr4test(searx.metrology.aggregation, 'get_worker_ids', lambda: [1, 2])
+        self.setattr4test(searx.metrology.aggregation, '_published_version', None)
+        get_counter('test', 'aggregation').add(3)
+        get_histogram('test', 'aggregation').observe(0.1)
+        get_sliding_histogram('test', 'aggregation', 'sliding').observe(0.1)
+        error_context = ErrorContext('file.py', 'function', 1, 'code', 'Exception', None, ('parameter', ))
+        add_error_context('test_aggregation', error_context)
+
+        # the worker 1 publishes its metrics, which the worker 2 adds to its own metrics
+        self.setattr4test(searx.metrology.aggregation, 'get_worker_id', lambda: 1)
+        publish()
+        self.setattr4test(searx.metrology.aggregation, 'get_worker_id', lambda: 2)
+        metrics = get_metrics()
+        self.assertEqual(metrics.get_counter('test', 'aggregation'), 6)
+        self.assertEqual(metrics.get_counter('test', 'unknown'), 0)
+        self.assertEqual(metrics.get_histogram('test', 'aggregation').count, 2)
+        self.assertEqual(metrics.get_histogram('test', 'aggregation', 'sliding').count, 2)
+        self.assertEqual(metrics.get_histogram('test', 'unknown').count, 0)
+        self.assertEqual(metrics.errors['test_aggregation'], {error_context: 2})
+        # the states of the workers are kept by worker
+        self.assertEqual(sorted(metrics.worker_states), [1, 2])
+        self.assertEqual(metrics.worker_states[1]['worker'], 1)
+
+        # the metrics of the worker are not modified
+        self.assertEqual(get_counter('test', 'aggregation').value, 3)
+        self.assertEqual(get_histogram('test', 'aggregation').count, 1)
+
+    def test_unsigned_metrics(self):
+        storage = SimpleSharedDict()
+        self.setattr4test(searx.metrology.aggregation, 'storage', storage)
+        self.setattr4test(searx.metrology.aggregation, 'get_worker_ids', lambda: [1, 2])
+        self.setattr4test(searx.metrology.aggregation, 'get_worker_id', lambda: 2)
+        get_counter('test', 'unsigned').add(1)
+        # the copy of the worker 1 is not signed with the secret key: it is not unpickled
+        storage.set_bytes('metrology_1', zlib.compress(pickle.dumps(({('test', 'unsigned'): 5}, [], {}, {}))))
+        metrics = get_metrics()
+        self.assertEqual(metrics.get_counter('test', 'unsigned'), 1)
+        self.assertEqual(sorted(metrics.worker_states), [2])
+
+    def test_publish_not_stored(self):
+        storage = SimpleSharedDict()
+        self.setattr4test(storage, 'set_bytes', lambda key, value, expires=0: False)
+        self.setattr4test(searx.metrology.aggregation, 'storage', storage)
+        self.setattr4test(searx.metrology.aggregation, '_published_version', None)
+        get_counter('test', 'not_stored').add(1)
+        with self.assertLogs('searx.metrology', 'WARNING'):
+            publish()
+        # the next call publishes the metrics again
+        self.assertIsNone(searx.metrology.aggregation._published_version)
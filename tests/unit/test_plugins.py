@@ -3,6 +3,7 @@
 from searx.testing import SearxTestCase
 from searx import plugins
 from mock import Mock
+from urllib.parse import urlparse
 
 
 def get_search_mock(query, **kwargs):
@@ -36,6 +37,51 @@ class PluginStoreTest(SearxTestCase):
         store.call([testplugin], 'asdf', request, Mock())
         self.assertTrue(testplugin.asdf.called)  # pylint: disable=E1101
 
+    def test_PluginStore_call_on_results(self):
+        store = plugins.PluginStore()
+        result_plugin = plugins.Plugin()
+        result_plugin.name = 'result plugin'
+        result_plugin.on_result = Mock(side_effect=lambda request, search, result: result['url'] != 'b')
+        results_plugin = plugins.Plugin()
+        results_plugin.name = 'results plugin'
+        results_plugin.prepare = Mock(return_value='state')
+        results_plugin.on_results = Mock(side_effect=lambda request, search, results, state: results)
+        store.register(result_plugin, results_plugin)
+
+        request, search, states = Mock(), Mock(), {}
+        results = [{'url': 'a'}, {'url': 'b'}]
+        store.call_on_results(store.plugins, request, search, results, states)
+        store.call_on_results(store.plugins, request, search, results, states)
+
+        self.assertEqual(result_plugin.on_result.call_count, 4)
+        results_plugin.prepare.assert_called_once_with(request, search)
+        results_plugin.on_results.assert_called_with(request, search, [{'url': 'a'}], 'state')
+        self.assertEqual(results_plugin.on_results.call_count, 2)
+
+    def test_PluginStore_get_chain(self):
+        store = plugins.PluginStore()
+        plugin1, plugin2 = plugins.Plugin(), plugins.Plugin()
+        plugin1.name, plugin1.default_on = 'plugin1', True
+        plugin2.name = 'plugin2'
+        plugin2.post_search = Mock(return_value=True)
+        store.register(plugin1, plugin2)
+
+        chain = store.get_user_chain(set(), set())
+        self.assertEqual(list(chain), [plugin1])
+        self.assertIs(store.get_chain(frozenset(['plugin1'])), chain)
+
+        chain = store.get_user_chain({'plugin2'}, set())
+        self.assertEqual(list(chain), [plugin1, plugin2])
+        self.assertIs(store.get_user_chain({'plugin1', 'plugin2'}, set()), chain)
+        self.assertEqual(list(store.get_user_chain({'plugin2'}, {'plugin1'})), [plugin2])
+
+        request, search = Mock(), Mock()
+        self.assertTrue(store.call(chain, 'post_search', request, search))
+        plugin2.post_search.assert_called_once_with(request, search)
+        self.assertIn({'name': 'plugin2', 'hook': 'post_search', 'count': 1,
+                       'average': plugins.get_histogram('plugin', 'plugin2', 'post_search').average},
+                      store.get_stats())
+
 
 class SelfIPTest(SearxTestCase):
 
@@ -137,3 +183,57 @@ class HashPluginTest(SearxTestCase):
         self.assertTrue('sha512 hash digest: ee26b0dd4af7e749aa1a8ee3c10ae9923f6'
                         '18980772e473f8819a5d4940e0db27ac185f8a0e1d5f84f88bc887fd67b143732c304cc5'
                         'fa9ad8e6f57f50028a8ff' in search.result_container.answers['hash']['answer'])
+
+
+class HttpsRewriteTest(SearxTestCase):
+
+    def rewrite(self, url):
+        return plugins.https_rewrite.https_url_rewrite({'url': url, 'parsed_url': urlparse(url)})['url']
+
+    def test_get_https_ruleset(self):
+        https_rewrite = plugins.https_rewrite
+        ruleset = https_rewrite.get_https_ruleset('github.com')
+        self.assertIn('*.github.com', ruleset.hosts)
+        self.assertIs(https_rewrite.get_https_ruleset('gist.github.com'), ruleset)
+        self.assertIs(https_rewrite.get_https_ruleset('a.b.GitHub.com'), ruleset)
+        self.assertIsNone(https_rewrite.get_https_ruleset('github.com.example.org'))
+        self.assertIsNone(https_rewrite.get_https_ruleset('example.org'))
+        # right wildcard
+        self.assertIn('google.*', https_rewrite.get_https_ruleset('google.fr').hosts)
+
+    def test_https_url_rewrite(self):
+        self.assertEqual(self.rewrite('http://github.com/searx/searx'), 'https://github.com/searx/searx')
+        self.assertEqual(self.rewrite('http://gist.github.com/'), 'https://gist.github.com/')
+        self.assertEqual(self.rewrite('http://example.org/'), 'http://example.org/')
+
+    def test_partial_wildcard(self):
+        https_rewrite = plugins.https_rewrite
+        self.setattr4test(https_rewrite, 'https_hosts', {})
+        self.setattr4test(https_rewrite, 'https_rules', [])
+        ruleset = https_rewrite.Ruleset(['www*.example.com'], [], [])
+        https_rewrite.add_https_host('www*.example.com', 0)
+        https_rewrite.https_rules.append(ruleset)
+        self.assertIs(https_rewrite.get_https_ruleset('www.example.com'), ruleset)
+        self.assertIs(https_rewrite.get_https_ruleset('www2.example.com'), ruleset)
+        self.assertIsNone(https_rewrite.get_https_ruleset('mail.example.com'))
+        self.assertIsNone(https_rewrite.get_https_ruleset('a.www.example.com'))
+
+    def test_invalid_exclusion(self):
+        ruleset = plugins.https_rewrite.Ruleset(['example.com'], [('^http:', 'https:')], ['(invalid'])
+        exclusions = ruleset.exclusions
+        # the failure is cached, and the ruleset is never applied
+        self.assertIs(ruleset.exclusions, exclusions)
+        self.assertTrue(exclusions[0].match('http://example.com/'))
+
+
+class SearchOperatorsTest(SearxTestCase):
+
+    def test_on_results(self):
+        results = [{'url': 'https://example.com/', 'title': 'searx', 'content': 'metasearch engine'},
+                   {'url': 'https://example.org/', 'title': 'searx', 'content': 'other engine'}]
+        for query in ('searx', 'searx -metasearch', 'site:example.com', '-site:example.com', '"searx engine"'):
+            search = get_search_mock(query=query)
+            state = plugins.search_operators.prepare(Mock(), search)
+            self.assertEqual(plugins.search_operators.on_results(Mock(), search, results, state),
+                             [result for result in results
+                              if plugins.search_operators.on_result(Mock(), search, result)])
@@ -1,10 +1,12 @@
 from unittest.mock import patch
+import httpx
+import requests
 from requests.models import Response
 
 from searx.testing import SearxTestCase
 
 import searx.poolrequests
-from searx.poolrequests import get_proxy_cycles, get_proxies
+from searx.poolrequests import get_proxy_cycles, get_proxies, Network
 
 
 CONFIG = {'http': ['http://localhost:9090', 'http://localhost:9092'],
@@ -65,6 +67,7 @@ class TestProxy(SearxTestCase):
             'https': 'http://localhost:9093'
         })
 
+    @patch('searx.poolrequests.http_backend', 'requests')
     @patch('searx.poolrequests.get_global_proxies')
     def test_request(self, mock_get_global_proxies):
         method = 'GET'
@@ -87,3 +90,159 @@ class TestProxy(SearxTestCase):
         with patch.object(searx.poolrequests.SessionSinglePool, 'request', return_value=Response()) as mock_method:
             searx.poolrequests.request(method, url, proxies=custom_proxies)
         mock_method.assert_called_once_with(method=method, url=url, proxies=custom_proxies)
+
+
+class TestHTTPXBackend(SearxTestCase):
+
+    def setUp(self):
+        self.requests = []
+        self.setattr4test(searx.poolrequests, 'http_backend', 'httpx')
+        self.networks = {'default': Network('default'), 'other': Network('other')}
+        for network in self.networks.values():
+            self.setattr4test(network, 'new_transport', self.new_transport)
+        self.setattr4test(searx.poolrequests, 'networks', self.networks)
+        searx.poolrequests.set_timeout_for_thread(None)
+        searx.poolrequests.set_enable_http_protocol(False)
+        searx.poolrequests.set_pool_for_thread('engine')
+
+    def tearDown(self):
+        searx.poolrequests.threadLocal.network = None
+
+    def new_transport(self, verify, proxy_url=None):
+        return httpx.MockTransport(self.handler)
+
+    def handler(self, request):
+        self.requests.append(request)
+        if request.url.path == '/redirect':
+            return httpx.Response(302, headers={'Location': 'https://example.com/'})
+        if request.url.path == '/redirect_with_cookie':
+            return httpx.Response(302, headers={'Location': 'https://example.com/', 'Set-Cookie': 'c=3; Path=/'})
+        if request.url.path == '/loop':
+            return httpx.Response(302, headers={'Location': 'https://example.com/loop'})
+        if request.url.path == '/timeout':
+            raise httpx.ReadTimeout('timeout', request=request)
+        if request.url.path == '/error':
+            return httpx.Response(503)
+        return httpx.Response(200, headers={'Content-Type': 'text/html; charset=utf-8', 'Set-Cookie': 'a=1'},
+                              content='résultat'.encode())
+
+    def test_response(self):
+        response = searx.poolrequests.get('https://example.com/', headers={'User-Agent': 'searx'},
+                                          cookies={'b': '2'})
+        self.assertIsInstance(response, Response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'résultat')
+        self.assertEqual(response.headers['content-type'], 'text/html; charset=utf-8')
+        self.assertEqual(response.url, 'https://example.com/')
+        self.assertEqual(response.cookies['a'], '1')
+        self.assertEqual(response.request.headers['User-Agent'], 'searx')
+        self.assertEqual(response.request.headers['Cookie'], 'b=2')
+
+        # the cookies are not kept from one request to another
+        searx.poolrequests.get('https://example.com/')
+        self.assertNotIn('cookie', self.requests[1].headers)
+
+    def test_post(self):
+        searx.poolrequests.post('https://example.com/', data={'q': 'test'})
+        self.assertEqual(self.requests[0].method, 'POST')
+        self.assertEqual(self.requests[0].content, b'q=test')
+
+    def test_redirect(self):
+        response = searx.poolrequests.get('https://example.com/redirect')
+        self.assertEqual(response.url, 'https://example.com/')
+        self.assertEqual([r.status_code for r in response.history], [302])
+
+        response = searx.poolrequests.get('https://example.com/redirect', allow_redirects=False)
+        self.assertEqual(response.status_code, 302)
+
+    def test_redirect_cookies(self):
+        # like requests: the cookies of the request and of the redirect response are sent to the next URL
+        searx.poolrequests.get('https://example.com/redirect_with_cookie', cookies={'b': '2'})
+        self.assertEqual(self.requests[0].headers['Cookie'], 'b=2')
+        self.assertEqual(sorted(self.requests[1].headers['Cookie'].split('; ')), ['b=2', 'c=3'])
+
+        # the cookies are not kept from one request to another
+        searx.poolrequests.get('https://example.com/')
+        self.assertNotIn('cookie', self.requests[2].headers)
+
+    def test_too_many_redirects(self):
+        with self.assertRaises(requests.exceptions.TooManyRedirects):
+            searx.poolrequests.get('https://example.com/loop', max_redirects=3)
+        self.assertEqual(len(self.requests), 4)
+
+    def test_requests_only_arguments(self):
+        sent_requests = []
+
+        def session_request(session, method, url, **kwargs):
+            sent_requests.append((method, url, kwargs.get('stream'), kwargs.get('cert')))
+            response = Response()
+            response.status_code = 200
+            return response
+
+        self.setattr4test(searx.poolrequests.SessionSinglePool, 'request', session_request)
+        # these requests are sent with requests
+        searx.poolrequests.get('https://example.com/', stream=True)
+        searx.poolrequests.get('https://example.com/', cert='/etc/searx/client.pem')
+        self.assertEqual(sent_requests, [('get', 'https://example.com/', True, None),
+                                         ('get', 'https://example.com/', None, '/etc/searx/client.pem')])
+        self.assertEqual(self.requests, [])
+
+    def test_exceptions(self):
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            searx.poolrequests.get('https://example.com/timeout')
+        with self.assertRaises(requests.exceptions.InvalidSchema):
+            searx.poolrequests.get('http://example.com/')
+        with self.assertRaises(requests.exceptions.HTTPError):
+            searx.poolrequests.get('https://example.com/error')
+
+    def test_pools(self):
+        searx.poolrequests.get('https://example.com/')
+        searx.poolrequests.get('https://example.com/')
+        self.assertEqual(len(self.networks['default'].clients), 1)
+        searx.poolrequests.set_pool_for_thread('other engine')
+        searx.poolrequests.get('https://example.com/')
+        self.assertEqual(len(self.networks['default'].clients), 2)
+
+    def test_networks(self):
+        searx.poolrequests.set_pool_for_thread('engine', 'other')
+        searx.poolrequests.get('https://example.com/')
+        self.assertEqual(len(self.networks['default'].clients), 0)
+        self.assertEqual(len(self.networks['other'].clients), 1)
+        self.assertEqual(searx.poolrequests.get_stats(), [{
+            'name': 'other',
+            'pool_maxsize': 10,
+            'request_count': 1,
+            'active_count': 0,
+            'max_active_count': 1,
+        }])
+
+
+class TestNetwork(SearxTestCase):
+
+    def test_httpx_limits(self):
+        network = Network('test', pool_connections=50, pool_maxsize=5)
+        transport = network.new_transport(True)
+        self.assertEqual(transport._pool._max_connections, 5)
+        self.assertEqual(transport._pool._max_keepalive_connections, 5)
+
+    def test_settings(self):
+        networks = searx.poolrequests._new_networks({
+            'pool_connections': 50,
+            'retries': 1,
+            'networks': {
+                'slow': {'pool_connections': 10, 'request_timeout': 6.0},
+                'proxied': {'proxies': {'https': 'socks5h://localhost:9050'}},
+            }
+        })
+        self.assertEqual(sorted(networks), ['default', 'proxied', 'slow'])
+        self.assertEqual(networks['default'].pool_connections, 50)
+        self.assertEqual(networks['slow'].pool_connections, 10)
+        self.assertEqual(networks['slow'].retries, 1)
+        self.assertEqual(networks['slow'].request_timeout, 6.0)
+        self.assertIsNone(networks['default'].request_timeout)
+        self.assertEqual(networks['proxied'].get_proxies(), {'https': 'socks5h://localhost:9050'})
+
+    @patch('searx.poolrequests.get_global_proxies')
+    def test_global_proxies(self, mock_get_global_proxies):
+        mock_get_global_proxies.return_value = {'https': 'http://localhost:9091'}
+        self.assertEqual(Network('test').get_proxies(), {'https': 'http://localhost:9091'})
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import searx.ranking
+from searx.ranking import RankingPipeline, get_histogram, get_pipeline, get_stage
+from searx.testing import SearxTestCase
+
+
+def fake_result(url, engines, positions):
+    return {'url': url, 'parsed_url': urlparse(url), 'engines': set(engines), 'positions': positions}
+
+
+def double_weight(results, weights, language):
+    for i in range(len(weights)):
+        weights[i] *= 2
+
+
+class RankingTestCase(SearxTestCase):
+
+    def setUp(self):
+        self.setattr4test(searx.ranking, 'engines', {
+            'engine1': SimpleNamespace(weight=2),
+            'engine2': SimpleNamespace(weight='1.5'),
+            'engine3': SimpleNamespace(),
+        })
+
+    def test_score(self):
+        results = [fake_result('https://example.com/', ['engine1', 'engine2'], [1, 3]),
+                   fake_result('https://fr.example.com/', ['engine3'], [2])]
+        get_pipeline(['engine_weight', 'configured_language']).score(results, 'fr')
+        self.assertAlmostEqual(results[0]['score'], 2 * 3.0 / 1 + 2 * 3.0 / 3)
+        self.assertAlmostEqual(results[1]['score'], 1.1 / 2)
+
+    def test_no_stage(self):
+        results = [fake_result('https://example.com/', ['engine1'], [4])]
+        RankingPipeline([]).score(results, 'en')
+        self.assertEqual(results[0]['score'], 0.25)
+
+    def test_external_stage(self):
+        self.assertIs(get_stage('tests.unit.test_ranking.double_weight'), double_weight)
+        results = [fake_result('https://example.com/', ['engine3'], [1])]
+        pipeline = get_pipeline(['tests.unit.test_ranking.double_weight'])
+        pipeline.score(results, 'en')
+        self.assertEqual(results[0]['score'], 2.0)
+        self.assertGreater(get_histogram('ranking', 'tests.unit.test_ranking.double_weight').count, 0)
+        self.assertEqual([stage['name'] for stage in pipeline.get_stats()],
+                         ['tests.unit.test_ranking.double_weight', 'score'])
+
+    def test_unknown_stage(self):
+        self.assertRaises(ValueError, get_stage, 'unknown')
+        self.assertRaises(ValueError, get_stage, 'tests.unit.test_ranking.unknown')
+        self.assertRaises(ValueError, get_stage, 'unknown_module.unknown')
@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
 
-from searx.results import ResultContainer
+import pickle
+import random
+import threading
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import searx.results
+from searx.results import Result, ResultContainer, compare_urls, get_url_key, group_results
 from searx.testing import SearxTestCase
 
 
@@ -39,3 +46,200 @@ class ResultContainerTestCase(SearxTestCase):
         c.extend('wikipedia', [fake_result()])
         c.extend('wikidata', [fake_result(), fake_result(url='https://example.com/')])
         self.assertEqual(c.results_length(), 2)
+
+    def test_pickle(self):
+        c = ResultContainer("en-US")
+        c.extend('wikipedia', [fake_result()])
+        c = pickle.loads(pickle.dumps(c))
+        c.extend('wikidata', [fake_result(url='https://example.com/')])
+        self.assertEqual(c.results_length(), 2)
+
+    def test_result_merge_images(self):
+        c = ResultContainer("en-US")
+        c.extend('wikipedia', [fake_result(template='images.html', img_src='https://aa.bb/1.png')])
+        c.extend('wikidata', [fake_result(template='images.html', img_src='https://aa.bb/1.png'),
+                              fake_result(template='images.html', img_src='https://aa.bb/2.png'),
+                              fake_result(url='http://www.aa.bb/cc/?dd=ee#ff', template='images.html',
+                                          img_src='https://aa.bb/2.png')])
+        self.assertEqual(c.results_length(), 2)
+
+    def test_deterministic_merge(self):
+        def merge(engine_names):
+            c = ResultContainer("en-US")
+            for engine_name in engine_names:
+                c.extend(engine_name, [fake_result(content=engine_name), fake_result(url='https://example.com/')])
+            c.close()
+            return [(r['url'], r['content'], r['positions']) for r in c._merged_results]
+
+        self.assertEqual(merge(['wikipedia', 'wikidata', 'bing']), merge(['bing', 'wikidata', 'wikipedia']))
+
+    def test_concurrent_extend(self):
+        c = ResultContainer("en-US")
+
+        def extend(engine_name):
+            for i in range(10):
+                c.extend(engine_name, [fake_result(url='https://example.com/{}/{}'.format(i, j)) for j in range(10)])
+
+        threads = [threading.Thread(target=extend, args=('engine{}'.format(i),)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        # merge while the engines add their results
+        while any(thread.is_alive() for thread in threads):
+            c.results_length()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(c.results_length(), 100)
+        self.assertEqual(sum(len(r['positions']) for r in c._merged_results), 2000)
+
+    def test_closed(self):
+        c = ResultContainer("en-US")
+        c.extend('wikipedia', [fake_result()])
+        c.close()
+        c.extend('wikidata', [fake_result(url='https://example.com/')])
+        self.assertEqual(c.results_length(), 1)
+
+
+class InfoboxMergeTestCase(SearxTestCase):
+
+    def setUp(self):
+        self.setattr4test(searx.results, 'engines', {
+            'wikipedia': SimpleNamespace(),
+            'wikidata': SimpleNamespace(weight=2),
+        })
+
+    def test_merge(self):
+        c = ResultContainer("en-US")
+        c.extend('wikidata', [{'infobox': 'Paris', 'id': 'https://en.wikipedia.org/wiki/Paris',
+                               'content': 'short',
+                               'urls': [{'title': 'Wikipedia', 'url': 'https://en.wikipedia.org/wiki/Paris'},
+                                        {'title': 'Website', 'url': 'https://www.paris.fr/', 'entity': 'P856'},
+                                        {'title': 'Wikidata', 'url': 'https://www.wikidata.org/wiki/Q90'}]},
+                              {'infobox': 'France', 'id': 'https://en.wikipedia.org/wiki/France'}])
+        c.extend('wikipedia', [{'infobox': 'Paris', 'id': 'http://www.en.wikipedia.org/wiki/Paris/',
+                                'content': 'a longer content',
+                                'urls': [{'title': 'Wikipedia', 'url': 'https://en.wikipedia.org/wiki/Paris/'},
+                                         {'title': 'Official site', 'url': 'https://paris.fr/en', 'entity': 'P856'},
+                                         {'title': 'Wikidata', 'url': 'https://wikidata.org/wiki/Q90'},
+                                         {'title': 'Commons', 'url': 'https://commons.wikimedia.org/wiki/Paris'}]}])
+        self.assertEqual(len(c.infoboxes), 2)
+        infobox = c.infoboxes[0]
+        self.assertEqual(infobox['engine'], 'wikidata')
+        self.assertEqual(infobox['engines'], {'wikipedia', 'wikidata'})
+        self.assertEqual(infobox['content'], 'a longer content')
+        self.assertEqual([url['title'] for url in infobox['urls']], ['Wikipedia', 'Website', 'Wikidata', 'Commons'])
+
+    def test_no_id(self):
+        c = ResultContainer("en-US")
+        c.extend('wikipedia', [{'infobox': 'Paris'}])
+        c.extend('wikidata', [{'infobox': 'Paris'}])
+        self.assertEqual(len(c.infoboxes), 2)
+
+
+class ResultTestCase(SearxTestCase):
+
+    def test_dict_interface(self):
+        result = Result(fake_result(extra_key='extra'))
+        self.assertEqual(result, fake_result(extra_key='extra'))
+        self.assertEqual(result['url'], 'https://aa.bb/cc?dd=ee#ff')
+        self.assertEqual(result['extra_key'], 'extra')
+        self.assertEqual(len(result), 5)
+        self.assertIn('title', result)
+        self.assertNotIn('img_src', result)
+        self.assertNotIn('other_key', result)
+        self.assertEqual(result.get('img_src', ''), '')
+        self.assertRaises(KeyError, result.__getitem__, 'img_src')
+        self.assertRaises(KeyError, result.__getitem__, 'other_key')
+
+        result['img_src'] = 'https://aa.bb/1.png'
+        result['other_key'] = 1
+        self.assertEqual(len(result), 7)
+        del result['img_src']
+        del result['other_key']
+        self.assertEqual(dict(result), fake_result(extra_key='extra'))
+        self.assertRaises(KeyError, result.__delitem__, 'img_src')
+
+    def test_copy(self):
+        result = Result(fake_result(extra_key='extra'))
+        result_copy = result.copy()
+        result_copy['title'] = 'ccc'
+        result_copy['extra_key'] = 'other'
+        self.assertEqual(result['title'], 'aaa')
+        self.assertEqual(result['extra_key'], 'extra')
+
+    def test_pickle(self):
+        result = Result(fake_result(extra_key='extra'))
+        self.assertEqual(pickle.loads(pickle.dumps(result)), result)
+
+
+class CompareUrlsTestCase(SearxTestCase):
+
+    def test_url_key(self):
+        urls = ['https://example.com/path', 'http://example.com/path/', 'https://www.example.com/path',
+                'https://www.example.com/pa%74h', 'https://example.com/path?q=1', 'https://example.com/path#a',
+                'https://example.com/path;params', 'https://example.com/', 'https://example.com',
+                'https://www.www.example.com/path', 'https://wwwexample.com/path', 'https://example.com/path//',
+                'https://example.com:443/path', 'https://EXAMPLE.com/path']
+        for url_a in urls:
+            for url_b in urls:
+                parsed_url_a, parsed_url_b = urlparse(url_a), urlparse(url_b)
+                self.assertEqual(compare_urls(parsed_url_a, parsed_url_b),
+                                 get_url_key(parsed_url_a) == get_url_key(parsed_url_b), (url_a, url_b))
+
+
+def group_results_quadratic(results):
+    """Grouping of ResultContainer.order_results before group_results"""
+    gresults = []
+    categoryPositions = {}
+
+    for res in results:
+        category = res['category']\
+            + ':' + res.get('template', '')\
+            + ':' + ('img_src' if 'img_src' in res or 'thumbnail' in res else '')
+
+        current = None if category not in categoryPositions\
+            else categoryPositions[category]
+
+        if current is not None and (current['count'] > 0)\
+                and (len(gresults) - current['index'] < 20):
+            index = current['index']
+            gresults.insert(index, res)
+
+            for k in categoryPositions:
+                v = categoryPositions[k]['index']
+                if v >= index:
+                    categoryPositions[k]['index'] = v + 1
+
+            current['count'] -= 1
+
+        else:
+            gresults.append(res)
+            categoryPositions[category] = {'index': len(gresults), 'count': 8}
+
+    return gresults
+
+
+class GroupResultsTestCase(SearxTestCase):
+
+    def random_results(self, rand, count):
+        categories = rand.sample(['general', 'images', 'videos', 'news', 'it', 'map'], rand.randint(1, 6))
+        results = []
+        for i in range(count):
+            result = {'url': 'https://example.com/{}'.format(i), 'category': rand.choice(categories)}
+            if rand.random() < 0.3:
+                result['template'] = rand.choice(['images.html', 'videos.html', 'torrent.html'])
+            if rand.random() < 0.2:
+                result['img_src'] = 'https://example.com/{}.png'.format(i)
+            if rand.random() < 0.1:
+                result['thumbnail'] = 'https://example.com/{}.jpg'.format(i)
+            results.append(result)
+        return results
+
+    def test_empty(self):
+        self.assertEqual(group_results([]), [])
+
+    def test_same_as_quadratic(self):
+        rand = random.Random(42)
+        for _ in range(500):
+            results = self.random_results(rand, rand.randint(0, 300))
+            self.assertEqual([r['url'] for r in group_results(results)],
+                             [r['url'] for r in group_results_quadratic(results)])
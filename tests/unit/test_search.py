@@ -1,7 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import threading
+from time import sleep, time
+from mock import Mock, ANY
+from requests.models import Response
 from searx.testing import SearxTestCase
 from searx.search import SearchQuery, EngineRef
+from searx.search.workerpool import EngineWorkerPool
+from searx.search.singleflight import SingleFlight
+from searx.cache import MemoryCache
+from searx.metrology import tracing
+from searx.metrology.histogram import SlidingHistogram
+from searx.results import ResultContainer
+from searx.search.processors import online
 import searx.search
 
 
@@ -18,6 +29,25 @@ TEST_ENGINES = [
         'tokens': [],
     },
 ]
+FAST_SLOW_ENGINES = [
+    {
+        'name': name,
+        'engine': 'dummy-offline',
+        'engine_type': 'offline',
+        'categories': 'general',
+        'shortcut': name.split()[0],
+        'timeout': 3.0,
+        'tokens': [],
+    } for name in ('fast dummy', 'slow dummy')
+]
+
+
+def set_fast_slow_engines(test_case, slow_delay):
+    for name, delay in (('fast dummy', 0.0), ('slow dummy', slow_delay)):
+        url = 'https://example.com/' + name.split()[0]
+        test_case.setattr4test(searx.search.processors[name].engine, 'search',
+                               lambda query, params, delay=delay, url=url:
+                               sleep(delay) or [{'url': url, 'title': 'a', 'content': 'b'}])
 
 
 class SearchQueryTestCase(SearxTestCase):
@@ -33,6 +63,16 @@ class SearchQueryTestCase(SearxTestCase):
         self.assertEqual(s, s)
         self.assertNotEqual(s, t)
 
+    def test_cache_key(self):
+        s = SearchQuery('test', [EngineRef('bing', 'general')], 'all', 0, 1, None, None, None)
+        t = SearchQuery('test', [EngineRef('bing', 'general')], 'all', 0, 1, None, None, None)
+        u = SearchQuery('test', [EngineRef('bing', 'general')], 'all', 0, 2, None, None, None)
+        v = SearchQuery('test', [EngineRef('bing', 'general')], 'all', 0, 1, None, None, None,
+                        engine_data={'bing': {'next': 'abc'}})
+        self.assertEqual(s.get_cache_key(), t.get_cache_key())
+        self.assertNotEqual(s.get_cache_key(), u.get_cache_key())
+        self.assertNotEqual(s.get_cache_key(), v.get_cache_key())
+
 
 class SearchTestCase(SearxTestCase):
 
@@ -98,3 +138,605 @@ class SearchTestCase(SearxTestCase):
         results = search.search()
         # This should not redirect
         self.assertTrue(results.redirect_url is None)
+
+
+class SearchAsyncioTestCase(SearxTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        searx.search.initialize(TEST_ENGINES + [
+            {
+                'name': 'offline dummy',
+                'engine': 'dummy-offline',
+                'engine_type': 'offline',
+                'categories': 'general',
+                'shortcut': 'od',
+                'timeout': 3.0,
+                'tokens': [],
+            },
+        ])
+
+    def setUp(self):
+        searx.search.max_request_timeout = None
+        self.setattr4test(searx.search, 'executor', 'asyncio')
+
+    def test_online_and_offline(self):
+        processor = searx.search.processors[PUBLIC_ENGINE_NAME]
+
+        def request(query, params):
+            params['url'] = 'https://example.com/?q=' + query
+
+        response = Mock(history=[])
+        self.setattr4test(processor.engine, 'request', request)
+        self.setattr4test(processor.engine, 'response',
+                          lambda resp: [{'url': resp.search_params['url'], 'title': 'a', 'content': 'b'}])
+        self.setattr4test(processor, '_send_http_request', lambda params: response)
+
+        search_query = SearchQuery('test', [EngineRef(PUBLIC_ENGINE_NAME, 'general'),
+                                            EngineRef('offline dummy', 'general')],
+                                   'en-US', SAFESEARCH, PAGENO, None, None)
+        result_container = searx.search.Search(search_query).search()
+        urls = [result.get('url') for result in result_container.get_ordered_results()]
+        self.assertEqual(len(urls), 2)
+        self.assertIn('https://example.com/?q=test', urls)
+        self.assertEqual(len(result_container.get_timings()), 2)
+        self.assertEqual(result_container.unresponsive_engines, set())
+
+    def test_timeout(self):
+        processor = searx.search.processors['offline dummy']
+        self.setattr4test(processor.engine, 'search', lambda query, params: sleep(0.5) or [])
+
+        search_query = SearchQuery('test', [EngineRef('offline dummy', 'general')],
+                                   'en-US', SAFESEARCH, PAGENO, None, 0.1)
+        result_container = searx.search.Search(search_query).search()
+        self.assertEqual(result_container.unresponsive_engines, {('offline dummy', 'timeout', None)})
+
+    def test_blocking_request(self):
+        # the request function of some engines sends an HTTP request
+        processor = searx.search.processors[PUBLIC_ENGINE_NAME]
+        self.setattr4test(processor.engine, 'request', lambda query, params: sleep(0.5))
+
+        search_query = SearchQuery('test', [EngineRef(PUBLIC_ENGINE_NAME, 'general')],
+                                   'en-US', SAFESEARCH, PAGENO, None, 0.1)
+        start_time = time()
+        result_container = searx.search.Search(search_query).search()
+        self.assertLess(time() - start_time, 0.4)
+        self.assertEqual(result_container.unresponsive_engines, {(PUBLIC_ENGINE_NAME, 'timeout', None)})
+
+
+class SearchIterTestCase(SearxTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        searx.search.initialize(FAST_SLOW_ENGINES)
+
+    def setUp(self):
+        searx.search.max_request_timeout = None
+        set_fast_slow_engines(self, 0.2)
+
+    def check_search_iter(self):
+        search_query = SearchQuery('test', [EngineRef('fast dummy', 'general'), EngineRef('slow dummy', 'general')],
+                                   'en-US', SAFESEARCH, PAGENO, None, None)
+        search = searx.search.Search(search_query)
+        events = [(engine_name, [result['url'] for result in search.get_current_results()])
+                  for engine_name in search.search_iter()]
+        self.assertEqual(events, [
+            ('fast dummy', ['https://example.com/fast']),
+            ('slow dummy', ['https://example.com/fast', 'https://example.com/slow']),
+        ])
+        self.assertEqual(search.result_container.results_length(), 2)
+
+    def test_threads(self):
+        self.setattr4test(searx.search, 'executor', 'threads')
+        self.check_search_iter()
+
+    def test_pool(self):
+        self.setattr4test(searx.search, 'executor', 'pool')
+        self.check_search_iter()
+
+    def test_asyncio(self):
+        self.setattr4test(searx.search, 'executor', 'asyncio')
+        self.check_search_iter()
+
+    def test_context(self):
+        trace = tracing.Trace()
+        spans = []
+        self.setattr4test(searx.search.processors['fast dummy'].engine, 'search',
+                          lambda query, params: spans.append(tracing._current_span.get()) or [])
+
+        def search():
+            # the request is traced, see searx.metrology.tracing
+            tracing.Span(trace, None, 'GET /search', tracing.SPAN_KIND_SERVER, {}).start()
+            search_query = SearchQuery('test', [EngineRef('fast dummy', 'general')],
+                                       'en-US', SAFESEARCH, PAGENO, None, None)
+            list(searx.search.Search(search_query).search_iter())
+
+        thread = threading.Thread(target=search)
+        thread.start()
+        thread.join()
+        # the engine runs in the context of the request
+        self.assertEqual([span.trace for span in spans], [trace])
+
+
+class EarlyReturnTestCase(SearxTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        searx.search.initialize(FAST_SLOW_ENGINES)
+
+    def setUp(self):
+        searx.search.max_request_timeout = None
+        set_fast_slow_engines(self, 1.0)
+
+    def check_early_return(self, early_return_settings, cut_off=True):
+        self.setattr4test(searx.search, 'early_return_settings', early_return_settings)
+        for executor in ('threads', 'pool', 'asyncio'):
+            self.setattr4test(searx.search, 'executor', executor)
+            search_query = SearchQuery('test', [EngineRef('fast dummy', 'general'),
+                                                EngineRef('slow dummy', 'general')],
+                                       'en-US', SAFESEARCH, PAGENO, None, 0.5)
+            start_time = time()
+            result_container = searx.search.Search(search_query).search()
+            urls = [result['url'] for result in result_container.get_ordered_results()]
+            self.assertEqual(urls, ['https://example.com/fast'])
+            self.assertEqual(result_container.unresponsive_engines,
+                             set() if cut_off else {('slow dummy', 'timeout', None)})
+            self.assertEqual(result_container.cut_off_engines, {'slow dummy'} if cut_off else set())
+            if cut_off:
+                self.assertIn({'engine': 'slow', 'total': ANY, 'load': 0.0, 'cut_off': True},
+                              result_container.get_timings())
+                self.assertLess(time() - start_time, 0.4)
+
+    def test_min_engines(self):
+        self.check_early_return({'min_engines': 1})
+
+    def test_min_results(self):
+        self.check_early_return({'min_results': 1})
+
+    def test_stable_top(self):
+        self.check_early_return({'stable_top': 1, 'stable_time': 0.1})
+
+    def test_timeout_limit(self):
+        # the query timeout still applies
+        self.check_early_return({'min_engines': 2}, cut_off=False)
+
+
+class EngineWorkerPoolTestCase(SearxTestCase):
+
+    def test_submit(self):
+        pool = EngineWorkerPool(2, 10, 10)
+        future = pool.submit('engine', time() + 10, lambda a, b: a + b, 1, 2)
+        self.assertEqual(future.result(), 3)
+        self.assertEqual(pool.get_stats()['queue_depth'], 0)
+        self.assertEqual(pool.get_stats()['active_count'], 0)
+
+    def test_saturation(self):
+        event = threading.Event()
+        pool = EngineWorkerPool(1, 1, 2)
+        deadline = time() + 10
+
+        # the only thread is busy
+        running = pool.submit('engine1', deadline, event.wait)
+        # one request in the queue
+        queued = pool.submit('engine2', deadline, lambda: 'done')
+        self.assertIsNotNone(queued)
+        # queue is full
+        self.assertIsNone(pool.submit('engine3', deadline, lambda: 'done'))
+        self.assertEqual(pool.get_stats()['rejected_count'], 1)
+        self.assertEqual(pool.get_stats()['queue_depth'], 1)
+
+        event.set()
+        running.result()
+        self.assertEqual(queued.result(), 'done')
+        self.assertEqual(pool.get_stats()['queue_depth'], 0)
+
+    def test_engine_concurrency(self):
+        event = threading.Event()
+        pool = EngineWorkerPool(4, 10, 1)
+        deadline = time() + 10
+
+        running = pool.submit('engine1', deadline, event.wait)
+        self.assertIsNone(pool.submit('engine1', deadline, event.wait))
+        self.assertIsNotNone(pool.submit('engine2', deadline, lambda: None))
+        event.set()
+        running.result()
+        self.assertIsNotNone(pool.submit('engine1', deadline, lambda: None))
+
+    def test_expired(self):
+        event = threading.Event()
+        pool = EngineWorkerPool(1, 10, 10)
+        running = pool.submit('engine1', time() + 10, event.wait)
+        expired = pool.submit('engine2', time() - 1, lambda: 'done')
+        event.set()
+        running.result()
+        self.assertIsNone(expired.result())
+        self.assertEqual(pool.get_stats()['expired_count'], 1)
+
+
+class SearchPoolTestCase(SearxTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        searx.search.initialize(TEST_ENGINES)
+
+    def setUp(self):
+        searx.search.max_request_timeout = None
+        self.setattr4test(searx.search, 'executor', 'pool')
+
+    def test_search(self):
+        search_query = SearchQuery('test', [EngineRef(PUBLIC_ENGINE_NAME, 'general')],
+                                   'en-US', SAFESEARCH, PAGENO, None, None)
+        search = searx.search.Search(search_query)
+        result_container = search.search()
+        self.assertEqual(search.actual_timeout, 3.0)
+        self.assertEqual(result_container.unresponsive_engines, set())
+
+
+class SearchResultCacheTestCase(SearxTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        searx.search.initialize(TEST_ENGINES)
+
+    def setUp(self):
+        searx.search.max_request_timeout = None
+        self.cache = MemoryCache('results', 10)
+        self.setattr4test(searx.search, 'result_cache_ttl', 60)
+        self.setattr4test(searx.search, 'get_cache', lambda namespace: self.cache)
+
+        processor = searx.search.processors[PUBLIC_ENGINE_NAME]
+        self.calls = []
+
+        def search(query, params, result_container, start_time, timeout_limit):
+            self.calls.append(query)
+            result_container.extend(PUBLIC_ENGINE_NAME, [{'url': 'https://example.com/' + query, 'title': query}])
+
+        self.setattr4test(processor, 'search', search)
+
+    def test_cache(self):
+        for _ in range(2):
+            search_query = SearchQuery('test', [EngineRef(PUBLIC_ENGINE_NAME, 'general')],
+                                       'en-US', SAFESEARCH, PAGENO, None, None)
+            result_container = searx.search.Search(search_query).search()
+            self.assertEqual(result_container.get_ordered_results()[0]['url'], 'https://example.com/test')
+        self.assertEqual(self.calls, ['test'])
+        self.assertEqual(self.cache.get_stats()['hits'], 1)
+
+        search_query = SearchQuery('test', [EngineRef(PUBLIC_ENGINE_NAME, 'general')],
+                                   'fr-FR', SAFESEARCH, PAGENO, None, None)
+        searx.search.Search(search_query).search()
+        self.assertEqual(self.calls, ['test', 'test'])
+
+    def test_no_cache_on_error(self):
+        processor = searx.search.processors[PUBLIC_ENGINE_NAME]
+
+        def search(query, params, result_container, start_time, timeout_limit):
+            self.calls.append(query)
+            result_container.add_unresponsive_engine(PUBLIC_ENGINE_NAME, 'HTTP error')
+
+        self.setattr4test(processor, 'search', search)
+        for _ in range(2):
+            search_query = SearchQuery('test', [EngineRef(PUBLIC_ENGINE_NAME, 'general')],
+                                       'en-US', SAFESEARCH, PAGENO, None, None)
+            searx.search.Search(search_query).search()
+        self.assertEqual(self.calls, ['test', 'test'])
+
+
+class ResponseCacheTestCase(SearxTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        searx.search.initialize(TEST_ENGINES)
+
+    def setUp(self):
+        self.cache = MemoryCache('responses', 10)
+        self.setattr4test(online, 'get_cache', lambda namespace: self.cache)
+        self.processor = searx.search.processors[PUBLIC_ENGINE_NAME]
+        self.setattr4test(self.processor.engine, 'cache_ttl', 60)
+
+        def request(query, params):
+            params['url'] = 'https://example.com/?q=' + query.split()[0]
+
+        def response(resp):
+            return [{'url': resp.url, 'title': resp.text, 'content': resp.search_params['query']}]
+
+        self.setattr4test(self.processor.engine, 'request', request)
+        self.setattr4test(self.processor.engine, 'response', response)
+
+        self.sent_requests = []
+        self.trace = tracing.Trace()
+        self.spans = []
+
+        def send_http_request(params):
+            self.sent_requests.append(params['url'])
+            resp = Response()
+            resp.status_code = 200
+            resp.url = params['url']
+            resp._content = b'title'
+            return resp
+
+        self.setattr4test(self.processor, '_send_http_request', send_http_request)
+
+    def search(self, query):
+        search_query = SearchQuery(query, [EngineRef(PUBLIC_ENGINE_NAME, 'general')],
+                                   'en-US', SAFESEARCH, PAGENO, None, None)
+        params = self.processor.get_params(search_query, 'general')
+        params['query'] = query
+        result_container = ResultContainer('en-US')
+        # like searx.search, run the processor in its own thread: it sets the thread local timeout
+        thread = threading.Thread(target=self.processor.search,
+                                  args=(query, params, result_container, time(), 3.0))
+        thread.start()
+        thread.join()
+        return result_container.get_ordered_results()
+
+    def test_cache(self):
+        self.search('first query')
+        results = self.search('first other query')
+        self.assertEqual(self.sent_requests, ['https://example.com/?q=first'])
+        # the cached response is parsed with the parameters of the current query
+        self.assertEqual(results[0]['content'], 'first other query')
+        self.assertEqual(results[0]['title'], 'title')
+
+        self.search('second query')
+        self.assertEqual(self.sent_requests, ['https://example.com/?q=first', 'https://example.com/?q=second'])
+
+    def test_no_cache_ttl(self):
+        self.setattr4test(self.processor.engine, 'cache_ttl', 0)
+        self.search('first query')
+        self.search('first query')
+        self.assertEqual(len(self.sent_requests), 2)
+
+
+class HedgedRequestTestCase(SearxTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        searx.search.initialize(TEST_ENGINES)
+
+    def setUp(self):
+        self.processor = searx.search.processors[PUBLIC_ENGINE_NAME]
+        self.setattr4test(self.processor.engine, 'hedge_percentile', 90)
+        self.setattr4test(self.processor.engine, 'hedge_budget', 100)
+        for name in ('request_count', 'hedge_count', 'hedge_win_count'):
+            self.setattr4test(self.processor, name, 0)
+        histogram = SlidingHistogram()
+        for _ in range(online.HEDGE_MIN_COUNT):
+            histogram.observe(0.01)
+        self.setattr4test(self.processor, 'request_time_histogram', histogram)
+
+        def request(query, params):
+            params['url'] = 'https://example.com/?q=' + query
+
+        def response(resp):
+            return [{'url': resp.url, 'title': resp.text, 'content': ''}]
+
+        self.setattr4test(self.processor.engine, 'request', request)
+        self.setattr4test(self.processor.engine, 'response', response)
+
+        self.sent_requests = []
+        self.trace = tracing.Trace()
+        self.spans = []
+
+        def send_http_request(params):
+            # the first request is slow
+            self.sent_requests.append(params['url'])
+            self.spans.append(tracing._current_span.get())
+            resp = Response()
+            resp.status_code = 200
+            resp.url = params['url']
+            if len(self.sent_requests) == 1:
+                sleep(0.5)
+                resp._content = b'first'
+            else:
+                resp._content = b'hedge'
+            return resp
+
+        self.setattr4test(self.processor, '_send_http_request', send_http_request)
+
+    def search(self):
+        search_query = SearchQuery('test', [EngineRef(PUBLIC_ENGINE_NAME, 'general')],
+                                   'en-US', SAFESEARCH, PAGENO, None, None)
+        params = self.processor.get_params(search_query, 'general')
+        result_container = ResultContainer('en-US')
+
+        def search():
+            # the request is traced, see searx.metrology.tracing
+            tracing.Span(self.trace, None, 'GET /search', tracing.SPAN_KIND_SERVER, {}).start()
+            self.processor.search('test', params, result_container, time(), 3.0)
+
+        thread = threading.Thread(target=search)
+        thread.start()
+        thread.join()
+        return [result['title'] for result in result_container.get_ordered_results()]
+
+    def test_hedge(self):
+        self.assertEqual(self.search(), ['hedge'])
+        self.assertEqual(len(self.sent_requests), 2)
+        # the threads of the hedged requests run in the context of the request
+        self.assertEqual([span.trace for span in self.spans], [self.trace, self.trace])
+        self.assertEqual(self.processor.get_hedge_stats()['hedge_win_count'], 1)
+
+    def test_budget(self):
+        self.setattr4test(self.processor.engine, 'hedge_budget', 0)
+        self.assertEqual(self.search(), ['first'])
+        self.assertEqual(len(self.sent_requests), 1)
+        self.assertEqual(self.processor.request_count, 1)
+
+    def test_not_enough_responses(self):
+        self.setattr4test(self.processor, 'request_time_histogram', SlidingHistogram())
+        self.assertEqual(self.search(), ['first'])
+        self.assertEqual(self.processor.request_count, 0)
+
+    def test_post(self):
+        request = self.processor.engine.request
+
+        def post_request(query, params):
+            request(query, params)
+            params['method'] = 'POST'
+
+        self.setattr4test(self.processor.engine, 'request', post_request)
+        # a POST request may not be idempotent: it is not sent twice
+        self.assertEqual(self.search(), ['first'])
+        self.assertEqual(len(self.sent_requests), 1)
+        self.assertEqual(self.processor.request_count, 0)
+
+
+class SingleFlightTestCase(SearxTestCase):
+
+    def setUp(self):
+        self.singleflight = SingleFlight('test')
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def work(self, value):
+        self.calls.append(value)
+        self.started.set()
+        self.release.wait(5)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def start_follower(self, key, value):
+        outcome = {}
+
+        def follow():
+            try:
+                outcome['value'] = self.singleflight.do(key, self.work, value)
+            except Exception as e:
+                outcome['exception'] = e
+
+        thread = threading.Thread(target=follow)
+        thread.start()
+        return thread, outcome
+
+    def test_do(self):
+        self.assertEqual(self.singleflight.do('key', lambda: 1), (1, False))
+
+        leader, leader_outcome = self.start_follower('key', 'leader')
+        self.started.wait(5)
+        followers = [self.start_follower('key', 'follower') for _ in range(3)]
+        while self.singleflight.shared_calls < 3:
+            sleep(0.001)
+        self.release.set()
+        leader.join()
+        for thread, _ in followers:
+            thread.join()
+
+        self.assertEqual(self.calls, ['leader'])
+        self.assertEqual(leader_outcome['value'], ('leader', False))
+        for _, outcome in followers:
+            self.assertEqual(outcome['value'], ('leader', True))
+        self.assertEqual(self.singleflight.get_stats(), {'name': 'test', 'calls': 5, 'shared_calls': 3})
+
+        # the call is done: a new call starts
+        self.assertEqual(self.singleflight.do('key', self.work, 'again'), ('again', False))
+
+    def test_share(self):
+        shared_values = []
+
+        def share(value):
+            shared_values.append(value)
+            return 'shared ' + value
+
+        # no follower: share is not called
+        self.assertEqual(self.singleflight.do('key', lambda: 'alone', share=share), ('alone', False))
+        self.assertEqual(shared_values, [])
+
+        leader_outcome = {}
+        leader = threading.Thread(target=lambda: leader_outcome.update(
+            value=self.singleflight.do('key', self.work, 'leader', share=share)))
+        leader.start()
+        self.started.wait(5)
+        follower, follower_outcome = self.start_follower('key', 'follower')
+        while self.singleflight.shared_calls < 1:
+            sleep(0.001)
+        self.release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual(leader_outcome['value'], ('leader', False))
+        self.assertEqual(follower_outcome['value'], ('shared leader', True))
+        self.assertEqual(shared_values, ['leader'])
+
+    def test_exception(self):
+        exception = ValueError('engine error')
+        leader, leader_outcome = self.start_follower('key', exception)
+        self.started.wait(5)
+        follower, follower_outcome = self.start_follower('key', 'follower')
+        while self.singleflight.shared_calls < 1:
+            sleep(0.001)
+        self.release.set()
+        leader.join()
+        follower.join()
+
+        self.assertIs(leader_outcome['exception'], exception)
+        self.assertIs(follower_outcome['exception'], exception)
+        self.assertEqual(self.calls, [exception])
+
+
+class SearchSingleFlightTestCase(SearxTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        searx.search.initialize(TEST_ENGINES)
+
+    def setUp(self):
+        searx.search.max_request_timeout = None
+        self.setattr4test(searx.search, 'singleflight_enabled', True)
+        self.setattr4test(searx.search, 'singleflight_queries', SingleFlight('queries'))
+
+        processor = searx.search.processors[PUBLIC_ENGINE_NAME]
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+        def search(query, params, result_container, start_time, timeout_limit):
+            self.calls.append(query)
+            self.started.set()
+            self.release.wait(5)
+            result_container.extend(PUBLIC_ENGINE_NAME, [{'url': 'https://example.com/' + query, 'title': query}])
+
+        self.setattr4test(processor, 'search', search)
+
+    def search(self, results):
+        search_query = SearchQuery('test', [EngineRef(PUBLIC_ENGINE_NAME, 'general')],
+                                   'en-US', SAFESEARCH, PAGENO, None, None)
+        results.append(searx.search.Search(search_query).search())
+
+    def test_concurrent_queries(self):
+        results = []
+        threads = [threading.Thread(target=self.search, args=(results,)) for _ in range(3)]
+        threads[0].start()
+        self.started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while searx.search.singleflight_queries.shared_calls < 2:
+            sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, ['test'])
+        self.assertEqual(len(results), 3)
+        # each query has its own copy of the results
+        self.assertEqual(len(set(map(id, results))), 3)
+        for result_container in results:
+            self.assertEqual(result_container.get_ordered_results()[0]['url'], 'https://example.com/test')
+
+    def test_not_serialized_without_follower(self):
+        self.release.set()
+        serialize_calls = []
+        self.setattr4test(searx.search.Search, '_serialize_results', lambda search: serialize_calls.append(search))
+        results = []
+        self.search(results)
+        self.assertEqual(self.calls, ['test'])
+        self.assertEqual(serialize_calls, [])
+
+    def test_disabled(self):
+        self.setattr4test(searx.search, 'singleflight_enabled', False)
+        self.release.set()
+        results = []
+        self.search(results)
+        self.search(results)
+        self.assertEqual(self.calls, ['test', 'test'])
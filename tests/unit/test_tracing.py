@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+
+import searx.metrology.tracing
+from searx.metrology.tracing import end_trace, span, start_trace
+from searx.testing import SearxTestCase
+
+
+class TracingTestCase(SearxTestCase):
+
+    def test_not_traced(self):
+        self.assertIsNone(start_trace('GET /'))
+        with span('not traced') as not_traced_span:
+            not_traced_span.set_attribute('key', 'value')
+
+    def test_trace(self):
+        trace_file, trace_path = tempfile.mkstemp()
+        os.close(trace_file)
+        self.addCleanup(os.remove, trace_path)
+        self.setattr4test(searx.metrology.tracing, 'trace_file', trace_path)
+
+        root_span = start_trace('GET /search', **{'http.method': 'GET'})
+        with span('search'):
+            with span('engine', engine='dummy') as engine_span:
+                engine_span.set_attribute('results', 2)
+            try:
+                with span('error'):
+                    raise ValueError()
+            except ValueError:
+                pass
+        end_trace(root_span)
+        # the current span is reset
+        self.assertIsInstance(span('not traced'), searx.metrology.tracing._NoSpan)
+
+        with open(trace_path, encoding='utf-8') as f:
+            lines = f.readlines()
+        self.assertEqual(len(lines), 1)
+        spans = json.loads(lines[0])['resourceSpans'][0]['scopeSpans'][0]['spans']
+        spans = {otlp_span['name']: otlp_span for otlp_span in spans}
+        self.assertEqual(set(spans), {'GET /search', 'search', 'engine', 'error'})
+        self.assertNotIn('parentSpanId', spans['GET /search'])
+        self.assertEqual(spans['search']['parentSpanId'], spans['GET /search']['spanId'])
+        self.assertEqual(spans['engine']['parentSpanId'], spans['search']['spanId'])
+        self.assertEqual(len({otlp_span['traceId'] for otlp_span in spans.values()}), 1)
+        attributes = {attribute['key']: attribute['value'] for attribute in spans['engine']['attributes']}
+        self.assertEqual(attributes['engine'], {'stringValue': 'dummy'})
+        self.assertEqual(attributes['results'], {'intValue': '2'})
+        self.assertIn('thread.cpu_time_ns', attributes)
+        attributes = {attribute['key']: attribute['value'] for attribute in spans['error']['attributes']}
+        self.assertEqual(attributes['exception.type'], {'stringValue': 'ValueError'})
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import lxml.etree
 from lxml import html
+from urllib.parse import urlparse
 
 from searx.testing import SearxTestCase
 from searx.exceptions import SearxXPathSyntaxException, SearxEngineXPathException
@@ -118,6 +119,14 @@ class TestUtils(SearxTestCase):
         self.assertEqual(utils.ecma_unescape('text using %u: %u5409, %u4E16%u754c'),
                          'text using %u: 吉, 世界')
 
+    def test_parse_url(self):
+        url = 'https://example.com/test_parse_url?q=1'
+        hits = utils.get_parse_url_stats()['hits']
+        parsed_url = utils.parse_url(url)
+        self.assertEqual(parsed_url, urlparse(url))
+        self.assertIs(utils.parse_url(url), parsed_url)
+        self.assertEqual(utils.get_parse_url_stats()['hits'], hits + 1)
+
 
 class TestHTMLTextExtractor(SearxTestCase):
 
@@ -53,6 +53,7 @@ class ViewsTestCase(SearxTestCase):
 
         def search_mock(search_self, *args):
             search_self.result_container = Mock(get_ordered_results=lambda: test_results,
+                                                get_current_results=lambda: [dict(test_results[1])],
                                                 answers=dict(),
                                                 corrections=set(),
                                                 suggestions=set(),
@@ -64,6 +65,8 @@ class ViewsTestCase(SearxTestCase):
                                                 get_timings=lambda: timings,
                                                 redirect_url=None,
                                                 engine_data={})
+            if search_self.on_engine_done is not None:
+                search_self.on_engine_done('youtube')
 
         self.setattr4test(Search, 'search', search_mock)
 
@@ -137,6 +140,28 @@ class ViewsTestCase(SearxTestCase):
         self.assertEqual(result_dict['results'][0]['content'], 'first test content')
         self.assertEqual(result_dict['results'][0]['url'], 'http://first.test.xyz')
 
+    def test_search_empty_sse(self):
+        result = self.app.post('/search', data={'q': '', 'format': 'sse'})
+        self.assertEqual(result.status_code, 400)
+        self.assertEqual(result.mimetype, 'text/event-stream')
+
+    def test_search_sse(self):
+        result = self.app.post('/search', data={'q': 'test', 'format': 'sse'})
+        self.assertEqual(result.mimetype, 'text/event-stream')
+        self.assertEqual(result.headers['Cache-Control'], 'no-cache')
+
+        events = []
+        for message in result.data.decode().split('\n\n')[:-1]:
+            event, data = message.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+
+        self.assertEqual([event for event, _ in events], ['results', 'done'])
+        self.assertEqual(events[0][1]['engine'], 'youtube')
+        self.assertEqual([r['url'] for r in events[0][1]['results']], ['http://second.test.xyz'])
+        self.assertEqual(events[1][1]['query'], 'test')
+        self.assertEqual(len(events[1][1]['results']), 2)
+        self.assertEqual(events[1][1]['results'][0]['content'], 'first test content')
+
     def test_index_csv(self):
         result = self.app.post('/', data={'q': 'test', 'format': 'csv'})
         self.assertEqual(result.status_code, 308)
@@ -227,6 +252,20 @@ class ViewsTestCase(SearxTestCase):
         result = self.app.get('/stats')
         self.assertEqual(result.status_code, 404)
 
+    def test_metrics(self):
+        result = self.app.get('/metrics')
+        self.assertEqual(result.status_code, 404)
+
+        from searx import webapp  # pylint disable=import-outside-toplevel
+        general = dict(webapp.settings['general'], enable_stats=True)
+        self.setattr4test(webapp, 'settings', dict(webapp.settings, general=general))
+        result = self.app.get('/metrics')
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.content_type, 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn(b'# TYPE searx_engine_searches_total counter\n', result.data)
+        self.assertIn(b'searx_cache_hits_total{cache="parse_url",backend="memory"} ', result.data)
+        self.assertIn(b'searx_engine_continuous_errors{engine="1337x",worker="0"} ', result.data)
+
     def test_robots_txt(self):
         result = self.app.get('/robots.txt')
         self.assertEqual(result.status_code, 200)